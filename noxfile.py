@@ -29,7 +29,7 @@ def install_with_constraints(session: Session, *args: str, **kwargs: Any) -> Non
 def tests(session: Session) -> None:
     """Run the test suite."""
     args = session.posargs or ["--cov"]
-    session.install(".")
+    session.poetry.installroot(extras=["brotli"])
     session.install("coverage[toml]", "pytest", "pytest-cov", "pytest-mock", "deepdiff")
     session.run(
         "pytest",
@@ -1,7 +1,26 @@
 """dsop-api-spesifikasjoner package.
 
 Modules:
+    archive
+    artifacts
+    benchmark
+    catalog
+    components
+    dataservice
+    fetch
     generateSpecification
+    lookup
+    manifest
+    probe
+    profiling
+    publish
+    rdfwriter
+    registry
+    render
+    shards
+    staging
+    template
+    validation
 """
 try:
     from importlib.metadata import version, PackageNotFoundError  # type: ignore
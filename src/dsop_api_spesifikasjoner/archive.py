@@ -0,0 +1,461 @@
+"""Module for writing the outputs into one archive, and reading specs from it.
+
+The outputs of a run are written into a tar or zip archive as they are
+generated, in one sequential write, without timestamps, so the same outputs
+written in the same order give the same archive. An archive with the same
+content as the existing one is not written.
+
+The index INDEX_NAME is the last member, and maps the org number of each
+bank to the members with its production and test specs. In a zip archive,
+the members are found by its central directory. In a tar archive, the index
+is found by reading the archive backwards from its end, and has the offset
+and size of the data of every other member, so a member is read without
+reading the members before it.
+
+Example:
+    >>> with ArchiveReader("specs.zip") as archive:
+    >>>     spec = archive.spec("937903502")
+"""
+import filecmp
+import hashlib
+import io
+import json
+import os
+import posixpath
+import shutil
+import tarfile
+import tempfile
+from types import TracebackType
+from typing import Any, BinaryIO, Dict, IO, List, Optional, Tuple, Type
+import zipfile
+
+from . import __version__
+from .catalog import decode_catalog, SPECS_URL
+from .shards import publisher_orgnummer
+
+ARCHIVE_FORMATS = {".tar": "tar", ".zip": "zip"}
+INDEX_NAME = "dsop_archive_index.json"
+# The catalogs the index is made from, by environment:
+_CATALOGS = {"production": "dsop_catalog.json", "test": "test/dsop_catalog_test.json"}
+# The timestamp of every member of a zip archive:
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# The size of the members kept in memory while they are written, and of the
+# chunks a tar archive is read backwards in:
+_SPOOL_SIZE = 1 << 20
+_CHUNK_SIZE = 1 << 16
+
+
+class ArchiveError(Exception):
+    """Exception raised for an archive that cannot be read."""
+
+
+def archive_format(filename: str) -> Optional[str]:
+    """Return the format of the archive filename by its suffix, if known."""
+    return ARCHIVE_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+def write_archive(filename: str, directory: str) -> bool:
+    """Write the files in directory into the archive filename.
+
+    Hidden files and directories are left out, and the files are written in
+    sorted order.
+
+    Args:
+        filename: the archive, ending with .tar or .zip
+        directory: the directory with the outputs
+
+    Returns:
+        True if the archive was written, False if it was unchanged
+    """
+    with ArchiveWriter(filename) as writer:
+        for member in _members(directory):
+            writer.write(member, _read(directory, member))
+    return bool(writer.written)
+
+
+class ArchiveWriter:
+    """Class writing members into an archive as they are generated.
+
+    The archive is written to a temporary file next to filename, which is
+    moved into place when the writer is closed without an error, unless it
+    equals the existing archive. The existing archive is kept open, so the
+    members that have not changed can be copied from it.
+    """
+
+    def __init__(self, filename: str) -> None:
+        """Inits a writer of the archive filename.
+
+        Args:
+            filename: the archive, ending with .tar or .zip
+
+        Raises:
+            ValueError: if filename does not end with .tar or .zip
+        """
+        kind = archive_format(filename)
+        if kind is None:
+            raise ValueError(f"Not a .tar or .zip archive >{filename}<")
+        self.filename = filename
+        self.format = kind
+        # The size and sha256 digest of each member written:
+        self.members: Dict[str, Tuple[int, str]] = {}
+        # True if the archive was written, False if it was unchanged:
+        self.written: Optional[bool] = None
+        self.previous: Optional[ArchiveReader] = None
+        if os.path.isfile(filename):
+            try:
+                self.previous = ArchiveReader(filename)
+            except (OSError, ArchiveError):
+                self.previous = None
+        descriptor, self._temporary = tempfile.mkstemp(
+            prefix=".dsop_archive-", dir=os.path.dirname(os.path.abspath(filename))
+        )
+        self._file: BinaryIO = os.fdopen(descriptor, "w+b")
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._tar: Optional[tarfile.TarFile] = None
+        if kind == "zip":
+            self._zip = zipfile.ZipFile(self._file, "w", zipfile.ZIP_DEFLATED)
+        else:
+            self._tar = tarfile.open(
+                fileobj=self._file, mode="w:", format=tarfile.PAX_FORMAT
+            )
+        # The offset and size of the data of each member of a tar archive:
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._catalogs: Dict[str, bytes] = {}
+
+    def __enter__(self) -> "ArchiveWriter":
+        """Enter the runtime context."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Close the writer, or discard the archive if the run failed."""
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def __contains__(self, name: object) -> bool:
+        """Check if the member name has been written."""
+        return name in self.members
+
+    def write(self, name: str, content: bytes) -> None:
+        """Write the member name with content."""
+        self._add(name, io.BytesIO(content), len(content))
+
+    def open(self, name: str) -> BinaryIO:
+        """Open the member name, which is written when the file is closed.
+
+        The content is kept in memory up to a limit, and then in a temporary
+        file, so a member can be written while other members are written.
+
+        Args:
+            name: the name of the member
+
+        Returns:
+            the file to write the content to
+        """
+        return io.BufferedWriter(_MemberFile(self, name))
+
+    def read(self, name: str) -> bytes:
+        """Return the content of the member name, written by this writer."""
+        if self._zip is not None:
+            return self._zip.read(name)
+        offset, size = self._offsets[name]
+        self._file.seek(offset)
+        content = self._file.read(size)
+        self._file.seek(0, os.SEEK_END)
+        return content
+
+    def copy(self, name: str) -> None:
+        """Write the member name of the existing archive, unchanged.
+
+        Args:
+            name: the name of the member
+
+        Raises:
+            KeyError: if the existing archive has no member name
+        """
+        if self.previous is None:
+            raise KeyError(name)
+        self.write(name, self.previous.read(name))
+
+    def close(self) -> None:
+        """Write the index, and move the archive into place unless it is unchanged."""
+        index = _bank_index(self._catalogs)
+        if self._tar is not None:
+            index["members"] = dict(self._offsets)
+        self.write(INDEX_NAME, _encode(index))
+        try:
+            self._finish()
+            if os.path.isfile(self.filename) and filecmp.cmp(
+                self._temporary, self.filename, shallow=False
+            ):
+                self.written = False
+                return
+            # A temporary file is only readable by its owner:
+            os.chmod(self._temporary, 0o644)
+            os.replace(self._temporary, self.filename)
+            self.written = True
+        finally:
+            self.discard()
+
+    def discard(self) -> None:
+        """Close the writer and remove the archive written, if not in place."""
+        self._finish()
+        if os.path.exists(self._temporary):
+            os.remove(self._temporary)
+
+    def _finish(self) -> None:
+        """Close the archive and the existing archive."""
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
+        self._file.close()
+        if self.previous is not None:
+            self.previous.close()
+
+    def _add(self, name: str, content: IO[bytes], size: int) -> None:
+        """Add the member name with size bytes of content, read from its start."""
+        sha256 = hashlib.sha256()
+        for chunk in iter(lambda: content.read(_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+        content.seek(0)
+        if name in _CATALOGS.values():
+            self._catalogs[name] = content.read()
+            content.seek(0)
+        if self._zip is not None:
+            with self._zip.open(_zip_info(name), "w") as member:
+                shutil.copyfileobj(content, member, _CHUNK_SIZE)
+        elif self._tar is not None:
+            self._tar.addfile(_tar_info(name, size), content)
+            self._offsets[name] = (self._tar.offset - _padded(size), size)
+        self.members[name] = (size, sha256.hexdigest())
+
+
+class _MemberFile(io.RawIOBase):
+    """A member of an archive, spooled while written and added when closed."""
+
+    def __init__(self, writer: ArchiveWriter, name: str) -> None:
+        """Inits a member name of writer."""
+        self.writer = writer
+        self.name = name
+        self.spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE)
+
+    def writable(self) -> bool:
+        """The member is written."""
+        return True
+
+    def write(self, content: Any) -> int:
+        """Write content to the spool."""
+        return self.spool.write(content)
+
+    def close(self) -> None:
+        """Add the member to the archive."""
+        if self.closed:
+            return
+        try:
+            size = self.spool.tell()
+            self.spool.seek(0)
+            self.writer._add(self.name, self.spool, size)
+        finally:
+            self.spool.close()
+            super().close()
+
+
+class ArchiveReader:
+    """Class reading the members of an archive written by ArchiveWriter."""
+
+    def __init__(self, filename: str) -> None:
+        """Inits a reader of the archive filename, reading its index.
+
+        Args:
+            filename: the archive, ending with .tar or .zip
+
+        Raises:
+            ArchiveError: if the archive or its index cannot be read
+        """
+        self.format = archive_format(filename)
+        self._file: BinaryIO = open(filename, "rb")
+        self._zip: Optional[zipfile.ZipFile] = None
+        try:
+            self.index = self._read_index()
+        except (
+            OSError,
+            ValueError,
+            KeyError,
+            tarfile.TarError,
+            zipfile.BadZipFile,
+        ) as e:
+            self.close()
+            raise ArchiveError(f"Cannot read the index of >{filename}<: {e}") from e
+
+    def __enter__(self) -> "ArchiveReader":
+        """Enter the runtime context."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Close the archive."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the archive."""
+        if self._zip is not None:
+            self._zip.close()
+        self._file.close()
+
+    def __contains__(self, name: object) -> bool:
+        """Check if the archive has the member name."""
+        if self._zip is not None:
+            return name in self._zip.NameToInfo
+        return name in self.index["members"]
+
+    @property
+    def banks(self) -> Dict[str, Dict[str, List[str]]]:
+        """The members with the production and test specs of each org number."""
+        return self.index["banks"]
+
+    def read(self, name: str) -> bytes:
+        """Return the content of the member name, raising KeyError if missing."""
+        if self._zip is not None:
+            return self._zip.read(name)
+        offset, size = self.index["members"][name]
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def spec(self, orgnummer: str, production: bool = True, template: int = 0) -> dict:
+        """Return the spec of the bank with orgnummer.
+
+        Args:
+            orgnummer: the org number of the bank
+            production: True for the production spec, False for the test spec
+            template: the index of the template, when there are more than one
+
+        Returns:
+            the spec
+
+        Raises:
+            KeyError: if the bank has no such spec in the archive
+        """
+        environment = "production" if production else "test"
+        specs = self.banks.get(orgnummer, {}).get(environment, [])
+        if template >= len(specs):
+            raise KeyError(f"No {environment} spec of >{orgnummer}< in the archive")
+        return json.loads(self.read(specs[template]))
+
+    def _read_index(self) -> Dict[str, Any]:
+        """Read the index of the archive."""
+        if self.format == "zip":
+            self._zip = zipfile.ZipFile(self._file)
+            return json.loads(self._zip.read(INDEX_NAME))
+        self._file.seek(_tar_index_offset(self._file))
+        info = tarfile.TarInfo.frombuf(
+            self._file.read(tarfile.BLOCKSIZE), tarfile.ENCODING, "surrogateescape"
+        )
+        return json.loads(self._file.read(info.size))
+
+
+def _members(directory: str) -> List[str]:
+    """Return the paths of the files in directory, except hidden ones, sorted."""
+    members = []
+    for root, directories, filenames in os.walk(directory):
+        directories[:] = [d for d in directories if not d.startswith(".")]
+        relative = os.path.relpath(root, directory)
+        for filename in filenames:
+            if not filename.startswith("."):
+                members.append(
+                    posixpath.normpath(
+                        posixpath.join(*relative.split(os.sep), filename)
+                    )
+                )
+    return sorted(members)
+
+
+def _bank_index(catalogs: Dict[str, bytes]) -> Dict[str, Any]:
+    """Return the index of the specs of each bank, from the json catalogs."""
+    banks: Dict[str, Dict[str, List[str]]] = {}
+    for environment, catalog_name in _CATALOGS.items():
+        if catalog_name not in catalogs:
+            continue
+        catalog = decode_catalog(catalogs[catalog_name])
+        for api in catalog.apis:
+            if not api.url.startswith(SPECS_URL):
+                continue
+            bank = banks.setdefault(
+                publisher_orgnummer(api), {"production": [], "test": []}
+            )
+            bank[environment].append(api.url[len(SPECS_URL) :])
+    return {"version": __version__, "catalogs": _CATALOGS, "banks": banks}
+
+
+def _zip_info(name: str) -> zipfile.ZipInfo:
+    """Return the header of a deflated zip member without a timestamp."""
+    info = zipfile.ZipInfo(name, date_time=_ZIP_DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def _tar_index_offset(archivefile: BinaryIO) -> int:
+    """Return the offset of the header of the index, the last member of a tar archive.
+
+    The archive is read backwards from its end, a chunk at a time, until the
+    header of the index is found.
+
+    Args:
+        archivefile: the tar archive
+
+    Returns:
+        the offset of the header
+
+    Raises:
+        KeyError: if the archive has no index
+    """
+    name = INDEX_NAME.encode("utf-8") + b"\0"
+    position = archivefile.seek(0, os.SEEK_END)
+    position -= position % tarfile.BLOCKSIZE
+    while position > 0:
+        start = max(0, position - _CHUNK_SIZE)
+        archivefile.seek(start)
+        chunk = archivefile.read(position - start)
+        for offset in range(len(chunk) - tarfile.BLOCKSIZE, -1, -tarfile.BLOCKSIZE):
+            if chunk.startswith(name, offset):
+                return start + offset
+        position = start
+    raise KeyError(INDEX_NAME)
+
+
+def _tar_info(name: str, size: int) -> tarfile.TarInfo:
+    """Return the header of a tar member without a timestamp or owner."""
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mode = 0o644
+    info.mtime = 0
+    return info
+
+
+def _padded(size: int) -> int:
+    """Return size rounded up to whole tar blocks."""
+    return -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+
+
+def _read(directory: str, member: str) -> bytes:
+    """Return the content of the member in directory."""
+    with open(os.path.join(directory, member), "rb") as memberfile:
+        return memberfile.read()
+
+
+def _encode(index: Dict[str, Any]) -> bytes:
+    """Encode the index as json."""
+    return json.dumps(index, ensure_ascii=False, indent=2, sort_keys=True).encode(
+        "utf-8"
+    )
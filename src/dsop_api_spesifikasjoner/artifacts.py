@@ -0,0 +1,207 @@
+"""Module for writing minified and pre-compressed versions of the outputs.
+
+The artifacts of a json output are its minified copy, with MINIFIED_SUFFIX
+in place of .json, and the compressed versions of the output and of the
+minified copy, named by adding .gz or .br. The artifacts of other outputs,
+like the rdf catalogs, are their compressed versions. A static server can
+then send the compressed bytes of a file as they are.
+
+The digest of the output each artifact was made from is kept in
+ARTIFACTS_FILENAME, and the artifacts of an output are only made again when
+the output has changed. They are made concurrently, as both zlib and brotli
+release the GIL while compressing.
+
+Example:
+    >>> writer = ArtifactWriter("specs/", True, ["gz"])
+    >>> writer.write(["dsop_catalog.json"], "specs/", staging_directory)
+    >>> writer.manifest.save()
+"""
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import hashlib
+import json
+import os
+from typing import Iterable, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from . import __version__
+from .manifest import input_digest, Manifest
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .archive import ArchiveWriter
+
+ARTIFACTS_FILENAME = ".dsop_artifacts.json"
+COMPRESSIONS = ("gz", "br")
+MINIFIED_SUFFIX = ".min.json"
+
+
+def brotli_available() -> bool:
+    """Check if the optional Brotli package is installed."""
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def minify(content: bytes) -> bytes:
+    """Return json content without whitespace between its tokens."""
+    return json.dumps(
+        json.loads(content), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def compress(content: bytes, compression: str) -> bytes:
+    """Compress content with "gz" or "br", at the highest level.
+
+    Args:
+        content: the content
+        compression: the compression, one of COMPRESSIONS
+
+    Returns:
+        the compressed content, the same for the same content
+
+    Raises:
+        ValueError: if compression is not one of COMPRESSIONS
+    """
+    if compression == "gz":
+        return gzip.compress(content, compresslevel=9, mtime=0)
+    if compression == "br":
+        import brotli
+
+        return brotli.compress(content, quality=11)
+    raise ValueError(f"Unknown compression >{compression}<")
+
+
+def artifact_names(
+    filename: str, minified: bool, compressions: Sequence[str]
+) -> List[str]:
+    """Return the names of the artifacts of the output filename."""
+    sources = [filename]
+    if minified and filename.endswith(".json"):
+        sources.append(_minified_name(filename))
+    names = sources[1:]
+    names.extend(
+        f"{source}.{compression}" for source in sources for compression in compressions
+    )
+    return names
+
+
+def artifacts(
+    filename: str, content: bytes, minified: bool, compressions: Sequence[str]
+) -> List[Tuple[str, bytes]]:
+    """Return the name and content of each artifact of the output filename.
+
+    Args:
+        filename: the name of the output
+        content: the content of the output
+        minified: make a minified copy of a json output
+        compressions: the compressions to make of the output and its copy
+
+    Returns:
+        the artifacts, in the order of artifact_names
+    """
+    sources = [(filename, content)]
+    if minified and filename.endswith(".json"):
+        sources.append((_minified_name(filename), minify(content)))
+    results = sources[1:]
+    results.extend(
+        (f"{name}.{compression}", compress(source, compression))
+        for name, source in sources
+        for compression in compressions
+    )
+    return results
+
+
+class ArtifactWriter:
+    """Class writing the artifacts of the outputs that have changed."""
+
+    def __init__(
+        self,
+        directory: Optional[str],
+        minified: bool,
+        compressions: Sequence[str],
+        jobs: Optional[int] = None,
+        archive: Optional["ArchiveWriter"] = None,
+    ) -> None:
+        """Inits a writer of the artifacts in directory, or in archive.
+
+        Args:
+            directory: the output directory
+            minified: make a minified copy of each json output
+            compressions: the compressions to make of each output and copy
+            jobs: the number of outputs to make artifacts of at a time,
+                by default a few more than the number of cpus
+            archive: the archive the artifacts are written into, if any
+        """
+        self.minified = minified
+        self.compressions = list(compressions)
+        self.jobs = jobs
+        self.manifest = Manifest(directory, ARTIFACTS_FILENAME, archive)
+
+    def digest(self, output: str, content: bytes) -> Optional[str]:
+        """Return the digest of the artifacts of output, or None if they are current.
+
+        Args:
+            output: the name of the output
+            content: the content of the output
+
+        Returns:
+            the digest the artifacts are made from, if they must be made
+        """
+        digest = input_digest(
+            __version__,
+            self.minified,
+            self.compressions,
+            hashlib.sha256(content).hexdigest(),
+        )
+        names = artifact_names(output, self.minified, self.compressions)
+        # Each is checked, so the current ones are kept in the manifest:
+        if all([self.manifest.is_current(name, digest) for name in names]):
+            return None
+        return digest
+
+    def write(
+        self, outputs: Iterable[str], directory: str, staging_directory: str
+    ) -> int:
+        """Write the artifacts of the outputs that have changed.
+
+        Args:
+            outputs: the names of the outputs, relative to the directories
+            directory: the output directory
+            staging_directory: the directory with the outputs written by
+                this run, where the artifacts are written
+
+        Returns:
+            the number of outputs whose artifacts were written
+        """
+        pending: List[Tuple[str, bytes, str]] = []
+        for output in outputs:
+            staged = os.path.join(staging_directory, output)
+            filename = (
+                staged if os.path.exists(staged) else os.path.join(directory, output)
+            )
+            with open(filename, "rb") as outputfile:
+                content = outputfile.read()
+            digest = self.digest(output, content)
+            if digest is not None:
+                pending.append((output, content, digest))
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            made = executor.map(
+                lambda item: artifacts(
+                    item[0], item[1], self.minified, self.compressions
+                ),
+                pending,
+            )
+            for (_, _, digest), results in zip(pending, made):  # noqa: B905
+                for name, artifact in results:
+                    artifact_filename = os.path.join(staging_directory, name)
+                    os.makedirs(os.path.dirname(artifact_filename), exist_ok=True)
+                    with open(artifact_filename, "wb") as artifactfile:
+                        artifactfile.write(artifact)
+                    self.manifest.record(name, digest)
+        return len(pending)
+
+
+def _minified_name(filename: str) -> str:
+    """Return the name of the minified copy of the json file filename."""
+    return filename[: -len(".json")] + MINIFIED_SUFFIX
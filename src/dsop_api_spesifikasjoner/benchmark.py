@@ -0,0 +1,221 @@
+"""Module for benchmarking the generation of specifications and catalogs.
+
+Each case generates a synthetic bank registry with a given number of rows and
+runs the whole pipeline on it with one of the templates, using local files and
+a new template cache. The time of each phase is taken from the profile of that
+one run. The cases are run in separate processes, so that the peak memory of
+each case can be measured.
+
+Example:
+    >>> dsop_api_spesifikasjoner_benchmark -r 100 --save b.json template/*.yaml
+    >>> dsop_api_spesifikasjoner_benchmark -r 100 --baseline b.json template/*.yaml
+"""
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Sequence
+
+import click
+
+from . import __version__
+from .generateSpecification import main as generate
+
+SIZES = (100, 1000, 10000)
+HEADER = ["OrgNummer", "Navn", "Filnavn", "EndepunktProduksjon", "EndepunktTest"]
+HEADER += ["Id", "TestId"]
+
+
+def write_bank_registry(filename: str, rows: int) -> None:
+    """Write a synthetic bank registry with rows banks to filename."""
+    with open(filename, "w", encoding="utf-8", newline="") as registry:
+        writer = csv.writer(registry)
+        writer.writerow(HEADER)
+        for i in range(rows):
+            orgnummer = str(900000000 + i)
+            writer.writerow(
+                [
+                    orgnummer,
+                    f"Syntetisk Sparebank {i}",
+                    f"Syntetisk_Sparebank_{orgnummer}_Accounts-API.json",
+                    f"https://api.example.com/dsop/v1/{orgnummer}",
+                    # Every tenth bank has no test environment:
+                    f"https://api-test.example.com/dsop/v1/{orgnummer}"
+                    if i % 10
+                    else "",
+                    "",
+                    "",
+                ]
+            )
+
+
+def run_case(template_filename: str, rows: int) -> Dict[str, Any]:
+    """Run the pipeline on a synthetic registry with rows banks.
+
+    Args:
+        template_filename: the path to the template
+        rows: the number of banks in the registry
+
+    Returns:
+        the wall time of main, the time of each phase of the run and the peak
+        memory
+    """
+    template_filename = os.path.abspath(template_filename)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            return _run_case(template_filename, rows)
+        finally:
+            os.chdir(cwd)
+
+
+def _run_case(template_filename: str, rows: int) -> Dict[str, Any]:
+    """Run a case in the current directory."""
+    write_bank_registry("banker.csv", rows)
+    for subdirectory in ("specs/test", "specs/rdf"):
+        os.makedirs(subdirectory)
+    args = [
+        *("--cache-directory", "cache", "--profile", "profile.json"),
+        *("-d", "specs", template_filename, "banker.csv", "True"),
+    ]
+    start = time.perf_counter()
+    generate.main(args, standalone_mode=False)
+    wall = time.perf_counter() - start
+    with open("profile.json", "r", encoding="utf-8") as reportfile:
+        report = json.load(reportfile)
+    return {
+        "template": os.path.basename(template_filename),
+        "rows": rows,
+        "wall": wall,
+        "phases": {
+            phase: measurement["wall"]
+            for phase, measurement in report["phases"].items()
+            if measurement["calls"]
+        },
+        "peak_rss": _peak_rss(),
+    }
+
+
+def run_benchmark(
+    template_filenames: Sequence[str], sizes: Sequence[int]
+) -> List[Dict[str, Any]]:
+    """Run every case, each in a new process."""
+    results = []
+    for template_filename in template_filenames:
+        for rows in sizes:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                results.append(
+                    executor.submit(run_case, template_filename, rows).result()
+                )
+    return results
+
+
+def compare(
+    results: List[Dict[str, Any]],
+    baseline: List[Dict[str, Any]],
+    tolerance: float,
+) -> List[str]:
+    """Compare results with baseline.
+
+    Args:
+        results: the results of this run
+        baseline: the saved results of an earlier run
+        tolerance: the allowed ratio between a result and its baseline
+
+    Returns:
+        a description of every measurement that exceeds its baseline by more
+        than tolerance
+    """
+    saved = {(case["template"], case["rows"]): case for case in baseline}
+    regressions = []
+    for case in results:
+        base = saved.get((case["template"], case["rows"]))
+        if base is None:
+            continue
+        measurements = [("wall", case["wall"], base["wall"])]
+        measurements += [
+            (f"phases.{phase}", seconds, base["phases"][phase])
+            for phase, seconds in case["phases"].items()
+            if phase in base["phases"]
+        ]
+        measurements.append(("peak_rss", case["peak_rss"], base["peak_rss"]))
+        regressions += [
+            f"{case['template']} rows={case['rows']} {name}:"
+            f" {value:.4g} > {tolerance} x {base_value:.4g}"
+            for name, value, base_value in measurements
+            if base_value > 0 and value > tolerance * base_value
+        ]
+    return regressions
+
+
+@click.command()
+@click.version_option(version=__version__)
+@click.argument(
+    "templates",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "-r",
+    "--rows",
+    "sizes",
+    multiple=True,
+    default=SIZES,
+    help="The number of banks in a synthetic registry",
+    show_default=True,
+    type=click.IntRange(min=1),
+)
+@click.option("--save", help="Save the results to this file", type=click.Path())
+@click.option(
+    "--baseline",
+    help="Compare the results with the results saved in this file",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--tolerance",
+    default=1.2,
+    help="The allowed ratio between a result and its baseline",
+    show_default=True,
+    type=click.FloatRange(min=1),
+)
+def main(
+    templates: Sequence[str],
+    sizes: Sequence[int],
+    save: str,
+    baseline: str,
+    tolerance: float,
+) -> None:
+    """Benchmark the generation of specifications and catalogs with TEMPLATES."""
+    results = run_benchmark(templates, sizes)
+    for case in results:
+        phases = " ".join(
+            f"{phase}={seconds:.3f}s" for phase, seconds in case["phases"].items()
+        )
+        click.echo(
+            f"{case['template']} rows={case['rows']}: wall={case['wall']:.3f}s"
+            f" {phases} peak_rss={case['peak_rss'] / 2**20:.1f}MiB"
+        )
+    if save:
+        with open(save, "w", encoding="utf-8") as savefile:
+            json.dump(results, savefile, ensure_ascii=False, indent=2)
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as baselinefile:
+            regressions = compare(results, json.load(baselinefile), tolerance)
+        for regression in regressions:
+            click.echo(f"REGRESSION: {regression}", err=True)
+        if regressions:
+            sys.exit(1)
+
+
+def _peak_rss() -> int:
+    """Return the peak resident set size of this process in bytes."""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes:
+    return peak if sys.platform == "darwin" else peak * 1024
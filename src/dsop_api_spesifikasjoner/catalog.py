@@ -1,11 +1,21 @@
 """Module for Catalog class."""
 import hashlib
-from typing import List
+import json
+from json.encoder import encode_basestring
+from typing import BinaryIO, List, Optional
+
+# The url of the spec files in this repository, which the apis are at:
+SPECS_URL = (
+    "https://raw.githubusercontent.com/"
+    "Informasjonsforvaltning/dsop-api-spesifikasjoner/master/specs/"
+)
 
 
 class API:
     """Class representing a json dataservice (API)."""
 
+    __slots__ = ("identifier", "url", "conformsTo", "publisher", "endpointAvailable")
+
     def __init__(self, url: str, predefined_id: str) -> None:
         """Inits an API."""
         api_id = (
@@ -19,11 +29,15 @@ class API:
         self.url = url
         self.conformsTo: List[str] = []
         self.publisher = ""
+        # Set to False when a probe has found the endpoint failing:
+        self.endpointAvailable: Optional[bool] = None
 
 
 class Catalog:
     """Class representing a json dataservice catalog."""
 
+    __slots__ = ("identifier", "title", "description", "publisher", "apis")
+
     def __init__(self, production: bool) -> None:
         """Inits a catalog with fixed values."""
         catalog_title = "DSOP API katalog"
@@ -39,3 +53,109 @@ class Catalog:
         self.description = {"nb": "Samling av kontoopplysnings API"}
         self.publisher = "https://organization-catalog.fellesdatakatalog.digdir.no/organizations/991825827"  # noqa: B950
         self.apis: List[API] = []
+
+
+def encode_catalog(catalog: Catalog) -> bytes:
+    """Encode catalog as indented json.
+
+    The result is the same as json.dumps of the catalog and its apis as
+    dicts, with ensure_ascii=False and indent=2, but each api is written in
+    one pass without calling back into the encoder. The endpointAvailable of
+    an api is only included when it is set.
+
+    Args:
+        catalog: the catalog
+
+    Returns:
+        the catalog as utf-8 encoded json
+    """
+    header = _encode_header(catalog)
+    if not catalog.apis:
+        return (header + "]\n}").encode("utf-8")
+    apis = ",\n".join(_encode_api(api) for api in catalog.apis)
+    return (header + "\n" + apis + "\n  ]\n}").encode("utf-8")
+
+
+class CatalogWriter:
+    """Class writing a catalog to a file one api at a time.
+
+    The file has the same content as encode_catalog of the catalog with all
+    the written apis, without holding the apis in memory.
+    """
+
+    def __init__(self, file: BinaryIO, catalog: Catalog) -> None:
+        """Inits a writer on file and writes the fields of catalog."""
+        self.file = file
+        self.apis = 0
+        file.write(_encode_header(catalog).encode("utf-8"))
+
+    def write(self, api: API) -> None:
+        """Write api to the apis of the catalog."""
+        separator = ",\n" if self.apis else "\n"
+        self.file.write((separator + _encode_api(api)).encode("utf-8"))
+        self.apis += 1
+
+    def close(self) -> None:
+        """Write the end of the catalog."""
+        self.file.write(b"\n  ]\n}" if self.apis else b"]\n}")
+
+
+def decode_catalog(content: bytes) -> Catalog:
+    """Decode a catalog encoded as json by encode_catalog."""
+    decoded = json.loads(content)
+    catalog = Catalog(production=True)
+    catalog.identifier = decoded["identifier"]
+    catalog.title = decoded["title"]
+    catalog.description = decoded["description"]
+    catalog.publisher = decoded["publisher"]
+    for item in decoded["apis"]:
+        api = API(item["url"], "")
+        api.identifier = item["identifier"]
+        api.conformsTo = list(item["conformsTo"])
+        api.publisher = item["publisher"]
+        api.endpointAvailable = item.get("endpointAvailable")
+        catalog.apis.append(api)
+    return catalog
+
+
+def _encode_header(catalog: Catalog) -> str:
+    """Encode the fields of catalog, up to the start of its apis."""
+    header = json.dumps(
+        {
+            "identifier": catalog.identifier,
+            "title": catalog.title,
+            "description": catalog.description,
+            "publisher": catalog.publisher,
+        },
+        ensure_ascii=False,
+        indent=2,
+    )
+    return header[:-2] + ',\n  "apis": ['
+
+
+def _encode_api(api: API) -> str:
+    """Encode api as json, indented as an item of the apis of a catalog."""
+    if api.conformsTo:
+        conforms_to = (
+            "[\n        "
+            + ",\n        ".join(map(encode_basestring, api.conformsTo))
+            + "\n      ]"
+        )
+    else:
+        conforms_to = "[]"
+    return (
+        '    {\n      "identifier": '
+        + encode_basestring(api.identifier)
+        + ',\n      "url": '
+        + encode_basestring(api.url)
+        + ',\n      "conformsTo": '
+        + conforms_to
+        + ',\n      "publisher": '
+        + encode_basestring(api.publisher)
+        + (
+            ""
+            if api.endpointAvailable is None
+            else ',\n      "endpointAvailable": ' + json.dumps(api.endpointAvailable)
+        )
+        + "\n    }"
+    )
@@ -0,0 +1,196 @@
+"""Module for sharing the paths and components of specs in a common document.
+
+In the shared-components mode, the paths and components of the template are
+written once, to SHARED_FILENAME. Each bank spec then only carries its own
+info and servers, and references the shared path items and components. The
+references are resolved again by bundling, which gives the self-contained
+spec.
+
+Example:
+    >>> dsop_api_spesifikasjoner_bundle specs -o bundled
+"""
+import json
+import os
+from typing import Any, Callable, Dict, Iterator
+from urllib.parse import quote, unquote
+
+import click
+
+from . import __version__
+from .render import encode
+
+SHARED_FILENAME = "dsop_api_components.json"
+_SHARED_KEYS = ("openapi", "info", "paths", "components")
+
+
+def shared_document(template: dict) -> dict:
+    """Return the document with the paths and components shared by the specs."""
+    return {key: template[key] for key in _SHARED_KEYS if key in template}
+
+
+def reference_spec(spec: dict, shared_reference: str) -> dict:
+    """Return spec with its paths and components referencing the shared document.
+
+    Args:
+        spec: the bank specific specification
+        shared_reference: the location of the shared document, relative to
+            where the spec is written
+
+    Returns:
+        the spec with a reference in place of every path item and component
+    """
+    result = dict(spec)
+    if isinstance(spec.get("paths"), dict):
+        result["paths"] = {
+            path: _reference(shared_reference, "paths", path) for path in spec["paths"]
+        }
+    if isinstance(spec.get("components"), dict):
+        result["components"] = {
+            section: {
+                name: _reference(shared_reference, "components", section, name)
+                for name in entries
+            }
+            if isinstance(entries, dict)
+            else entries
+            for section, entries in spec["components"].items()
+        }
+    return result
+
+
+def has_shared_references(spec: dict) -> bool:
+    """Check if any path item or component of spec references another document."""
+    return any(_is_shared_reference(value) for value in _referable_values(spec))
+
+
+def bundle(spec: dict, load: Callable[[str], Any]) -> dict:
+    """Resolve the references of spec to other documents.
+
+    Only path items and components that are references as a whole are
+    resolved, which are the references written by reference_spec.
+
+    Args:
+        spec: the spec
+        load: a function returning the document at a location, relative to
+            the spec
+
+    Returns:
+        the self-contained spec, or spec itself if it has no references
+    """
+    if not has_shared_references(spec):
+        return spec
+    result = dict(spec)
+    if isinstance(spec.get("paths"), dict):
+        result["paths"] = {
+            path: _resolve(item, load) for path, item in spec["paths"].items()
+        }
+    if isinstance(spec.get("components"), dict):
+        result["components"] = {
+            section: {name: _resolve(entry, load) for name, entry in entries.items()}
+            if isinstance(entries, dict)
+            else entries
+            for section, entries in spec["components"].items()
+        }
+    return result
+
+
+def bundle_directory(source: str, target: str) -> int:
+    """Bundle every spec under source with shared references into target.
+
+    Args:
+        source: the directory of the specs
+        target: the directory to write the bundled specs to, with the same
+            relative paths, which may be source itself
+
+    Returns:
+        the number of specs bundled
+    """
+    documents: Dict[str, Any] = {}
+
+    def load_relative_to(directory: str) -> Callable[[str], Any]:
+        def load(location: str) -> Any:
+            filename = os.path.normpath(os.path.join(directory, location))
+            if filename not in documents:
+                with open(filename, "r", encoding="utf-8") as document:
+                    documents[filename] = json.load(document)
+            return documents[filename]
+
+        return load
+
+    bundled = 0
+    for filename in _spec_files(source):
+        with open(filename, "r", encoding="utf-8") as specfile:
+            spec = json.load(specfile)
+        if not isinstance(spec, dict) or not has_shared_references(spec):
+            continue
+        spec = bundle(spec, load_relative_to(os.path.dirname(filename)))
+        target_filename = os.path.join(target, os.path.relpath(filename, source))
+        os.makedirs(os.path.dirname(target_filename), exist_ok=True)
+        with open(target_filename, "wb") as outfile:
+            outfile.write(encode(spec))
+        bundled += 1
+    return bundled
+
+
+@click.command()
+@click.version_option(version=__version__)
+@click.argument(
+    "directory", type=click.Path(exists=True, file_okay=False, readable=True)
+)
+@click.option(
+    "-o",
+    "--output",
+    help="The directory to write the bundled specifications to [default: DIRECTORY]",
+    type=click.Path(file_okay=False, writable=True),
+)
+def main(directory: str, output: str) -> None:
+    """Bundle the specifications in DIRECTORY into self-contained files."""
+    bundled = bundle_directory(directory, output or directory)
+    click.echo(f"Bundled {bundled} specifications")
+
+
+def _reference(shared_reference: str, *tokens: str) -> Dict[str, str]:
+    """Return a reference to the json pointer of tokens in the shared document."""
+    pointer = "".join(
+        "/" + token.replace("~", "~0").replace("/", "~1") for token in tokens
+    )
+    # A json pointer in a uri fragment is percent-encoded:
+    return {"$ref": f"{shared_reference}#{quote(pointer, safe='/~')}"}
+
+
+def _resolve(value: Any, load: Callable[[str], Any]) -> Any:
+    """Return the value referenced by value, if it references another document."""
+    if not _is_shared_reference(value):
+        return value
+    location, _, pointer = value["$ref"].partition("#")
+    resolved = load(location)
+    for token in unquote(pointer).split("/")[1:]:
+        resolved = resolved[token.replace("~1", "/").replace("~0", "~")]
+    return resolved
+
+
+def _is_shared_reference(value: Any) -> bool:
+    """Check if value is, as a whole, a reference to another document."""
+    return (
+        isinstance(value, dict)
+        and len(value) == 1
+        and isinstance(value.get("$ref"), str)
+        and not value["$ref"].startswith("#")
+    )
+
+
+def _referable_values(spec: dict) -> Iterator[Any]:
+    """Iterate over the path items and components of spec."""
+    if isinstance(spec.get("paths"), dict):
+        yield from spec["paths"].values()
+    if isinstance(spec.get("components"), dict):
+        for entries in spec["components"].values():
+            if isinstance(entries, dict):
+                yield from entries.values()
+
+
+def _spec_files(directory: str) -> Iterator[str]:
+    """Iterate over the json files under directory, except shared documents."""
+    for root, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            if filename.endswith(".json") and filename != SHARED_FILENAME:
+                yield os.path.join(root, filename)
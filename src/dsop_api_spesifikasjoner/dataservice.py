@@ -0,0 +1,113 @@
+"""Module for creating dataservice triples of specs generated from a template."""
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from datacatalogtordf import URI
+from oastodcat import OASDataService
+from oastodcat.oas_dataservice import create_id
+from rdflib import BNode, Literal, URIRef
+from rdflib.namespace import DCTERMS
+from rdflib.term import Node
+
+from .rdfwriter import Triple
+from .render import is_overlay
+
+_PROTOTYPE_BASE = "https://example.com/dsop-api-spesifikasjoner/prototype"
+_PROTOTYPE_URL = f"{_PROTOTYPE_BASE}/specification.json"
+_PROTOTYPE_ENDPOINT = f"{_PROTOTYPE_BASE}/endpoint"
+_PROTOTYPE_IDENTIFIER = f"{_PROTOTYPE_BASE}/dataservice"
+_PROTOTYPE_PUBLISHER = f"{_PROTOTYPE_BASE}/publisher"
+_PROTOTYPE_TITLE = "@@dsop-api-spesifikasjoner:info.title@@"
+
+
+class TemplateDataServices:
+    """Class creating the dataservice triples of specs generated from a template.
+
+    The template is mapped to a dataservice by oastodcat once, with
+    placeholders for the fields that differ between banks. The triples of a
+    bank's dataservices are then the triples of this prototype with the
+    placeholders substituted, which gives the same graph as mapping the
+    bank's spec with OASDataService.
+    """
+
+    def __init__(self, template: dict) -> None:
+        """Inits the prototype dataservice of template."""
+        self.template = template
+        spec = dict(template)
+        spec["info"] = dict(template["info"])
+        spec["info"]["title"] = _PROTOTYPE_TITLE
+        spec["servers"] = [{"url": _PROTOTYPE_ENDPOINT}]
+        oas_spec = OASDataService(_PROTOTYPE_URL, spec, _PROTOTYPE_IDENTIFIER)
+        oas_spec.publisher = _PROTOTYPE_PUBLISHER
+        (dataservice,) = oas_spec.dataservices
+        self.prototype: List[Triple] = list(dataservice._to_graph())
+
+    def matches(self, spec: dict) -> bool:
+        """Check if spec is generated from the template."""
+        return (
+            isinstance(spec, dict)
+            and is_overlay(spec, self.template)
+            and isinstance(spec["servers"], list)
+            and all(isinstance(server, dict) for server in spec["servers"])
+        )
+
+    def dataservices(
+        self,
+        url: str,
+        spec: dict,
+        identifier: str,
+        publisher: str,
+        conforms_to: List[str],
+    ) -> Iterator[Tuple[URIRef, List[Triple]]]:
+        """Create the dataservices of a spec generated from the template.
+
+        Args:
+            url: the url of the spec
+            spec: the spec, which must match the template
+            identifier: the identifier (template) of the dataservices
+            publisher: the publisher of the dataservices
+            conforms_to: the standards the dataservices conform to
+
+        Yields:
+            the identifier and the triples of each dataservice
+        """
+        title = spec["info"]["title"]
+        for server in spec["servers"]:
+            if "url" not in server:
+                continue
+            dataservice = URIRef(
+                URI(identifier.format(id=create_id(title + server["url"])))
+            )
+            substitutions: Dict[Node, Node] = {
+                URIRef(_PROTOTYPE_IDENTIFIER): dataservice,
+                URIRef(_PROTOTYPE_ENDPOINT): URIRef(URI(server["url"])),
+                URIRef(_PROTOTYPE_URL): URIRef(URI(url)),
+                URIRef(_PROTOTYPE_PUBLISHER): URIRef(URI(publisher)),
+                Literal(_PROTOTYPE_TITLE, lang="en"): Literal(title, lang="en"),
+            }
+            triples = [
+                (
+                    _substitute(s, substitutions),
+                    p,
+                    _substitute(o, substitutions),
+                )
+                for s, p, o in self.prototype
+            ]
+            triples.extend(
+                (dataservice, DCTERMS.conformsTo, URIRef(URI(standard)))
+                for standard in conforms_to
+            )
+            yield dataservice, triples
+
+
+def _substitute(node: Node, substitutions: Dict[Node, Node]) -> Node:
+    """Substitute node, giving every blank node a fresh label."""
+    if isinstance(node, BNode):
+        substitutions[node] = substitutions.get(node) or BNode()
+    return substitutions.get(node, node)
+
+
+def find_template(
+    spec: dict, templates: List[TemplateDataServices]
+) -> Optional[TemplateDataServices]:
+    """Return the first of templates that spec is generated from."""
+    return next((template for template in templates if template.matches(spec)), None)
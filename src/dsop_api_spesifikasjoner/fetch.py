@@ -0,0 +1,202 @@
+"""Module for fetching remote openAPI specifications."""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, Optional, TYPE_CHECKING
+
+from .template import load_yaml
+
+if TYPE_CHECKING:  # pragma: no cover
+    import requests
+
+
+class FetchResult:
+    """Class representing the outcome of fetching one specification."""
+
+    def __init__(
+        self,
+        url: str,
+        spec: Optional[dict] = None,
+        error: Optional[str] = None,
+        from_cache: bool = False,
+    ) -> None:
+        """Inits a result with either a spec or an error."""
+        self.url = url
+        self.spec = spec
+        self.error = error
+        self.from_cache = from_cache
+
+
+class SpecFetcher:
+    """Class fetching specifications concurrently over a pooled session.
+
+    Failed requests are retried with exponential backoff. If a cache directory
+    is given, responses are kept there together with their ETag and
+    Last-Modified headers, and later requests are conditional so that
+    unchanged specifications are not downloaded again. The session, and with
+    it requests, is not loaded until the first specification is fetched.
+    """
+
+    def __init__(
+        self,
+        cache_directory: Optional[str] = None,
+        concurrency: int = 8,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = 5,
+    ) -> None:
+        """Inits a fetcher with a session pooling up to concurrency connections."""
+        self.cache_directory = cache_directory
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._session: Optional["requests.Session"] = None
+
+    @property
+    def session(self) -> "requests.Session":
+        """The pooled session, created when first needed."""
+        if self._session is None:
+            self._session = create_session(
+                self.concurrency, self.retries, self.backoff_factor
+            )
+        return self._session
+
+    def fetch_all(self, urls: Iterable[str]) -> Dict[str, FetchResult]:
+        """Fetch the specifications at urls, at most concurrency at a time.
+
+        Args:
+            urls: the urls of the specifications
+
+        Returns:
+            the result for each of the urls
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        if not unique_urls:
+            return {}
+        # Create the session before the threads share it:
+        session = self.session
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return {
+                result.url: result
+                for result in executor.map(
+                    lambda url: self.fetch(url, session), unique_urls
+                )
+            }
+
+    def fetch(
+        self, url: str, session: Optional["requests.Session"] = None
+    ) -> FetchResult:
+        """Fetch and parse the specification at url."""
+        import requests
+
+        cached = self._read_cache(url)
+        headers = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            with (session or self.session).get(
+                url, headers=headers, timeout=self.timeout
+            ) as response:
+                if response.status_code == 304 and "body" in cached:
+                    return _parse(url, cached["body"], from_cache=True)
+                if response.status_code != 200:
+                    return FetchResult(
+                        url, error=f"HTTP status code {response.status_code}"
+                    )
+                body = response.text
+                self._write_cache(
+                    url,
+                    {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "body": body,
+                    },
+                )
+        except requests.RequestException as e:
+            return FetchResult(url, error=f"{type(e).__name__}: {e}")
+        return _parse(url, body)
+
+    def _cache_filename(self, url: str) -> Optional[str]:
+        if self.cache_directory is None:
+            return None
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_directory, f"{key}.json")
+
+    def _read_cache(self, url: str) -> dict:
+        filename = self._cache_filename(url)
+        if filename is None:
+            return {}
+        try:
+            with open(filename, "r", encoding="utf-8") as cachefile:
+                entry = json.load(cachefile)
+        except (OSError, ValueError):
+            return {}
+        return entry if isinstance(entry, dict) and entry.get("url") == url else {}
+
+    def _write_cache(self, url: str, entry: dict) -> None:
+        filename = self._cache_filename(url)
+        if filename is None or not (entry["etag"] or entry["last_modified"]):
+            return
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # Write to a temporary file first, as other threads may read the entry:
+        temporary_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(temporary_filename, "w", encoding="utf-8") as cachefile:
+            json.dump({"url": url, **entry}, cachefile, ensure_ascii=False)
+        os.replace(temporary_filename, filename)
+
+
+def create_session(
+    concurrency: int,
+    retries: int,
+    backoff_factor: float,
+    methods: Iterable[str] = ("GET",),
+    statuses: Iterable[int] = (429, 500, 502, 503, 504),
+) -> "requests.Session":
+    """Create a session pooling up to concurrency connections.
+
+    Args:
+        concurrency: the number of connections to keep for each host
+        retries: the number of times to retry a failed request
+        backoff_factor: the factor of the exponential backoff between retries
+        methods: the http methods to retry
+        statuses: the status codes to retry
+
+    Returns:
+        the session
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=tuple(statuses),
+        allowed_methods=frozenset(methods),
+    )
+    adapter = HTTPAdapter(
+        pool_connections=concurrency,
+        pool_maxsize=concurrency,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _parse(url: str, body: str, from_cache: bool = False) -> FetchResult:
+    """Parse body as a yaml (or json) specification."""
+    import yaml
+
+    try:
+        spec = load_yaml(body)
+    except yaml.YAMLError as e:
+        return FetchResult(url, error=f"Not valid yaml or json: {e}")
+    if not isinstance(spec, dict):
+        return FetchResult(url, error="Not an openAPI specification")
+    return FetchResult(url, spec=spec, from_cache=from_cache)
@@ -1,22 +1,90 @@
-"""Module for generate openAPI specifications."""
+"""Module for generate openAPI specifications.
 
-import copy
-import csv
+rdflib, datacatalogtordf and oastodcat are slow to import, and are only
+imported by the functions creating the rdf catalogs. Likewise, the lookup
+module and sqlite3 are only imported with --lookup-store.
+"""
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+import filecmp
+import hashlib
+import io
 import json
 import os
-from pathlib import Path
+import posixpath
 import sys
-from typing import Any, List
+import time
+from types import TracebackType
+from typing import (
+    AbstractSet,
+    Any,
+    BinaryIO,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TYPE_CHECKING,
+    Union,
+)
+from urllib.parse import urljoin
 
 import click
-import datacatalogtordf
-from oastodcat import OASDataService
-from rdflib.graph import Graph, URIRef
-from requests import get
-import yaml
 
 from . import __version__
-from .catalog import API, Catalog
+from .artifacts import (
+    artifact_names,
+    artifacts,
+    ArtifactWriter,
+    brotli_available,
+    COMPRESSIONS,
+    MINIFIED_SUFFIX,
+)
+from .catalog import API, Catalog, CatalogWriter, encode_catalog, SPECS_URL
+from .components import (
+    bundle,
+    has_shared_references,
+    reference_spec,
+    shared_document,
+    SHARED_FILENAME,
+)
+from .fetch import FetchResult, SpecFetcher
+from .manifest import input_digest, Manifest
+from .profiling import profiled, profiler
+from .registry import iter_registry, read_registry, RegistryError
+from .render import encode, SpecRenderer
+from .shards import encode_shard_index, SHARD_BY, shard_catalog
+from .staging import StagedOutput
+from .template import default_cache_directory, load_yaml, Template
+from .validation import (
+    validate,
+    validate_substituted,
+    validate_template,
+    ValidationError,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from rdflib.graph import Graph
+
+    from .archive import ArchiveWriter
+    from .dataservice import TemplateDataServices
+    from .lookup import LookupEntry
+    from .rdfwriter import RDFWriter, Triple
+
+ACCOUNTS_API_STANDARD = "https://bitsnorge.github.io/dsop-accounts-api"
+# The seconds between each check for changes with --watch:
+WATCH_INTERVAL = 0.2
+# The number of outputs whose artifacts are made ahead of being written into
+# an archive:
+ARTIFACTS_AHEAD = 16
 
 
 @click.command()
@@ -36,80 +104,1638 @@ from .catalog import API, Catalog
         writable=True,
     ),
 )
+@click.option(
+    "--pattern",
+    default="{filename}",
+    help=(
+        "The name of the specification of each bank, with the fields filename"
+        " (Filnavn), stem (Filnavn without extension) and orgnummer"
+    ),
+    show_default=True,
+)
+@click.option(
+    "--conforms-to",
+    default=ACCOUNTS_API_STANDARD,
+    help="The standard the specifications conform to",
+    show_default=True,
+)
+@click.option(
+    "-a",
+    "--add-template",
+    "additional_templates",
+    multiple=True,
+    nargs=3,
+    type=(click.File("r"), str, str),
+    metavar="TEMPLATE PATTERN CONFORMS_TO",
+    help=(
+        "Also write the specifications of TEMPLATE, named by PATTERN and"
+        " conforming to CONFORMS_TO, and add them to the same catalogs"
+    ),
+)
+@click.option(
+    "-j",
+    "--jobs",
+    default=1,
+    help="The number of processes generating and writing specifications",
+    show_default=True,
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help=(
+        "Only write the outputs whose inputs have changed since the last run,"
+        " as recorded in a manifest in the output directory"
+    ),
+)
+@click.option(
+    "--cache-directory",
+    default=lambda: default_cache_directory(),
+    help="The directory caching remote specifications between runs",
+    show_default="~/.cache/dsop_api_spesifikasjoner",
+    type=click.Path(file_okay=False, writable=True),
+)
+@click.option(
+    "--rdf-stream",
+    help=(
+        "Stream the rdf catalogs to file in this format as each api is"
+        " processed, instead of serializing a graph of the whole catalog"
+    ),
+    # The formats of rdfwriter.RDF_FORMATS:
+    type=click.Choice(["turtle", "ntriples"]),
+)
+@click.option(
+    "--profile",
+    help=(
+        "Write a json report of the time, calls and bytes written of each"
+        " phase and of the slowest banks to this file"
+    ),
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "--cprofile",
+    help="Run under cProfile and dump the stats to this .pstats file",
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "--shared-components",
+    is_flag=True,
+    help=(
+        f"Write the paths and components of the template once, to {SHARED_FILENAME},"
+        " and reference them from the specification of each bank"
+    ),
+)
+@click.option(
+    "--validate",
+    "validate_specs",
+    is_flag=True,
+    help=(
+        "Validate the templates against the openAPI 3.0 schema, the title and"
+        " servers of the specification of each bank, and every other"
+        " specification in the output directory before writing anything"
+    ),
+)
+@click.option(
+    "--probe-report",
+    help=(
+        "Mark the apis whose endpoint is failing in this report of"
+        " dsop_api_spesifikasjoner_probe as not available in the json catalogs"
+    ),
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--shard-by",
+    help=(
+        "Also write the catalogs in shards, one for each publisher or for each"
+        " page of --page-size apis, with an index of the shards"
+    ),
+    type=click.Choice(SHARD_BY),
+)
+@click.option(
+    "--page-size",
+    default=100,
+    help="The number of apis in each shard with --shard-by page",
+    show_default=True,
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--minify",
+    is_flag=True,
+    help=f"Also write a minified copy of each json output, as *{MINIFIED_SUFFIX}",
+)
+@click.option(
+    "--compress",
+    "compressions",
+    multiple=True,
+    help=(
+        "Also write a compressed copy of each output and minified copy, as *.gz"
+        " or *.br (br needs the Brotli package). May be given more than once"
+    ),
+    type=click.Choice(COMPRESSIONS),
+)
+@click.option(
+    "--archive",
+    help=(
+        "Write the outputs into this .tar or .zip archive as they are"
+        " generated, with an index of the specs of each bank, instead of into"
+        " the output directory. With --incremental, the outputs that are"
+        " current are copied from the existing archive"
+    ),
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "--lookup-store",
+    help=(
+        "Update this sqlite3 store of the path, digest and dataservice"
+        " identifier of each spec, for dsop_api_spesifikasjoner_lookup"
+    ),
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help=(
+        "Read the bank registry one row at a time, and write the specifications"
+        " and the json and rdf catalog entries of each bank before reading the"
+        " next, so the memory used does not grow with the number of banks."
+        " Implies --rdf-stream turtle, unless given"
+    ),
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help=(
+        "Keep running, and update the outputs whenever a template or the bank"
+        " registry changes. Each update only writes the specifications that have"
+        " changed and removes those of removed banks, but rebuilds the catalogs"
+        " in full"
+    ),
+)
 def main(
-    template: Any, input: Any, directory: Any, use_local_files: bool = True
+    template: Any,
+    input: Any,
+    directory: Any,
+    use_local_files: bool = True,
+    jobs: int = 1,
+    incremental: bool = False,
+    cache_directory: Optional[str] = None,
+    rdf_stream: Optional[str] = None,
+    profile: Optional[str] = None,
+    cprofile: Optional[str] = None,
+    shared_components: bool = False,
+    pattern: str = "{filename}",
+    conforms_to: str = ACCOUNTS_API_STANDARD,
+    additional_templates: Sequence[Tuple[Any, str, str]] = (),
+    watch: bool = False,
+    validate_specs: bool = False,
+    probe_report: Optional[str] = None,
+    shard_by: Optional[str] = None,
+    page_size: int = 100,
+    minify: bool = False,
+    compressions: Sequence[str] = (),
+    archive: Optional[str] = None,
+    lookup_store: Optional[str] = None,
+    stream: bool = False,
 ) -> None:
     """Write specification and catalog file based on template for bank."""
+    _check_options(
+        compressions, archive, stream, bool(shard_by or validate_specs), jobs
+    )
+    if stream:
+        rdf_stream = rdf_stream or "turtle"
+    arguments = [(template, pattern, conforms_to), *additional_templates]
+    template_cache_directory = (
+        os.path.join(cache_directory, "templates") if cache_directory else None
+    )
+    outputs = _template_outputs(
+        [
+            (
+                Template(file.read(), template_cache_directory, file.name),
+                pattern,
+                conforms_to,
+            )
+            for file, pattern, conforms_to in arguments
+        ],
+        shared_components,
+    )
+    fetcher = SpecFetcher(
+        os.path.join(cache_directory, "http") if cache_directory else None
+    )
+    unavailable_urls: AbstractSet[str] = frozenset()
+    if probe_report:
+        from .probe import read_failing_urls
+
+        unavailable_urls = read_failing_urls(probe_report)
+    with profiled(profile, cprofile):
+        if not watch:
+            _generate(
+                outputs,
+                input,
+                directory,
+                use_local_files,
+                jobs,
+                incremental,
+                fetcher,
+                rdf_stream,
+                shared_components,
+                archive=archive,
+                validate_specs=validate_specs,
+                unavailable_urls=unavailable_urls,
+                shard_by=shard_by,
+                page_size=page_size,
+                minify=minify,
+                compressions=compressions,
+                lookup_store=lookup_store,
+                stream=stream,
+            )
+            return
+        filenames = [file.name for file, _, _ in arguments] + [input.name]
+        for filename in filenames:
+            if not os.path.isfile(filename):
+                raise click.BadParameter(f"Cannot watch >{filename}<, not a file")
+        _watch(
+            outputs,
+            filenames,
+            # The first run is the run the user asked for, and the updates
+            # after it are incremental, with the manifest it records:
+            lambda outputs, registry, update: _generate(
+                outputs,
+                registry,
+                directory,
+                use_local_files,
+                jobs,
+                incremental or update,
+                fetcher,
+                rdf_stream,
+                shared_components,
+                archive=archive,
+                remove_stale=update,
+                record_manifest=True,
+                validate_specs=validate_specs,
+                unavailable_urls=unavailable_urls,
+                shard_by=shard_by,
+                page_size=page_size,
+                minify=minify,
+                compressions=compressions,
+                lookup_store=lookup_store,
+                stream=stream,
+            ),
+        )
+
+
+def _check_options(
+    compressions: Sequence[str],
+    archive: Optional[str],
+    stream: bool,
+    needs_every_bank: bool,
+    jobs: int,
+) -> None:
+    """Check that the options of main can be combined.
+
+    Args:
+        compressions: the compressions to write the outputs with
+        archive: the archive to write the outputs into, if any
+        stream: write the outputs of each bank before reading the next
+        needs_every_bank: the catalogs are sharded or the specs validated
+        jobs: the number of processes writing specs
+
+    Raises:
+        BadParameter: if an option cannot be used
+    """
+    if "br" in compressions and not brotli_available():
+        raise click.BadParameter(
+            "--compress br needs the Brotli package, installed with the brotli extra"
+        )
+    if stream and (needs_every_bank or jobs > 1):
+        raise click.BadParameter(
+            "--stream cannot be combined with --shard-by, --validate or --jobs"
+            " above 1, which need every bank before writing"
+        )
+    if archive:
+        from .archive import archive_format
+
+        if archive_format(archive) is None:
+            raise click.BadParameter(f"Not a .tar or .zip archive >{archive}<")
+
+
+def _generate(
+    outputs: List["_TemplateOutput"],
+    input: Any,
+    directory: Any,
+    use_local_files: bool,
+    jobs: int,
+    incremental: bool,
+    fetcher: SpecFetcher,
+    rdf_stream: Optional[str],
+    shared_components: bool,
+    remove_stale: bool = False,
+    validate_specs: bool = False,
+    unavailable_urls: AbstractSet[str] = frozenset(),
+    shard_by: Optional[str] = None,
+    page_size: int = 100,
+    minify: bool = False,
+    compressions: Sequence[str] = (),
+    lookup_store: Optional[str] = None,
+    stream: bool = False,
+    archive: Optional[str] = None,
+    record_manifest: bool = False,
+) -> None:
+    """Write specification and catalog file based on the templates for bank.
+
+    The bank registry is validated before anything is written. The outputs
+    are written to a staging directory, and only moved into directory when
+    all of them have been written, or written into a new archive as they are
+    generated, which replaces archive when all of them have been written.
+    When streaming, each row of the registry is validated as it is read, and
+    the outputs are discarded if any row has errors.
+
+    Args:
+        outputs: the templates, with the names and standard of their specs
+        input: the bank registry
+        directory: the output directory
+        use_local_files: read the specs in this repository from local files
+        jobs: the number of processes writing specs
+        incremental: only write the outputs whose inputs have changed
+        fetcher: the fetcher of remote specs
+        rdf_stream: the format to stream the rdf catalogs in, if any
+        shared_components: reference the paths and components of the
+            templates in shared documents
+        remove_stale: remove the outputs written by the last incremental
+            run that this run has not written
+        validate_specs: validate the specs before writing anything
+        unavailable_urls: the endpoints to mark as not available in the
+            catalogs
+        shard_by: also write the catalogs in shards, by "orgnummer" or "page"
+        page_size: the number of apis in each shard by page
+        minify: also write a minified copy of each json output
+        compressions: also write the outputs and copies compressed with these
+        lookup_store: the sqlite3 store to update with the specs, if any
+        stream: write the specs and catalog entries of each bank before
+            reading the next, with the rdf catalogs streamed as rdf_stream
+        archive: the .tar or .zip archive to write the outputs into, if any
+        record_manifest: save a manifest of the outputs even if not
+            incremental, for the incremental runs after this one
+    """
+    banks = (
+        _streamed_banks(input)
+        if stream
+        else _read_banks(outputs, input, None if archive else directory, validate_specs)
+    )
     # Add a trailing slash to directory if not there:
     directory = os.path.join(directory, "")
-    template = yaml.safe_load(template)
-    input = csv.reader(input, delimiter=",")
-    prod_catalog_filename = os.path.join(directory, "dsop_catalog.json")
-    Path("test").mkdir(parents=True, exist_ok=True)
-    test_catalog_filename = os.path.join(directory, "test", "dsop_catalog_test.json")
-    Path("rdf").mkdir(parents=True, exist_ok=True)
-    turtle_prod_catalog_filename = os.path.join(directory, "rdf", "dsop_catalog.ttl")
-    turtle_test_catalog_filename = os.path.join(
-        directory, "rdf", "dsop_catalog_test.ttl"
-    )
     prod_catalog = Catalog(production=True)
     test_catalog = Catalog(production=False)
-    # skipping first row, which is headers:
-    next(input)
-    for bank in input:
-        orgnummer = bank[0]
-        if bank[3] and len(bank[3]) > 0:  # Production
-            # Validate Prod url:
-            if bank[3].endswith("/"):
-                sys.exit(
-                    "ERROR: Trailing slash in url is not allowed >" + bank[3] + "<"
+    spec_digests: Dict[bool, List[str]] = {True: [], False: []}
+    templates = [output.template for output in outputs]
+    with ExitStack() as outputs_stack:
+        sink: "_Sink"
+        if archive:
+            from .archive import ArchiveWriter
+
+            writer = outputs_stack.enter_context(ArchiveWriter(archive))
+            sink = _ArchiveSink(writer, minify, compressions)
+            manifest = (
+                Manifest(archive=writer, load=incremental)
+                if incremental or record_manifest
+                else Manifest()
+            )
+        else:
+            sink = _DirectorySink(
+                outputs_stack.enter_context(StagedOutput(directory)),
+                directory,
+                minify,
+                compressions,
+            )
+            manifest = (
+                Manifest(directory, load=incremental)
+                if incremental or record_manifest
+                else Manifest()
+            )
+        spec_writer = _SpecWriter(templates, jobs, sink, shared_components)
+        run = _Run(
+            sink,
+            use_local_files,
+            manifest,
+            fetcher,
+            spec_writer,
+            rdf_stream,
+            outputs,
+            unavailable_urls,
+        )
+        run.lookup_entries = [] if lookup_store else None
+        catalogs = ((True, prod_catalog), (False, test_catalog))
+        with spec_writer, ExitStack() as streams:
+            catalog_streams = (
+                [
+                    streams.enter_context(
+                        _CatalogStream(
+                            catalog, production, spec_digests[production], run
+                        )
+                    )
+                    for production, catalog in catalogs
+                ]
+                if stream
+                else []
+            )
+            _add_banks(banks, catalogs, spec_digests, run, catalog_streams)
+        if shared_components:
+            for output in outputs:
+                _write_shared_document(output, run)
+
+        if not stream:
+            for production, catalog in catalogs:
+                _write_environment_catalogs(
+                    catalog,
+                    production,
+                    spec_digests[production],
+                    run,
+                    shard_by,
+                    page_size,
+                )
+        manifests = sink.close(run.manifest)
+    # The manifests of a directory are saved once the outputs they record are
+    # in place:
+    _save_manifests(manifests, directory, remove_stale)
+    _update_lookup_store(
+        lookup_store,
+        run.lookup_entries,
+        directory,
+        sink.writer.members if isinstance(sink, _ArchiveSink) else None,
+    )
+
+
+def _read_banks(
+    outputs: List["_TemplateOutput"],
+    input: Any,
+    directory: Optional[str],
+    validate_specs: bool,
+) -> List[List[str]]:
+    """Read the bank registry, and exit with its errors if it is not valid.
+
+    Args:
+        outputs: the templates, with the names and standard of their specs
+        input: the bank registry
+        directory: the output directory, if the outputs are written to one
+        validate_specs: also validate the specs, and exit with their errors
+
+    Returns:
+        the rows of the bank registry
+    """
+    try:
+        banks = read_registry(input)
+        if validate_specs:
+            _validate_specs(outputs, banks, directory)
+    except (RegistryError, ValidationError) as e:
+        sys.exit("\n".join("ERROR: " + error for error in e.errors))
+    return banks
+
+
+def _streamed_banks(input: Any) -> Iterator[List[str]]:
+    """Read the bank registry lazily, and exit with its errors once it is read."""
+    try:
+        yield from iter_registry(input)
+    except RegistryError as e:
+        sys.exit("\n".join("ERROR: " + error for error in e.errors))
+
+
+def _add_banks(
+    banks: Iterable[List[str]],
+    catalogs: Sequence[Tuple[bool, Catalog]],
+    spec_digests: Dict[bool, List[str]],
+    run: "_Run",
+    catalog_streams: Sequence["_CatalogStream"] = (),
+) -> None:
+    """Write the specs of banks and add them to the catalog of their environment.
+
+    Args:
+        banks: the rows of the bank registry
+        catalogs: the catalog of each environment
+        spec_digests: the digests of the inputs of the specs added to the
+            catalog of each environment
+        run: the run
+        catalog_streams: the streamed catalogs, which write and drop the apis
+            and digests of each bank before the next is read
+    """
+    for bank in banks:
+        for index in range(len(run.outputs)):
+            for production, catalog in catalogs:
+                digest = _add_bank_spec(bank, index, production, catalog, run)
+                if digest:
+                    spec_digests[production].append(digest)
+        for catalog_stream in catalog_streams:
+            catalog_stream.flush()
+
+
+def _validate_specs(
+    outputs: List["_TemplateOutput"], banks: List[List[str]], directory: Optional[str]
+) -> None:
+    """Validate the templates, the specs of banks and the other specs in directory.
+
+    The template of each output is validated in full, and the specs of its
+    banks only in the fields that differ from the template. The specs in
+    directory that are not written from a template are validated in full.
+
+    Args:
+        outputs: the templates, with the names and standard of their specs
+        banks: the rows of the bank registry
+        directory: the output directory, if the outputs are written to one
+
+    Raises:
+        ValidationError: if any spec is not valid
+    """
+    errors: List[str] = []
+    # The json files written from the templates:
+    written = set()
+    for output in outputs:
+        written.add(output.shared_filename)
+        template_errors = validate_template(output.template)
+        errors.extend(f"{output.template.name}#{error}" for error in template_errors)
+        if template_errors:
+            continue
+        for bank in banks:
+            for production in (True, False):
+                if not (bank[3] if production else bank[4]):
+                    continue
+                spec = _generateSpec(output.template.parsed, bank, production)
+                specification_filename = _specification_filename(
+                    output, bank, production
+                )
+                written.add(specification_filename)
+                errors.extend(
+                    f"{specification_filename}#{error}"
+                    for error in validate_substituted(spec)
+                )
+    if directory is not None:
+        errors.extend(_validate_spec_files(directory, written))
+    if errors:
+        raise ValidationError(errors)
+
+
+def _validate_spec_files(directory: str, written: AbstractSet[str]) -> List[str]:
+    """Validate the specs in directory which are not in written.
+
+    Args:
+        directory: the output directory
+        written: the specs which are validated before they are written
+
+    Returns:
+        the errors, prefixed by the spec they are found in
+    """
+    errors: List[str] = []
+    for specification_filename in _json_files(directory):
+        # The catalogs, their shards and indexes are not specs, and the
+        # minified copies are validated with the specs they are made from:
+        basename = posixpath.basename(specification_filename)
+        if (
+            specification_filename not in written
+            and not basename.startswith("dsop_catalog")
+            and not basename.endswith(MINIFIED_SUFFIX)
+        ):
+            errors.extend(
+                f"{specification_filename}#{error}"
+                for error in _validate_file(
+                    os.path.join(directory, specification_filename)
+                )
+            )
+    return errors
+
+
+def _json_files(directory: str) -> Iterator[str]:
+    """Iterate over the json files in directory, except hidden ones."""
+    for root, directories, filenames in os.walk(directory):
+        directories[:] = sorted(d for d in directories if not d.startswith("."))
+        for filename in sorted(filenames):
+            if filename.endswith(".json") and not filename.startswith("."):
+                yield posixpath.join(
+                    *os.path.split(
+                        os.path.relpath(os.path.join(root, filename), directory)
+                    )
                 )
-            spec = _generateSpec(template, bank, production=True)
-            specification_filename = bank[2]
-            specification_filedirectory = os.path.join(
-                directory, specification_filename
-            )
-            _write_spec_to_file(specification_filedirectory, spec)
-            _add_spec_to_catalog(
-                orgnummer, bank[5], specification_filename, prod_catalog
-            )
-        if bank[4] and len(bank[4]) > 0:  # Test
-            # Validate Test url:
-            if bank[4].endswith("/"):
-                sys.exit(
-                    "ERROR: Trailing slash in url is not allowed >" + bank[4] + "<"
+
+
+def _validate_file(filename: str) -> List[str]:
+    """Validate the spec in filename in full."""
+    try:
+        with open(filename, "r", encoding="utf-8") as specfile:
+            spec = json.load(specfile)
+    except (OSError, ValueError) as e:
+        return [f": Cannot read: {e}"]
+    return validate(spec)
+
+
+def _watch(
+    outputs: List["_TemplateOutput"],
+    filenames: List[str],
+    generate: Callable[[List["_TemplateOutput"], Any, bool], None],
+) -> None:
+    """Generate the outputs, and update them whenever one of filenames changes.
+
+    The templates are kept between the runs, and a template is only parsed
+    again when its text has changed. The watch ends on a keyboard interrupt.
+
+    Args:
+        outputs: the templates, with the names and standard of their specs
+        filenames: the files of the templates, followed by the bank registry
+        generate: the function generating the outputs from the templates and
+            the bank registry, and whether it is an update of an earlier run
+    """
+    signatures: Optional[List[Optional[Tuple[int, int]]]] = None
+    try:
+        while True:
+            current = [_file_signature(filename) for filename in filenames]
+            if current != signatures:
+                update = signatures is not None
+                signatures = current
+                outputs = _reload_templates(outputs, filenames[:-1])
+                _regenerate(outputs, filenames[-1], generate, update)
+            time.sleep(WATCH_INTERVAL)
+    except KeyboardInterrupt:
+        click.echo("Stopped watching")
+
+
+def _file_signature(filename: str) -> Optional[Tuple[int, int]]:
+    """Return the modification time and size of filename, if it exists."""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _reload_templates(
+    outputs: List["_TemplateOutput"], filenames: List[str]
+) -> List["_TemplateOutput"]:
+    """Return outputs, with a new template for each changed template file."""
+    reloaded = []
+    for output, filename in zip(outputs, filenames):  # noqa: B905
+        try:
+            with open(filename, "r", encoding="utf-8") as templatefile:
+                template = Template(
+                    templatefile.read(), output.template.cache_directory, filename
                 )
-            spec = _generateSpec(template, bank, production=False)
-            specification_filename = os.path.join("test", bank[2])
-            specification_filedirectory = os.path.join(
-                directory, specification_filename
+        except OSError:
+            template = output.template
+        if template.digest != output.template.digest:
+            output = _TemplateOutput(
+                template, output.pattern, output.conforms_to, output.predefined_ids
             )
-            _write_spec_to_file(specification_filedirectory, spec)
-            _add_spec_to_catalog(
-                orgnummer, bank[6], specification_filename, test_catalog
+        reloaded.append(output)
+    return reloaded
+
+
+def _regenerate(
+    outputs: List["_TemplateOutput"],
+    registry_filename: str,
+    generate: Callable[[List["_TemplateOutput"], Any, bool], None],
+    update: bool,
+) -> None:
+    """Generate the outputs, reporting rather than raising any error."""
+    start = time.perf_counter()
+    try:
+        with open(registry_filename, "r", encoding="utf-8") as registry:
+            generate(outputs, registry, update)
+    except SystemExit as e:
+        # The bank registry is not valid:
+        click.echo(e.code, err=True)
+    except Exception as e:
+        click.echo(f"ERROR: {e!r}", err=True)
+    else:
+        click.echo(f"Updated the outputs in {time.perf_counter() - start:.2f}s")
+
+
+def _save_manifests(
+    manifests: List[Manifest], directory: str, remove_stale: bool
+) -> None:
+    """Save manifests, first removing their stale outputs if remove_stale."""
+    for manifest in manifests:
+        if remove_stale:
+            _remove_stale_outputs(manifest, directory)
+        manifest.save()
+
+
+def _update_lookup_store(
+    lookup_store: Optional[str],
+    entries: Optional[List["LookupEntry"]],
+    directory: str,
+    members: Optional[Mapping[str, Tuple[int, str]]],
+) -> None:
+    """Update the lookup store with the specs of entries, if there is a store.
+
+    Args:
+        lookup_store: the sqlite3 store, if any
+        entries: the specs of the run
+        directory: the output directory
+        members: the size and digest of each member, if the outputs are
+            written into an archive
+    """
+    if not lookup_store or entries is None:
+        return
+    from .lookup import LookupStore
+
+    with LookupStore(lookup_store) as store:
+        store.update(entries, directory, members)
+
+
+def _remove_stale_outputs(manifest: Manifest, directory: str) -> None:
+    """Remove the outputs of the loaded manifest that this run has not written."""
+    for output in manifest.stale():
+        try:
+            os.remove(os.path.join(directory, output))
+        except FileNotFoundError:
+            pass
+
+
+class _Run:
+    """The settings and shared state of a run of main."""
+
+    def __init__(
+        self,
+        sink: "_Sink",
+        use_local_files: bool,
+        manifest: Manifest,
+        fetcher: SpecFetcher,
+        spec_writer: "_SpecWriter",
+        rdf_stream: Optional[str],
+        outputs: List["_TemplateOutput"],
+        unavailable_urls: AbstractSet[str] = frozenset(),
+    ) -> None:
+        """Inits a run writing its outputs to sink."""
+        self.sink = sink
+        self.unavailable_urls = unavailable_urls
+        self.use_local_files = use_local_files
+        self.manifest = manifest
+        self.fetcher = fetcher
+        self.spec_writer = spec_writer
+        self.rdf_stream = rdf_stream
+        self.outputs = outputs
+        # The specs of the run, when they are added to a lookup store:
+        self.lookup_entries: Optional[List["LookupEntry"]] = None
+
+
+class _DirectorySink:
+    """The outputs of a run, written to a staging directory and moved into place."""
+
+    def __init__(
+        self,
+        staging_directory: str,
+        directory: str,
+        minified: bool = False,
+        compressions: Sequence[str] = (),
+    ) -> None:
+        """Inits a sink staging the outputs of directory in staging_directory.
+
+        Args:
+            staging_directory: the directory the outputs are written to
+            directory: the output directory
+            minified: also write a minified copy of each json output
+            compressions: also write the outputs and copies compressed with these
+        """
+        self.staging_directory = staging_directory
+        self.directory = directory
+        self.minified = minified
+        self.compressions = compressions
+        self.directories = {staging_directory}
+
+    def path(self, filename: str) -> str:
+        """Return the staged path of the output filename, creating its directory."""
+        path = os.path.join(self.staging_directory, filename)
+        directory = os.path.dirname(path)
+        if directory not in self.directories:
+            os.makedirs(directory, exist_ok=True)
+            self.directories.add(directory)
+        return path
+
+    def write(self, filename: str, content: bytes) -> None:
+        """Write content to the output filename."""
+        _write_bytes(self.path(filename), content)
+
+    def write_if_changed(self, filename: str, content: bytes) -> None:
+        """Write content to the output filename, unless it has the same content."""
+        output_filename = os.path.join(self.directory, filename)
+        try:
+            if os.path.getsize(output_filename) == len(content):
+                with open(output_filename, "rb") as outputfile:
+                    if outputfile.read() == content:
+                        return
+        except OSError:
+            pass
+        self.write(filename, content)
+
+    def open(self, filename: str) -> BinaryIO:
+        """Open the output filename, to be finished once it is closed."""
+        return open(self.path(filename), "wb")
+
+    def finish(self, filename: str) -> str:
+        """Return the digest of the opened output filename, and discard it if unchanged."""
+        staged = os.path.join(self.staging_directory, filename)
+        profiler.count_bytes("write_files", os.path.getsize(staged))
+        digest = hashlib.sha256()
+        with open(staged, "rb") as stagedfile:
+            for chunk in iter(lambda: stagedfile.read(1 << 16), b""):
+                digest.update(chunk)
+        output_filename = os.path.join(self.directory, filename)
+        if os.path.isfile(output_filename) and filecmp.cmp(
+            staged, output_filename, shallow=False
+        ):
+            os.remove(staged)
+        return digest.hexdigest()
+
+    def close(self, manifest: Manifest) -> List[Manifest]:
+        """Write the artifacts of the outputs of manifest.
+
+        Args:
+            manifest: the manifest of the outputs of the run
+
+        Returns:
+            the manifests to save once the outputs are in place
+        """
+        if not (self.minified or self.compressions):
+            return [manifest]
+        artifact_writer = ArtifactWriter(
+            self.directory, self.minified, self.compressions
+        )
+        with profiler.phase("compress_outputs"):
+            artifact_writer.write(
+                manifest.updated, self.directory, self.staging_directory
             )
+        return [manifest, artifact_writer.manifest]
+
+
+class _ArchiveSink:
+    """The outputs of a run, written into an archive as they are generated.
+
+    The artifacts of each output are made in a thread pool, and written
+    ARTIFACTS_AHEAD outputs later, in the order of the outputs, so the same
+    outputs give the same archive. The outputs and artifacts that are
+    current are copied from the existing archive.
+    """
+
+    def __init__(
+        self,
+        writer: "ArchiveWriter",
+        minified: bool = False,
+        compressions: Sequence[str] = (),
+    ) -> None:
+        """Inits a sink writing into the archive of writer.
+
+        Args:
+            writer: the writer of the archive
+            minified: also write a minified copy of each json output
+            compressions: also write the outputs and copies compressed with these
+        """
+        self.writer = writer
+        self.artifact_writer = (
+            ArtifactWriter(None, minified, compressions, archive=writer)
+            if minified or compressions
+            else None
+        )
+        self.executor: Optional[ThreadPoolExecutor] = None
+        # The digest and the artifacts of each output, not yet written:
+        self.pending: Deque[Tuple[Optional[str], Future]] = deque()
+
+    def write(self, filename: str, content: bytes) -> None:
+        """Write content to the output filename, and its artifacts."""
+        with profiler.phase("write_files"):
+            self.writer.write(filename, content)
+        profiler.count_bytes("write_files", len(content))
+        self._add_artifacts(filename, content)
+
+    def write_if_changed(self, filename: str, content: bytes) -> None:
+        """Write content to the output filename, as the archive is new."""
+        self.write(filename, content)
+
+    def open(self, filename: str) -> BinaryIO:
+        """Open the output filename, to be finished once it is closed."""
+        return self.writer.open(filename)
 
-    _write_catalog_file(prod_catalog_filename, prod_catalog)
-    _write_catalog_file(test_catalog_filename, test_catalog)
+    def finish(self, filename: str) -> str:
+        """Return the digest of the opened output filename, and add its artifacts."""
+        size, digest = self.writer.members[filename]
+        profiler.count_bytes("write_files", size)
+        if self.artifact_writer is not None:
+            self._add_artifacts(filename, self.writer.read(filename))
+        return digest
 
-    _write_catalog_rdf_file(
-        turtle_prod_catalog_filename,
-        create_catalog_graph(prod_catalog, use_local_files),
+    def close(self, manifest: Manifest) -> List[Manifest]:
+        """Copy the current outputs, and write the artifacts and the manifests.
+
+        Args:
+            manifest: the manifest of the outputs of the run
+
+        Returns:
+            no manifests, as they are saved into the archive
+        """
+        for filename in list(manifest.updated):
+            if filename not in self.writer and self.writer.previous is not None:
+                self.write(filename, self.writer.previous.read(filename))
+        with profiler.phase("compress_outputs"):
+            while self.pending:
+                self._write_artifacts()
+        if self.executor is not None:
+            self.executor.shutdown()
+        manifest.save()
+        if self.artifact_writer is not None:
+            self.artifact_writer.manifest.save()
+        return []
+
+    def _add_artifacts(self, filename: str, content: bytes) -> None:
+        """Make the artifacts of the output filename, or copy them if current."""
+        artifact_writer = self.artifact_writer
+        if artifact_writer is None:
+            return
+        digest = artifact_writer.digest(filename, content)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=artifact_writer.jobs)
+        if digest is None and self.writer.previous is not None:
+            previous = self.writer.previous
+            made: Future = Future()
+            made.set_result(
+                [
+                    (name, previous.read(name))
+                    for name in artifact_names(
+                        filename, artifact_writer.minified, artifact_writer.compressions
+                    )
+                ]
+            )
+        else:
+            made = self.executor.submit(
+                artifacts,
+                filename,
+                content,
+                artifact_writer.minified,
+                artifact_writer.compressions,
+            )
+        self.pending.append((digest, made))
+        if len(self.pending) > ARTIFACTS_AHEAD:
+            with profiler.phase("compress_outputs"):
+                self._write_artifacts()
+
+    def _write_artifacts(self) -> None:
+        """Write the artifacts of the first output that has not had them written."""
+        digest, made = self.pending.popleft()
+        for name, artifact in made.result():
+            with profiler.phase("write_files"):
+                self.writer.write(name, artifact)
+            if digest is not None and self.artifact_writer is not None:
+                self.artifact_writer.manifest.record(name, digest)
+
+
+_Sink = Union[_DirectorySink, _ArchiveSink]
+
+
+class _TemplateOutput:
+    """A template with the filename pattern and the standard of its specs."""
+
+    def __init__(
+        self,
+        template: Template,
+        pattern: str,
+        conforms_to: str,
+        predefined_ids: bool,
+    ) -> None:
+        """Inits an output of template.
+
+        Args:
+            template: the template
+            pattern: the name of the prod spec of each bank, relative to the
+                output directory, with the fields filename, stem and orgnummer
+            conforms_to: the standard the specs conform to
+            predefined_ids: use the ids in the bank registry for the apis
+        """
+        self.template = template
+        self.pattern = pattern
+        self.conforms_to = conforms_to
+        self.predefined_ids = predefined_ids
+
+    def filename(self, bank: List[str]) -> str:
+        """Return the name of the prod spec of bank."""
+        return self.pattern.format(
+            filename=bank[2], stem=os.path.splitext(bank[2])[0], orgnummer=bank[0]
+        )
+
+    @property
+    def shared_filename(self) -> str:
+        """The name of the shared document of the specs."""
+        return posixpath.join(posixpath.dirname(self.pattern), SHARED_FILENAME)
+
+
+def _template_outputs(
+    arguments: Sequence[Tuple[Template, str, str]],
+    shared_components: bool,
+) -> List[_TemplateOutput]:
+    """Create the template outputs and check that the names of their specs are unique.
+
+    Args:
+        arguments: the template, pattern and standard of each template
+        shared_components: the specs reference a shared document
+
+    Returns:
+        the outputs, where only the first uses the ids in the bank registry
+
+    Raises:
+        BadParameter: if a pattern is not valid or not unique
+    """
+    outputs = [
+        _TemplateOutput(template, pattern, conforms_to, index == 0)
+        for index, (template, pattern, conforms_to) in enumerate(arguments)
+    ]
+    example = ["123456789", "Bank", "Bank_123456789_Accounts-API.json"]
+    filenames = set()
+    for output in outputs:
+        try:
+            filenames.add(output.filename(example))
+        except (KeyError, IndexError, ValueError) as e:
+            raise click.BadParameter(
+                f"Not a valid pattern >{output.pattern}<: {e!r}"
+            ) from e
+        if shared_components and "{" in posixpath.dirname(output.pattern):
+            raise click.BadParameter(
+                "The directory of a pattern cannot have fields with"
+                f" --shared-components >{output.pattern}<"
+            )
+    shared_filenames = {output.shared_filename for output in outputs}
+    if len(filenames) < len(outputs) or (
+        shared_components and len(shared_filenames) < len(outputs)
+    ):
+        raise click.BadParameter(
+            "Every template must write its specifications to its own files"
+            + (" and directory" if shared_components else "")
+        )
+    return outputs
+
+
+def _add_bank_spec(
+    bank: List[str], index: int, production: bool, catalog: Catalog, run: _Run
+) -> Optional[str]:
+    """Write the spec of bank for one template and environment and add it to catalog.
+
+    Args:
+        bank: the row from the bank registry
+        index: the index of the template output in run
+        production: True for the production spec, False for the test spec
+        catalog: the catalog of the environment
+        run: the run
+
+    Returns:
+        the digest of the inputs of the spec, or None if the bank has no
+        endpoint in the environment
+    """
+    url = bank[3] if production else bank[4]
+    if not url:
+        return None
+    output = run.outputs[index]
+    specification_filename = _specification_filename(output, bank, production)
+    spec_writer = run.spec_writer
+    digest = input_digest(
+        __version__,
+        output.template.digest,
+        spec_writer.shared_components and output.shared_filename,
+        production,
+        bank,
+    )
+    with profiler.bank(bank[2]):
+        if not run.manifest.is_current(specification_filename, digest):
+            spec_writer.write(
+                index,
+                bank,
+                production,
+                specification_filename,
+                _shared_reference(output.shared_filename, specification_filename)
+                if spec_writer.shared_components
+                else None,
+            )
+            run.manifest.record(specification_filename, digest)
+        api_id = bank[5] if production else bank[6]
+        api = _add_spec_to_catalog(
+            bank[0],
+            api_id if output.predefined_ids else "",
+            specification_filename,
+            catalog,
+            output.conforms_to,
+        )
+        if url in run.unavailable_urls:
+            api.endpointAvailable = False
+        if run.lookup_entries is not None:
+            from .lookup import LookupEntry
+
+            run.lookup_entries.append(
+                LookupEntry(
+                    specification_filename, bank, production, api.identifier, api.url
+                )
+            )
+    spec_writer.generated.add(api.url, index, bank, production)
+    return digest
+
+
+def _specification_filename(
+    output: _TemplateOutput, bank: List[str], production: bool
+) -> str:
+    """Return the name of the spec of bank, relative to the output directory."""
+    specification_filename = output.filename(bank)
+    if not production:
+        specification_filename = posixpath.join("test", specification_filename)
+    return specification_filename
+
+
+def _shared_reference(shared_filename: str, specification_filename: str) -> str:
+    """Return the location of the shared document relative to a spec."""
+    return posixpath.relpath(
+        shared_filename, posixpath.dirname(specification_filename) or "."
+    )
+
+
+def _write_shared_document(output: _TemplateOutput, run: _Run) -> None:
+    """Write the shared paths and components of the specs, unless current."""
+    digest = input_digest(__version__, output.template.digest)
+    if not run.manifest.is_current(output.shared_filename, digest):
+        run.sink.write(
+            output.shared_filename,
+            _encode_spec(shared_document(output.template.parsed)),
+        )
+        run.manifest.record(output.shared_filename, digest)
+
+
+def _write_environment_catalogs(
+    catalog: Catalog,
+    production: bool,
+    spec_digests: List[str],
+    run: _Run,
+    shard_by: Optional[str] = None,
+    page_size: int = 100,
+) -> None:
+    """Write the catalogs of an environment, and their shards if sharded.
+
+    Args:
+        catalog: the catalog of the environment
+        production: True for the production catalog, False for the test one
+        spec_digests: the digest of the inputs of the spec of each api
+        run: the run
+        shard_by: also write the catalog in shards, by "orgnummer" or "page"
+        page_size: the number of apis in each shard by page
+    """
+    name = "dsop_catalog" if production else "dsop_catalog_test"
+    directory = "" if production else "test"
+    _write_catalogs(
+        catalog,
+        posixpath.join(directory, name + ".json"),
+        posixpath.join("rdf", name),
+        input_digest(spec_digests),
+        run,
+    )
+    if not shard_by:
+        return
+    shards = shard_catalog(catalog, shard_by, page_size)
+    locations = []
+    for shard in shards:
+        shard_filename = posixpath.join(
+            directory, "catalog", f"{name}_{shard.key}.json"
+        )
+        rdf_shard_name = posixpath.join("rdf", "catalog", f"{name}_{shard.key}")
+        _write_catalogs(
+            shard.catalog,
+            shard_filename,
+            rdf_shard_name,
+            input_digest([spec_digests[index] for index in shard.indexes]),
+            run,
+        )
+        locations.append(
+            (
+                posixpath.relpath(shard_filename, directory or "."),
+                posixpath.relpath(
+                    _rdf_catalog_filename(rdf_shard_name, run), directory or "."
+                ),
+            )
+        )
+    index_filename = posixpath.join(directory, f"{name}_index.json")
+    content = encode_shard_index(catalog, shard_by, shards, locations)
+    _write_output(index_filename, content, run)
+    run.manifest.record(index_filename, hashlib.sha256(content).hexdigest())
+
+
+def _write_catalogs(
+    catalog: Catalog,
+    catalog_filename: str,
+    rdf_catalog_name: str,
+    specs_digest: str,
+    run: _Run,
+) -> None:
+    """Write the json and rdf files of catalog, unless they are current.
+
+    An rdf file without the dataservices of an api whose spec cannot be
+    read is not recorded as current, so the spec is read again next run.
+
+    Args:
+        catalog: the catalog
+        catalog_filename: the name of the json file
+        rdf_catalog_name: the name of the rdf file, without its suffix
+        specs_digest: the digest of the inputs of the specs of the apis
+        run: the run
+    """
+    with profiler.phase("encode_catalogs"):
+        content = encode_catalog(catalog)
+    digest = input_digest(
+        __version__,
+        run.use_local_files,
+        run.rdf_stream,
+        specs_digest,
+        hashlib.sha256(content).hexdigest(),
     )
-    _write_catalog_rdf_file(
-        turtle_test_catalog_filename,
-        create_catalog_graph(test_catalog, use_local_files),
+    manifest = run.manifest
+    if not manifest.is_current(catalog_filename, digest):
+        _write_output(catalog_filename, content, run)
+        manifest.record(catalog_filename, digest)
+    rdf_catalog_filename = _rdf_catalog_filename(rdf_catalog_name, run)
+    if not manifest.is_current(rdf_catalog_filename, digest):
+        if _write_catalog_rdf(catalog, rdf_catalog_filename, run):
+            manifest.record(rdf_catalog_filename, digest)
+        else:
+            manifest.record_incomplete(rdf_catalog_filename)
+
+
+def _rdf_catalog_filename(rdf_catalog_name: str, run: _Run) -> str:
+    """Return the name of the rdf catalog in the format of run."""
+    from .rdfwriter import RDF_FORMATS
+
+    return rdf_catalog_name + RDF_FORMATS[run.rdf_stream or "turtle"]
+
+
+def _write_catalog_rdf(catalog: Catalog, rdf_catalog_filename: str, run: _Run) -> bool:
+    """Write the rdf file of catalog, unless the output has the same content.
+
+    Args:
+        catalog: the catalog
+        rdf_catalog_filename: the name of the rdf file
+        run: the run
+
+    Returns:
+        True if the file has every api, False if an api whose spec cannot be
+        read is left out
+    """
+    generated = run.spec_writer.generated
+    skipped: List[str] = []
+    arguments = (
+        catalog,
+        run.use_local_files,
+        generated if run.use_local_files else None,
+        run.fetcher,
+        generated.normalized_templates,
     )
+    if run.rdf_stream:
+        with run.sink.open(rdf_catalog_filename) as catalogfile:
+            _write_catalog_rdf_stream(
+                catalogfile,
+                run.rdf_stream,
+                catalog_triples(*arguments, skipped=skipped),
+            )
+        run.sink.finish(rdf_catalog_filename)
+    else:
+        _write_output(
+            rdf_catalog_filename,
+            _serialize_catalog_graph(create_catalog_graph(*arguments, skipped=skipped)),
+            run,
+        )
+    return not skipped
+
+
+class _CatalogStream:
+    """The json and rdf catalogs of an environment, written as the banks are added.
 
+    The apis added to the catalog since the last flush are written to both
+    files and removed from the catalog, with the digests of their specs, so
+    the catalog only holds the apis of one bank at a time. The files are
+    written in full, and discarded when they equal the outputs.
+    """
 
-def _write_spec_to_file(specification_filedirectory: str, spec: dict) -> None:
-    with open(specification_filedirectory, "w", encoding="utf-8") as outfile:
-        json.dump(
-            spec,
-            outfile,
-            ensure_ascii=False,
-            indent=2,
+    def __init__(
+        self, catalog: Catalog, production: bool, spec_digests: List[str], run: _Run
+    ) -> None:
+        """Inits the stream of catalog, writing its fields to the files.
+
+        Args:
+            catalog: the catalog of the environment
+            production: True for the production catalog, False for the test one
+            spec_digests: the digests of the inputs of the specs of the apis
+                added to catalog
+            run: the run, streaming the rdf catalog as its rdf_stream
+        """
+        from .dataservice import TemplateDataServices
+        from .rdfwriter import create_rdf_writer
+
+        name = "dsop_catalog" if production else "dsop_catalog_test"
+        self.catalog = catalog
+        self.spec_digests = spec_digests
+        self.run = run
+        self.catalog_filename = posixpath.join(
+            "" if production else "test", name + ".json"
+        )
+        self.rdf_catalog_filename = _rdf_catalog_filename(
+            posixpath.join("rdf", name), run
         )
+        self.specs_digest = hashlib.sha256()
+        self.documents: Dict[str, Optional[dict]] = {}
+        # The apis left out of the rdf catalog, as their specs cannot be read:
+        self.skipped: List[str] = []
+        with profiler.phase("dataservices"):
+            self.template_dataservices = [
+                TemplateDataServices(template)
+                for template in run.spec_writer.generated.normalized_templates
+            ]
+        self._stack = ExitStack()
+        with self._stack:
+            catalogfile = self._open(self.catalog_filename, "wb")
+            rdffile = self._open(self.rdf_catalog_filename, "w")
+            self.catalog_writer = CatalogWriter(catalogfile, catalog)
+            self.rdf_writer: "RDFWriter" = create_rdf_writer(
+                rdffile, run.rdf_stream or "turtle"
+            )
+            with profiler.phase("build_graph"):
+                catalog_graph = _catalog_to_graph(catalog)
+            self.rdf_writer.write(catalog_graph)
+            self._stack = self._stack.pop_all()
+
+    def __enter__(self) -> "_CatalogStream":
+        """Enter the runtime context."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Finish the files and record them in the manifest, unless failed."""
+        if exc_type is not None:
+            self._stack.close()
+            return
+        self.catalog_writer.close()
+        self._stack.close()
+        sink = self.run.sink
+        digest = input_digest(
+            __version__,
+            self.run.use_local_files,
+            self.run.rdf_stream,
+            self.specs_digest.hexdigest(),
+            sink.finish(self.catalog_filename),
+        )
+        sink.finish(self.rdf_catalog_filename)
+        for filename in (self.catalog_filename, self.rdf_catalog_filename):
+            # An rdf catalog with apis left out is written again next run:
+            if filename == self.rdf_catalog_filename and self.skipped:
+                self.run.manifest.record_incomplete(filename)
+            else:
+                self.run.manifest.record(filename, digest)
+
+    def flush(self) -> None:
+        """Write the apis added to the catalog, and remove them from it."""
+        run = self.run
+        generated = run.spec_writer.generated
+        with profiler.phase("encode_catalogs"):
+            for api in self.catalog.apis:
+                self.catalog_writer.write(api)
+        for triples in _apis_triples(
+            self.catalog,
+            self.catalog.apis,
+            run.use_local_files,
+            generated if run.use_local_files else {},
+            run.fetcher,
+            self.template_dataservices,
+            self.documents,
+            skipped=self.skipped,
+        ):
+            with profiler.phase("serialize_rdf"):
+                self.rdf_writer.write(triples)
+        for api in self.catalog.apis:
+            generated.discard(api.url)
+        for digest in self.spec_digests:
+            self.specs_digest.update(digest.encode("ascii"))
+        self.catalog.apis.clear()
+        self.spec_digests.clear()
+
+    def _open(self, filename: str, mode: str) -> Any:
+        """Open the output filename of the run, in binary or text mode."""
+        outputfile = self._stack.enter_context(self.run.sink.open(filename))
+        if "b" in mode:
+            return outputfile
+        return self._stack.enter_context(io.TextIOWrapper(outputfile, encoding="utf-8"))
+
+
+def _write_output(filename: str, content: bytes, run: _Run) -> None:
+    """Write content to the output filename, unless it has the same content."""
+    run.sink.write_if_changed(filename, content)
+
+
+class _SpecWriter:
+    """Writes bank specs, either in this process or spread over a process pool."""
+
+    def __init__(
+        self,
+        templates: List[Template],
+        jobs: int,
+        sink: "_Sink",
+        shared_components: bool = False,
+    ) -> None:
+        """Inits a writer for templates to sink, using jobs processes."""
+        self.templates = templates
+        self.jobs = jobs
+        self.sink = sink
+        self.shared_components = shared_components
+        self.renderers: Optional[List[SpecRenderer]] = None
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.futures: List[Future] = []
+        # The specs rendered by the pool and not yet written to an archive:
+        self.rendered: Deque[Tuple[str, Future]] = deque()
+        self.generated = _GeneratedSpecs(templates)
+
+    def __enter__(self) -> "_SpecWriter":
+        """Enter the runtime context."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Wait for all specs to be written and raise any error from the workers."""
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=True)
+        if exc_type is None:
+            for future in self.futures:
+                future.result()
+            while self.rendered:
+                self._write_rendered()
+
+    def write(
+        self,
+        index: int,
+        bank: List[str],
+        production: bool,
+        specification_filename: str,
+        shared_reference: Optional[str] = None,
+    ) -> None:
+        """Generate and write the spec for bank.
+
+        The workers of the pool write the specs of a directory themselves,
+        and render the specs of an archive, which are written in order.
+
+        Args:
+            index: the index of the template
+            bank: the row from the bank registry
+            production: True for the production spec, False for the test spec
+            specification_filename: the output to write the spec to
+            shared_reference: the location of the shared document to
+                reference the paths and components in, if any
+        """
+        if self.renderers is None and self.executor is None:
+            self._start()
+        if self.renderers is not None:
+            with profiler.phase("generate_specs"):
+                spec = _bank_spec(
+                    self.templates[index].parsed, bank, production, shared_reference
+                )
+            self.sink.write(
+                specification_filename, _encode_spec(spec, self.renderers[index])
+            )
+        elif self.executor is not None and isinstance(self.sink, _DirectorySink):
+            self.futures.append(
+                self.executor.submit(
+                    _write_bank_spec,
+                    index,
+                    bank,
+                    production,
+                    self.sink.path(specification_filename),
+                    shared_reference,
+                )
+            )
+        elif self.executor is not None:
+            self.rendered.append(
+                (
+                    specification_filename,
+                    self.executor.submit(
+                        _render_bank_spec, index, bank, production, shared_reference
+                    ),
+                )
+            )
+            # Keep the workers busy, without holding every spec in memory:
+            if len(self.rendered) > 2 * self.jobs:
+                self._write_rendered()
+
+    def _write_rendered(self) -> None:
+        """Write the first spec rendered by the pool, once it is rendered."""
+        specification_filename, rendered = self.rendered.popleft()
+        self.sink.write(specification_filename, rendered.result())
+
+    def _start(self) -> None:
+        """Parse the templates and start a process pool if jobs is more than one."""
+        parsed = [template.parsed for template in self.templates]
+        if self.jobs > 1:
+            # The templates are sent once to each worker, not with every task:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.jobs,
+                initializer=_init_spec_worker,
+                initargs=(parsed,),
+            )
+        else:
+            self.renderers = [SpecRenderer(template) for template in parsed]
+
+
+class _GeneratedSpecs(Mapping[str, dict]):
+    """The specs of this run, keyed by url and generated when looked up.
+
+    The templates are normalized through json once, so that every spec is
+    equal to what is parsed from the file written for it.
+    """
+
+    def __init__(self, templates: List[Template]) -> None:
+        """Inits an empty mapping of specs generated from templates."""
+        self.templates = templates
+        self.banks: Dict[str, Tuple[int, List[str], bool]] = {}
+        self._normalized: Optional[List[dict]] = None
+
+    def add(self, url: str, index: int, bank: List[str], production: bool) -> None:
+        """Add the spec of bank for one template and environment at url."""
+        self.banks[url] = (index, bank, production)
+
+    def discard(self, url: str) -> None:
+        """Remove the spec at url, once its dataservices are created."""
+        self.banks.pop(url, None)
+
+    def __getitem__(self, url: str) -> dict:
+        """Generate the spec at url."""
+        index, bank, production = self.banks[url]
+        with profiler.phase("generate_specs"):
+            return _generateSpec(self.normalized_templates[index], bank, production)
+
+    @property
+    def normalized_templates(self) -> List[dict]:
+        """The templates, normalized through json."""
+        if self._normalized is None:
+            self._normalized = [
+                json.loads(encode(template.parsed)) for template in self.templates
+            ]
+        return self._normalized
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the urls."""
+        return iter(self.banks)
+
+    def __len__(self) -> int:
+        """Return the number of specs."""
+        return len(self.banks)
+
+
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_spec_worker(templates: List[dict]) -> None:
+    """Keep the templates and their renderers in the worker process."""
+    _worker_state["templates"] = templates
+    _worker_state["renderers"] = [SpecRenderer(template) for template in templates]
+
+
+def _write_bank_spec(
+    index: int,
+    bank: List[str],
+    production: bool,
+    specification_filedirectory: str,
+    shared_reference: Optional[str],
+) -> None:
+    """Generate and write the spec for bank in a worker process."""
+    _write_bytes(
+        specification_filedirectory,
+        _render_bank_spec(index, bank, production, shared_reference),
+    )
+
+
+def _render_bank_spec(
+    index: int,
+    bank: List[str],
+    production: bool,
+    shared_reference: Optional[str],
+) -> bytes:
+    """Generate and render the spec for bank in a worker process."""
+    spec = _bank_spec(
+        _worker_state["templates"][index], bank, production, shared_reference
+    )
+    return _worker_state["renderers"][index].render(spec)
+
+
+def _bank_spec(
+    template: dict,
+    bank: List[str],
+    production: bool,
+    shared_reference: Optional[str],
+) -> dict:
+    """Generate the spec for bank, referencing the shared document if given."""
+    spec = _generateSpec(template, bank, production)
+    return reference_spec(spec, shared_reference) if shared_reference else spec
+
+
+def _encode_spec(spec: dict, renderer: Optional[SpecRenderer] = None) -> bytes:
+    """Encode spec as json, with the renderer of its template if given."""
+    with profiler.phase("encode_specs"):
+        return renderer.render(spec) if renderer else encode(spec)
 
 
 def _add_spec_to_catalog(
@@ -117,39 +1743,66 @@ def _add_spec_to_catalog(
     api_id: str,
     specification_filename: str,
     catalog: Catalog,
-) -> None:
-    url = (
-        "https://raw.githubusercontent.com/"
-        "Informasjonsforvaltning/dsop-api-spesifikasjoner/master/specs/"
-        f"{specification_filename}"
-    )
-    api = API(url, api_id)
-    api.publisher = f"https://organization-catalog.fellesdatakatalog.digdir.no/organizations/{orgnummer}"  # noqa: B950
-    api.conformsTo.append("https://bitsnorge.github.io/dsop-accounts-api")
+    conforms_to: str = ACCOUNTS_API_STANDARD,
+) -> API:
+    api = API(SPECS_URL + specification_filename, api_id)
+    # The prod and test apis of a bank share one publisher string:
+    api.publisher = sys.intern(
+        f"https://organization-catalog.fellesdatakatalog.digdir.no/organizations/{orgnummer}"  # noqa: B950
+    )
+    api.conformsTo.append(conforms_to)
     catalog.apis.append(api)
+    return api
 
 
-def _write_catalog_file(catalog_filename: str, catalog: Catalog) -> None:
-    with open(catalog_filename, "w", encoding="utf-8") as catalogfile:
-        json.dump(
-            catalog.__dict__,
-            catalogfile,
-            default=lambda o: o.__dict__,
-            ensure_ascii=False,
-            indent=2,
-        )
+def _serialize_catalog_graph(catalog: "Graph") -> bytes:
+    """Serialize catalog as turtle, with its blank nodes labelled by content."""
+    from .rdfwriter import canonical_graph
+
+    with profiler.phase("serialize_rdf"):
+        return canonical_graph(catalog).serialize(format="turtle").encode("utf-8")
+
+
+def _write_catalog_rdf_stream(
+    catalogfile: BinaryIO, rdf_format: str, batches: Iterable[List["Triple"]]
+) -> None:
+    """Write the batches of triples to catalogfile in rdf_format."""
+    from .rdfwriter import create_rdf_writer
+
+    with io.TextIOWrapper(catalogfile, encoding="utf-8") as textfile:
+        writer = create_rdf_writer(textfile, rdf_format)
+        for triples in batches:
+            with profiler.phase("serialize_rdf"):
+                writer.write(triples)
 
 
-def _write_catalog_rdf_file(catalog_filename: str, catalog: Graph) -> None:
-    with open(catalog_filename, "w", encoding="utf-8") as catalogfile:
-        catalogfile.write(catalog.serialize(format="turtle"))
+def _write_bytes(filename: str, content: bytes) -> None:
+    """Write content to filename."""
+    with profiler.phase("write_files"):
+        with open(filename, "wb") as outfile:
+            outfile.write(content)
+    profiler.count_bytes("write_files", len(content))
 
 
 def _generateSpec(template: dict, bank: List[str], production: bool) -> dict:
-    """Generate spec based on template for bank."""
-    # Need to do a deepcopy to actually copy the template into a new object.
-    specification = copy.deepcopy(template)
+    """Generate spec based on template for bank.
+
+    The specification is a shallow overlay of the template: only the top-level
+    mapping, the info object and the servers list are new objects, every other
+    subtree is shared with the template. The result must therefore be treated
+    as read-only.
+
+    Args:
+        template: the parsed openAPI template
+        bank: the row from the bank registry
+        production: True for the production spec, False for the test spec
+
+    Returns:
+        the bank specific specification
+    """
+    specification = dict(template)
     # Then put the bank-specific values into the specification:
+    specification["info"] = dict(template["info"])
     specification["info"]["title"] = template["info"]["title"] + " " + bank[1]
     # We must recreate the Server object
     specification["servers"] = []
@@ -168,41 +1821,256 @@ def _generateSpec(template: dict, bank: List[str], production: bool) -> dict:
     return specification
 
 
-def create_catalog_graph(catalog: Catalog, use_local_files: bool) -> Graph:
-    """Create a graph based on catalog and persist to store."""
-    # Use datacatalogtordf and oastodcat to create a graph and persist:
+def create_catalog_graph(
+    catalog: Catalog,
+    use_local_files: bool,
+    specs: Optional[Mapping[str, dict]] = None,
+    fetcher: Optional[SpecFetcher] = None,
+    templates: Sequence[dict] = (),
+    skipped: Optional[List[str]] = None,
+) -> "Graph":
+    """Create a graph based on catalog and persist to store.
+
+    Args:
+        catalog: the catalog
+        use_local_files: read the specs in this repository from local files
+        specs: specs already in memory, keyed by url, which are used instead
+            of reading or fetching them
+        fetcher: the fetcher of remote specs
+        templates: the templates the specs may be generated from
+        skipped: the list to add the url of each api left out to, if any
+
+    Returns:
+        the catalog graph
+    """
+    with profiler.phase("build_graph"):
+        graph = _catalog_to_graph(catalog)
+    batches = catalog_triples(
+        catalog, use_local_files, specs, fetcher, templates, skipped=skipped
+    )
+    # The first batch is the catalog itself:
+    next(batches)
+    for triples in batches:
+        with profiler.phase("build_graph"):
+            for triple in triples:
+                graph.add(triple)
+    return graph
+
+
+def catalog_triples(
+    catalog: Catalog,
+    use_local_files: bool,
+    specs: Optional[Mapping[str, dict]] = None,
+    fetcher: Optional[SpecFetcher] = None,
+    templates: Sequence[dict] = (),
+    batch_size: int = 64,
+    skipped: Optional[List[str]] = None,
+) -> Iterator[List["Triple"]]:
+    """Create the triples of catalog, one batch for the catalog and one per api.
+
+    Remote specs are fetched concurrently, batch_size apis at a time. An api
+    whose spec cannot be fetched is reported, added to skipped and left out.
+    The dataservices of
+    specs generated from one of templates are created from the template's
+    prototype dataservice instead of mapping the whole spec.
+
+    Args:
+        catalog: the catalog
+        use_local_files: read the specs in this repository from local files
+        specs: specs already in memory, keyed by url, which are used instead
+            of reading or fetching them
+        fetcher: the fetcher of remote specs
+        templates: the templates the specs may be generated from
+        batch_size: the number of apis to fetch specs for at a time
+        skipped: the list to add the url of each api left out to, if any
+
+    Yields:
+        the triples of the catalog, then the triples of each api
+    """
+    from .dataservice import TemplateDataServices
+
+    with profiler.phase("build_graph"):
+        catalog_graph = _catalog_to_graph(catalog)
+    yield list(catalog_graph)
+    with profiler.phase("dataservices"):
+        template_dataservices = [TemplateDataServices(t) for t in templates]
+    yield from _apis_triples(
+        catalog,
+        catalog.apis,
+        use_local_files,
+        specs if specs is not None else {},
+        fetcher or SpecFetcher(),
+        template_dataservices,
+        {},
+        batch_size,
+        skipped,
+    )
+
+
+def _apis_triples(
+    catalog: Catalog,
+    catalog_apis: Sequence[API],
+    use_local_files: bool,
+    specs: Mapping[str, dict],
+    fetcher: SpecFetcher,
+    template_dataservices: List["TemplateDataServices"],
+    documents: Dict[str, Optional[dict]],
+    batch_size: int = 64,
+    skipped: Optional[List[str]] = None,
+) -> Iterator[List["Triple"]]:
+    """Create the triples of catalog_apis, one batch per api.
+
+    Args:
+        catalog: the catalog of the apis
+        catalog_apis: the apis
+        use_local_files: read the specs in this repository from local files
+        specs: specs already in memory, keyed by url
+        fetcher: the fetcher of remote specs
+        template_dataservices: the dataservices of the templates
+        documents: the shared documents referenced by the specs, keyed by url
+        batch_size: the number of apis to fetch specs for at a time
+        skipped: the list to add the url of each api left out to, if any
+
+    Yields:
+        the triples of each api whose spec can be read or fetched
+    """
+    for start in range(0, len(catalog_apis), batch_size):
+        apis = catalog_apis[start : start + batch_size]
+        with profiler.phase("fetch_specs"):
+            fetched = fetcher.fetch_all(
+                api.url
+                for api in apis
+                if api.url not in specs
+                and _local_file_path(api.url, use_local_files) is None
+            )
+        for api in apis:
+            oas = _get_spec(api.url, use_local_files, specs, fetched)
+            if oas is not None and has_shared_references(oas):
+                oas = _bundle_spec(api.url, oas, use_local_files, fetcher, documents)
+            if oas is None:
+                if skipped is not None:
+                    skipped.append(api.url)
+                continue
+            with profiler.phase("dataservices"):
+                triples = _api_triples(catalog, api, oas, template_dataservices)
+            yield triples
+
+
+def _catalog_to_graph(catalog: Catalog) -> "Graph":
+    """Create a graph of catalog without its dataservices."""
+    import datacatalogtordf
+    from rdflib import URIRef
+
+    # Use datacatalogtordf to create the graph:
     g = datacatalogtordf.Catalog()
     g.identifier = URIRef(catalog.identifier)
     g.title = catalog.title
     g.description = catalog.description
     g.publisher = catalog.publisher
+    return g._to_graph()
 
-    for api in catalog.apis:
-        if (
-            use_local_files
-            and "https://raw.githubusercontent.com/Informasjonsforvaltning/dsop-api-spesifikasjoner/master/"
-            in api.url
-        ):
-            file_path = api.url.replace(
-                "https://raw.githubusercontent.com/Informasjonsforvaltning/dsop-api-spesifikasjoner/master/",
-                "",
-            )
-            api_spec_file = open(file_path, "r")
-            api_spec = api_spec_file.read()
-            api_spec_file.close()
-            oas = yaml.safe_load(api_spec)
-        else:
-            with get(api.url, timeout=5) as response:
-                if response.status_code == 200:
-                    api_spec = response.text
-                    oas = yaml.safe_load(api_spec)
 
+def _api_triples(
+    catalog: Catalog,
+    api: API,
+    oas: dict,
+    templates: List["TemplateDataServices"],
+) -> List["Triple"]:
+    """Create the triples of the dataservices of api and link them to catalog."""
+    from oastodcat import OASDataService
+    from rdflib import URIRef
+    from rdflib.namespace import DCAT
+
+    from .dataservice import find_template
+
+    template = find_template(oas, templates)
+    if template is not None:
+        dataservices = template.dataservices(
+            api.url, oas, api.identifier, api.publisher, api.conformsTo
+        )
+    else:
+        # Use oastodcat to map the whole spec:
         oas_spec = OASDataService(api.url, oas, api.identifier)
         oas_spec.conforms_to = api.conformsTo
         oas_spec.publisher = api.publisher
+        dataservices = (
+            (URIRef(dataservice.identifier), list(dataservice._to_graph()))
+            for dataservice in oas_spec.dataservices
+        )
+    triples: List["Triple"] = []
+    for dataservice, dataservice_triples in dataservices:
+        triples.append((URIRef(catalog.identifier), DCAT.service, dataservice))
+        triples.extend(dataservice_triples)
+    return triples
 
-        # Add dataservices to catalog:
-        for dataservice in oas_spec.dataservices:
-            g.services.append(dataservice)
 
-    return g._to_graph()
+def _get_spec(
+    url: str,
+    use_local_files: bool,
+    specs: Mapping[str, dict],
+    fetched: Mapping[str, FetchResult],
+) -> Optional[dict]:
+    """Return the spec at url from memory, a local file or the fetched specs."""
+    if url in specs:
+        return specs[url]
+    file_path = _local_file_path(url, use_local_files)
+    if file_path is not None:
+        with open(file_path, "r") as api_spec_file:
+            text = api_spec_file.read()
+        with profiler.phase("parse_specs"):
+            return load_yaml(text)
+    result = fetched[url]
+    if result.spec is None:
+        click.echo(f"WARNING: Skipping >{url}<: {result.error}", err=True)
+    return result.spec
+
+
+def _bundle_spec(
+    url: str,
+    spec: dict,
+    use_local_files: bool,
+    fetcher: SpecFetcher,
+    documents: Dict[str, Optional[dict]],
+) -> Optional[dict]:
+    """Resolve the references of the spec at url to shared documents.
+
+    Args:
+        url: the url of the spec
+        spec: the spec
+        use_local_files: read the documents in this repository from local files
+        fetcher: the fetcher of remote documents
+        documents: the documents read so far, keyed by url
+
+    Returns:
+        the self-contained spec, or None if a reference cannot be resolved
+    """
+
+    def load(location: str) -> dict:
+        document_url = urljoin(url, location)
+        if document_url not in documents:
+            fetched = (
+                {}
+                if _local_file_path(document_url, use_local_files)
+                else fetcher.fetch_all([document_url])
+            )
+            documents[document_url] = _get_spec(
+                document_url, use_local_files, {}, fetched
+            )
+        document = documents[document_url]
+        if document is None:
+            raise LookupError(document_url)
+        return document
+
+    try:
+        return bundle(spec, load)
+    except (OSError, LookupError, TypeError) as e:
+        click.echo(f"WARNING: Skipping >{url}<: Cannot resolve {e}", err=True)
+        return None
+
+
+def _local_file_path(url: str, use_local_files: bool) -> Optional[str]:
+    """Return the local path of a spec in this repository, if used."""
+    repository_url = "https://raw.githubusercontent.com/Informasjonsforvaltning/dsop-api-spesifikasjoner/master/"  # noqa: B950
+    if use_local_files and repository_url in url:
+        return url.replace(repository_url, "")
+    return None
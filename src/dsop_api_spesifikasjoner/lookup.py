@@ -0,0 +1,269 @@
+"""Module for the lookup store of the specs of the banks.
+
+The store is an sqlite3 database with a row for each spec written by a run:
+the org number, name, file name and endpoint of its bank, the identifier of
+its dataservice, and its path, url and sha256 digest. Each of the keys is
+indexed, the name in case folded form, so a lookup reads a few pages of the
+database whatever the number of banks.
+
+The store is updated in one transaction after each run. Only the rows that
+have changed are written, the rows of removed specs are deleted, and a spec
+is only hashed again when its size or modification time has changed.
+
+Example:
+    >>> dsop_api_spesifikasjoner_lookup dsop_lookup.sqlite 937903502
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import click
+
+from . import __version__
+
+# The columns that identify a spec, and may be looked up:
+KEYS = ("orgnummer", "navn", "filnavn", "endpoint", "identifier", "path", "url")
+_COLUMNS = (
+    "path",
+    "orgnummer",
+    "navn",
+    "filnavn",
+    "environment",
+    "endpoint",
+    "identifier",
+    "url",
+    "sha256",
+    "navn_key",
+    "size",
+    "mtime_ns",
+)
+# The columns kept for updating and looking up the store, but not shown:
+_INTERNAL = 3
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS specs (
+        path TEXT PRIMARY KEY,
+        orgnummer TEXT NOT NULL,
+        navn TEXT NOT NULL,
+        filnavn TEXT NOT NULL,
+        environment TEXT NOT NULL,
+        endpoint TEXT NOT NULL,
+        identifier TEXT NOT NULL,
+        url TEXT NOT NULL,
+        sha256 TEXT NOT NULL,
+        navn_key TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS specs_orgnummer ON specs (orgnummer)",
+    "CREATE INDEX IF NOT EXISTS specs_navn_key ON specs (navn_key)",
+    "CREATE INDEX IF NOT EXISTS specs_filnavn ON specs (filnavn)",
+    "CREATE INDEX IF NOT EXISTS specs_endpoint ON specs (endpoint)",
+    "CREATE INDEX IF NOT EXISTS specs_identifier ON specs (identifier)",
+    "CREATE INDEX IF NOT EXISTS specs_url ON specs (url)",
+)
+# The prefix of the identifier of every dataservice, which may be left out:
+_IDENTIFIER_PREFIX = "https://dataservice-publisher.digdir.no/dataservices/"
+
+
+class LookupEntry:
+    """Class representing a spec written by a run, and the bank it is for."""
+
+    __slots__ = (
+        "path",
+        "orgnummer",
+        "navn",
+        "filnavn",
+        "environment",
+        "endpoint",
+        "identifier",
+        "url",
+    )
+
+    def __init__(
+        self,
+        path: str,
+        bank: List[str],
+        production: bool,
+        identifier: str,
+        url: str,
+    ) -> None:
+        """Inits the entry of the spec at path of bank.
+
+        Args:
+            path: the path of the spec, relative to the output directory
+            bank: the row from the bank registry
+            production: True for the production spec, False for the test spec
+            identifier: the identifier of the dataservice of the spec
+            url: the url of the spec
+        """
+        self.path = path
+        self.orgnummer = bank[0]
+        self.navn = bank[1]
+        self.filnavn = bank[2]
+        self.environment = "production" if production else "test"
+        self.endpoint = bank[3] if production else bank[4]
+        self.identifier = identifier
+        self.url = url
+
+
+class LookupStore:
+    """Class reading and updating a lookup store."""
+
+    def __init__(self, filename: str) -> None:
+        """Inits a store in filename, creating it if it does not exist."""
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            for statement in _SCHEMA:
+                self.connection.execute(statement)
+
+    def __enter__(self) -> "LookupStore":
+        """Enter the runtime context."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Close the store."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the store."""
+        self.connection.close()
+
+    def update(
+        self,
+        entries: Iterable[LookupEntry],
+        directory: str,
+        members: Optional[Mapping[str, Tuple[int, str]]] = None,
+    ) -> Tuple[int, int]:
+        """Replace the rows of the store with the specs of entries.
+
+        Args:
+            entries: the specs written by the run
+            directory: the output directory the paths are relative to
+            members: the size and sha256 of each spec in the archive the
+                specs are written to, if any
+
+        Returns:
+            the number of rows written and deleted
+        """
+        existing = {
+            row["path"]: tuple(row)
+            for row in self.connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM specs"  # noqa: S608
+            )
+        }
+        changed: List[Tuple[Any, ...]] = []
+        paths = set()
+        for entry in entries:
+            paths.add(entry.path)
+            if members is None:
+                row = _row(entry, directory, existing.get(entry.path))
+            else:
+                row = _member_row(entry, *members[entry.path])
+            if existing.get(entry.path) != row:
+                changed.append(row)
+        removed = [(path,) for path in existing if path not in paths]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO specs ({', '.join(_COLUMNS)})"  # noqa: S608
+                f" VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                changed,
+            )
+            self.connection.executemany("DELETE FROM specs WHERE path = ?", removed)
+        return len(changed), len(removed)
+
+    def lookup(self, query: str, key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return the specs where key, or any of KEYS, equals query.
+
+        The name is matched without regard to case, and an identifier may be
+        given without the prefix of the dataservice-publisher.
+
+        Args:
+            query: the value to look up
+            key: the column to look up the value in, one of KEYS
+
+        Returns:
+            the matching specs, ordered by path
+
+        Raises:
+            ValueError: if key is not one of KEYS
+        """
+        if key is not None and key not in KEYS:
+            raise ValueError(f"Cannot look up by >{key}<")
+        conditions = []
+        parameters: List[str] = []
+        for column in (key,) if key else KEYS:
+            if column == "navn":
+                # The collations of sqlite3 only fold the case of ascii:
+                conditions.append("navn_key = ?")
+                parameters.append(query.casefold())
+            elif column == "identifier":
+                conditions.append("identifier IN (?, ?)")
+                parameters.extend((_IDENTIFIER_PREFIX + query, query))
+            else:
+                conditions.append(f"{column} = ?")
+                parameters.append(query)
+        rows = self.connection.execute(
+            f"SELECT {', '.join(_COLUMNS[:-_INTERNAL])} FROM specs"  # noqa: S608
+            f" WHERE {' OR '.join(conditions)} ORDER BY path",
+            parameters,
+        )
+        return [dict(row) for row in rows]
+
+
+@click.command()
+@click.version_option(version=__version__)
+@click.argument("store", type=click.Path(exists=True, dir_okay=False))
+@click.argument("query")
+@click.option(
+    "--by",
+    "key",
+    help="The column to look up QUERY in [default: any of them]",
+    type=click.Choice(KEYS),
+)
+def main(store: str, query: str, key: Optional[str]) -> None:
+    """Print the specs in STORE of the bank, endpoint or dataservice QUERY."""
+    with LookupStore(store) as lookup_store:
+        specs = lookup_store.lookup(query, key)
+    if not specs:
+        sys.exit(f"No specs found for >{query}<")
+    click.echo(json.dumps(specs, ensure_ascii=False, indent=2))
+
+
+def _row(
+    entry: LookupEntry, directory: str, existing: Optional[Tuple[Any, ...]]
+) -> Tuple[Any, ...]:
+    """Return the row of entry, hashing the spec unless it is unchanged."""
+    stat = os.stat(os.path.join(directory, entry.path))
+    if existing is not None and existing[-2:] == (stat.st_size, stat.st_mtime_ns):
+        sha256 = existing[_COLUMNS.index("sha256")]
+    else:
+        with open(os.path.join(directory, entry.path), "rb") as specfile:
+            sha256 = hashlib.sha256(specfile.read()).hexdigest()
+    return _member_row(entry, stat.st_size, sha256, stat.st_mtime_ns)
+
+
+def _member_row(
+    entry: LookupEntry, size: int, sha256: str, mtime_ns: int = 0
+) -> Tuple[Any, ...]:
+    """Return the row of entry, for a spec of size bytes with sha256."""
+    return (
+        entry.path,
+        entry.orgnummer,
+        entry.navn,
+        entry.filnavn,
+        entry.environment,
+        entry.endpoint,
+        entry.identifier,
+        entry.url,
+        sha256,
+        entry.navn.casefold(),
+        size,
+        mtime_ns,
+    )
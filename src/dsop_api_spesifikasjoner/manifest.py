@@ -0,0 +1,120 @@
+"""Module for Manifest class."""
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .archive import ArchiveWriter
+
+MANIFEST_FILENAME = ".dsop_manifest.json"
+
+
+def input_digest(*inputs: Any) -> str:
+    """Return a digest of the json representation of inputs."""
+    return hashlib.sha256(
+        json.dumps(inputs, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class Manifest:
+    """Class recording a digest of the inputs of every output file.
+
+    The outputs are keyed by their path relative to the output directory. A
+    manifest without a directory or an archive is disabled: every output is
+    out of date and nothing is saved. The manifest of an archive is a member
+    of the archive, loaded from the existing archive and saved to the one
+    being written.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        basename: str = MANIFEST_FILENAME,
+        archive: Optional["ArchiveWriter"] = None,
+        load: bool = True,
+    ) -> None:
+        """Inits a manifest, loading the one named basename in directory if it exists.
+
+        Args:
+            directory: the output directory, if any
+            basename: the filename of the manifest
+            archive: the archive the outputs are written into, if any
+            load: load the existing manifest, instead of starting a new one in
+                which no output is current
+        """
+        self.directory = directory
+        self.basename = basename
+        self.archive = archive
+        self.entries: Dict[str, str] = {}
+        self.updated: Dict[str, str] = {}
+        if not self.enabled or not load:
+            return
+        try:
+            self.entries = json.loads(self._read())["outputs"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = {}
+
+    @property
+    def enabled(self) -> bool:
+        """True if the manifest has a directory or an archive."""
+        return self.directory is not None or self.archive is not None
+
+    @property
+    def filename(self) -> str:
+        """The path to the manifest file."""
+        return os.path.join(self.directory or "", self.basename)
+
+    def is_current(self, output: str, digest: str) -> bool:
+        """Check if output exists and was written from inputs with digest."""
+        if not self.enabled or self.entries.get(output) != digest:
+            return False
+        if not self._exists(output):
+            return False
+        self.updated[output] = digest
+        return True
+
+    def record(self, output: str, digest: str) -> None:
+        """Record that output has been written from inputs with digest."""
+        self.updated[output] = digest
+
+    def record_incomplete(self, output: str) -> None:
+        """Record that output has been written, but must be written again next run."""
+        self.updated[output] = ""
+
+    def stale(self) -> List[str]:
+        """Return the outputs of the loaded manifest that are no longer recorded."""
+        return sorted(set(self.entries) - set(self.updated))
+
+    def save(self) -> None:
+        """Write the manifest, unless nothing has changed since it was loaded.
+
+        The manifest of an archive is always written, as the archive is new.
+        """
+        if self.archive is not None:
+            self.archive.write(self.basename, self._encode())
+        elif self.directory is not None and self.updated != self.entries:
+            with open(self.filename, "wb") as manifestfile:
+                manifestfile.write(self._encode())
+        self.entries = dict(self.updated)
+
+    def _read(self) -> bytes:
+        """Return the content of the manifest, raising KeyError if it is missing."""
+        if self.archive is None:
+            with open(self.filename, "rb") as manifestfile:
+                return manifestfile.read()
+        if self.archive.previous is None:
+            raise KeyError(self.basename)
+        return self.archive.previous.read(self.basename)
+
+    def _exists(self, output: str) -> bool:
+        """Check if the output exists."""
+        if self.archive is None:
+            return os.path.exists(os.path.join(self.directory or "", output))
+        return self.archive.previous is not None and output in self.archive.previous
+
+    def _encode(self) -> bytes:
+        """Encode the manifest as json."""
+        return json.dumps(
+            {"outputs": self.updated}, ensure_ascii=False, indent=2, sort_keys=True
+        ).encode("utf-8")
@@ -0,0 +1,325 @@
+"""Module for probing the production and test endpoints of the banks.
+
+The endpoints in the bank registry are probed concurrently from an asyncio
+event loop. The requests are made by a bounded pool of threads sharing one
+pooled session, at most per_host at a time to each host and no more than
+rate a second to each host. An endpoint is available if every request to it
+gets a response with a status code below 500 within the timeout.
+
+Example:
+    >>> dsop_api_spesifikasjoner_probe banker.csv -o probe_report.json
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, TYPE_CHECKING
+from urllib.parse import urlparse
+
+import click
+
+from . import __version__
+from .fetch import create_session
+from .registry import read_registry, RegistryError
+
+if TYPE_CHECKING:  # pragma: no cover
+    import requests
+
+
+class Endpoint:
+    """Class representing an endpoint of a bank and the outcome of probing it."""
+
+    __slots__ = (
+        "orgnummer",
+        "navn",
+        "environment",
+        "url",
+        "statuses",
+        "errors",
+        "latencies",
+    )
+
+    def __init__(self, orgnummer: str, navn: str, environment: str, url: str) -> None:
+        """Inits an endpoint that has not been probed."""
+        self.orgnummer = orgnummer
+        self.navn = navn
+        self.environment = environment
+        self.url = url
+        # The status code of each request, None if it failed:
+        self.statuses: List[Optional[int]] = []
+        self.errors: List[str] = []
+        # The latency of each request that got a response below 500:
+        self.latencies: List[float] = []
+
+    @property
+    def ok(self) -> bool:
+        """Whether every request got a response below 500."""
+        return bool(self.statuses) and all(
+            status is not None and status < 500 for status in self.statuses
+        )
+
+
+class _Host:
+    """The limits of the requests to one host."""
+
+    __slots__ = ("semaphore", "lock", "next_start")
+
+    def __init__(self, per_host: int) -> None:
+        """Inits the limits of a host with per_host requests at a time."""
+        self.semaphore = asyncio.Semaphore(per_host)
+        self.lock = asyncio.Lock()
+        self.next_start = 0.0
+
+    async def wait_turn(self, interval: float) -> None:
+        """Wait until interval seconds after the last request started."""
+        loop = asyncio.get_running_loop()
+        async with self.lock:
+            start = max(loop.time(), self.next_start)
+            self.next_start = start + interval
+        await asyncio.sleep(start - loop.time())
+
+
+class Prober:
+    """Class probing endpoints concurrently."""
+
+    def __init__(
+        self,
+        concurrency: int = 16,
+        per_host: int = 2,
+        rate: float = 5,
+        timeout: float = 5,
+        requests_per_endpoint: int = 3,
+    ) -> None:
+        """Inits a prober.
+
+        Args:
+            concurrency: the number of requests at a time, and of pooled
+                connections
+            per_host: the number of requests at a time to each host
+            rate: the number of requests a second to each host
+            timeout: the seconds to wait for a response
+            requests_per_endpoint: the number of requests to each endpoint
+        """
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.interval = 1 / rate
+        self.timeout = timeout
+        self.requests_per_endpoint = requests_per_endpoint
+
+    def probe_all(self, endpoints: Sequence[Endpoint]) -> None:
+        """Probe endpoints, recording the outcome in each of them."""
+        asyncio.run(self._probe_all(endpoints))
+
+    async def _probe_all(self, endpoints: Sequence[Endpoint]) -> None:
+        # A failed request is not retried, as it is probed more than once, and
+        # the status code of a server error is recorded:
+        session = create_session(self.concurrency, 0, 0, statuses=())
+        semaphore = asyncio.Semaphore(self.concurrency)
+        hosts: Dict[str, _Host] = {}
+        with session, ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            await asyncio.gather(
+                *(
+                    self._probe(endpoint, session, executor, semaphore, hosts)
+                    for endpoint in endpoints
+                    for _ in range(self.requests_per_endpoint)
+                )
+            )
+
+    async def _probe(
+        self,
+        endpoint: Endpoint,
+        session: "requests.Session",
+        executor: ThreadPoolExecutor,
+        semaphore: asyncio.Semaphore,
+        hosts: Dict[str, _Host],
+    ) -> None:
+        host = hosts.setdefault(urlparse(endpoint.url).netloc, _Host(self.per_host))
+        loop = asyncio.get_running_loop()
+        # The limits of the host are waited for before taking one of the
+        # requests at a time, so a slow host does not hold up the others:
+        async with host.semaphore:
+            await host.wait_turn(self.interval)
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(
+                        loop.run_in_executor(
+                            executor, self._request, session, endpoint.url
+                        ),
+                        # The request times out on its own, this is a backstop:
+                        timeout=2 * self.timeout,
+                    )
+                except Exception as e:
+                    endpoint.statuses.append(None)
+                    endpoint.errors.append(f"{type(e).__name__}: {e}")
+                    return
+        endpoint.statuses.append(status)
+        if status < 500:
+            endpoint.latencies.append(time.perf_counter() - start)
+        else:
+            endpoint.errors.append(f"HTTP status code {status}")
+
+    def _request(self, session: "requests.Session", url: str) -> int:
+        """Request url, without reading the body, and return the status code."""
+        with session.get(
+            url, timeout=self.timeout, stream=True, allow_redirects=False
+        ) as response:
+            return response.status_code
+
+
+def registry_endpoints(banks: List[List[str]]) -> List[Endpoint]:
+    """Return the production and test endpoints of banks."""
+    return [
+        Endpoint(bank[0], bank[1], environment, url)
+        for bank in banks
+        for environment, url in (("production", bank[3]), ("test", bank[4]))
+        if url
+    ]
+
+
+def report(endpoints: Sequence[Endpoint]) -> Dict[str, Any]:
+    """Return the report of the probed endpoints.
+
+    Args:
+        endpoints: the probed endpoints
+
+    Returns:
+        a summary with the latency percentiles of all endpoints, and the
+        status, errors and latency percentiles of each endpoint
+    """
+    latencies = sorted(
+        latency for endpoint in endpoints for latency in endpoint.latencies
+    )
+    available = sum(1 for endpoint in endpoints if endpoint.ok)
+    return {
+        "version": __version__,
+        "summary": {
+            "endpoints": len(endpoints),
+            "ok": available,
+            "failing": len(endpoints) - available,
+            "latency": _percentiles(latencies),
+        },
+        "endpoints": [
+            {
+                "orgnummer": endpoint.orgnummer,
+                "navn": endpoint.navn,
+                "environment": endpoint.environment,
+                "url": endpoint.url,
+                "ok": endpoint.ok,
+                "statuses": endpoint.statuses,
+                "errors": endpoint.errors,
+                "latency": _percentiles(sorted(endpoint.latencies)),
+            }
+            for endpoint in endpoints
+        ],
+    }
+
+
+def read_failing_urls(filename: str) -> Set[str]:
+    """Return the urls of the failing endpoints in a report written by main."""
+    with open(filename, "r", encoding="utf-8") as reportfile:
+        probed = json.load(reportfile)
+    return {endpoint["url"] for endpoint in probed["endpoints"] if not endpoint["ok"]}
+
+
+@click.command()
+@click.version_option(version=__version__)
+@click.argument("input", type=click.File("r"))
+@click.option(
+    "-o",
+    "--output",
+    default="probe_report.json",
+    help="The file to write the json report to",
+    show_default=True,
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "-j",
+    "--concurrency",
+    default=16,
+    help="The number of requests at a time",
+    show_default=True,
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--per-host",
+    default=2,
+    help="The number of requests at a time to each host",
+    show_default=True,
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--rate",
+    default=5.0,
+    help="The number of requests a second to each host",
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+)
+@click.option(
+    "--timeout",
+    default=5.0,
+    help="The seconds to wait for a response",
+    show_default=True,
+    type=click.FloatRange(min=0, min_open=True),
+)
+@click.option(
+    "-n",
+    "--requests",
+    "requests_per_endpoint",
+    default=3,
+    help="The number of requests to each endpoint",
+    show_default=True,
+    type=click.IntRange(min=1),
+)
+def main(
+    input: Any,
+    output: str,
+    concurrency: int,
+    per_host: int,
+    rate: float,
+    timeout: float,
+    requests_per_endpoint: int,
+) -> None:
+    """Probe the production and test endpoints of the banks in INPUT."""
+    try:
+        banks = read_registry(input)
+    except RegistryError as e:
+        sys.exit("\n".join("ERROR: " + error for error in e.errors))
+    endpoints = registry_endpoints(banks)
+    prober = Prober(concurrency, per_host, rate, timeout, requests_per_endpoint)
+    prober.probe_all(endpoints)
+    probed = report(endpoints)
+    with open(output, "w", encoding="utf-8") as reportfile:
+        json.dump(probed, reportfile, ensure_ascii=False, indent=2)
+    summary = probed["summary"]
+    click.echo(
+        f"Probed {summary['endpoints']} endpoints: {summary['ok']} ok,"
+        f" {summary['failing']} failing"
+    )
+    for endpoint in endpoints:
+        if not endpoint.ok:
+            click.echo(
+                f"FAILING: {endpoint.navn} ({endpoint.environment})"
+                f" >{endpoint.url}<: {endpoint.errors[-1]}",
+                err=True,
+            )
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, Optional[float]]:
+    """Return the 50th, 90th and 99th percentile and maximum of sorted latencies."""
+    return {
+        **{
+            f"p{percentile}": _percentile(latencies, percentile)
+            for percentile in (50, 90, 99)
+        },
+        "max": latencies[-1] if latencies else None,
+    }
+
+
+def _percentile(latencies: List[float], percentile: int) -> Optional[float]:
+    """Return the percentile of sorted latencies, by the nearest rank."""
+    if not latencies:
+        return None
+    return latencies[max(math.ceil(percentile / 100 * len(latencies)) - 1, 0)]
@@ -0,0 +1,171 @@
+"""Module for timing the phases of a run.
+
+The module level profiler is disabled by default. Its hooks then return a
+shared context manager that does nothing, so they cost close to nothing.
+
+Example:
+    >>> from .profiling import profiler
+    >>> with profiler.phase("encode_specs"):
+    >>>     content = renderer.render(spec)
+    >>> profiler.count_bytes("write_files", len(content))
+
+Only the work done in the main process is measured; with more than one job,
+the specs generated and written by the workers are left out.
+"""
+from contextlib import contextmanager, nullcontext
+import cProfile
+import json
+import time
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+_DISABLED: ContextManager = nullcontext()
+
+PHASES = (
+    "parse_template",
+    "generate_specs",
+    "encode_specs",
+    "encode_catalogs",
+    "write_files",
+    "parse_specs",
+    "fetch_specs",
+    "dataservices",
+    "build_graph",
+    "serialize_rdf",
+    "compress_outputs",
+)
+
+
+class _Measurement:
+    """The accumulated wall time, cpu time, calls and bytes of a phase."""
+
+    __slots__ = ("wall", "cpu", "calls", "bytes")
+
+    def __init__(self) -> None:
+        """Inits an empty measurement."""
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.calls = 0
+        self.bytes = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the measurement as a dict."""
+        return {
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "calls": self.calls,
+            "bytes": self.bytes,
+        }
+
+
+class Profiler:
+    """Class timing the phases of a run and the work done for each bank."""
+
+    def __init__(self) -> None:
+        """Inits a disabled profiler."""
+        self.enabled = False
+        self.phases: Dict[str, _Measurement] = {}
+        self.banks: Dict[str, _Measurement] = {}
+        self._start = (0.0, 0.0)
+
+    def start(self) -> None:
+        """Enable the profiler and forget earlier measurements."""
+        self.enabled = True
+        self.phases = {phase: _Measurement() for phase in PHASES}
+        self.banks = {}
+        self._start = (time.perf_counter(), time.process_time())
+
+    def stop(self) -> None:
+        """Disable the profiler."""
+        self.enabled = False
+
+    def phase(self, name: str) -> ContextManager:
+        """Return a context manager timing its body as phase name."""
+        if not self.enabled:
+            return _DISABLED
+        return self._measure(self.phases, name)
+
+    def bank(self, name: str) -> ContextManager:
+        """Return a context manager timing its body as work for bank name."""
+        if not self.enabled:
+            return _DISABLED
+        return self._measure(self.banks, name)
+
+    def count_bytes(self, name: str, count: int) -> None:
+        """Add count bytes to phase name."""
+        if self.enabled:
+            self.phases.setdefault(name, _Measurement()).bytes += count
+
+    def report(self, slowest_banks: int = 10) -> Dict[str, Any]:
+        """Return the measurements of the run so far.
+
+        Args:
+            slowest_banks: the number of banks to include
+
+        Returns:
+            the total wall and cpu time, the measurement of every phase and
+            the banks that took the longest
+        """
+        banks = sorted(self.banks.items(), key=lambda item: -item[1].wall)
+        return {
+            "wall": time.perf_counter() - self._start[0],
+            "cpu": time.process_time() - self._start[1],
+            "phases": {
+                name: measurement.to_dict() for name, measurement in self.phases.items()
+            },
+            "slowest_banks": [
+                {"bank": name, **measurement.to_dict()}
+                for name, measurement in banks[:slowest_banks]
+            ],
+        }
+
+    def write_report(self, filename: str) -> None:
+        """Write the report as json to filename."""
+        with open(filename, "w", encoding="utf-8") as reportfile:
+            json.dump(self.report(), reportfile, ensure_ascii=False, indent=2)
+
+    @contextmanager
+    def _measure(
+        self, measurements: Dict[str, _Measurement], name: str
+    ) -> Iterator[None]:
+        measurement = measurements.setdefault(name, _Measurement())
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            measurement.wall += time.perf_counter() - wall
+            measurement.cpu += time.process_time() - cpu
+            measurement.calls += 1
+
+
+profiler = Profiler()
+
+
+@contextmanager
+def profiled(
+    report_filename: Optional[str] = None, pstats_filename: Optional[str] = None
+) -> Iterator[None]:
+    """Profile the body of the context.
+
+    Args:
+        report_filename: write the report of the module level profiler to
+            this file, if given
+        pstats_filename: run the body under cProfile and dump its stats to
+            this file, if given
+
+    Yields:
+        nothing
+    """
+    if report_filename:
+        profiler.start()
+    cprofiler = cProfile.Profile() if pstats_filename else None
+    if cprofiler:
+        cprofiler.enable()
+    try:
+        yield
+    finally:
+        if cprofiler and pstats_filename:
+            cprofiler.disable()
+            cprofiler.dump_stats(pstats_filename)
+        if report_filename:
+            profiler.write_report(report_filename)
+            profiler.stop()
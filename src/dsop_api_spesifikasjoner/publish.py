@@ -0,0 +1,326 @@
+"""Module for publishing a catalog to a dataservice-publisher.
+
+The catalog is split into entries: the catalog itself, and the dataservices
+of each api. Each entry is hashed, and the catalog is only published when an
+entry has changed, been added or been removed since the last successful
+publish to the endpoint. The publisher replaces the catalog with the one
+posted to it, so the catalog is always posted in full, as one turtle
+document with the dataservices of every api. If the spec of any api cannot
+be read, nothing is posted, as the dataservices of that api would otherwise
+be removed from the publisher.
+
+Example:
+    >>> dsop_api_spesifikasjoner_publish specs/dsop_catalog.json http://localhost:8080
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import click
+
+from . import __version__
+from .catalog import Catalog, decode_catalog
+from .fetch import create_session, SpecFetcher
+from .generateSpecification import catalog_triples
+from .template import default_cache_directory
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .rdfwriter import Triple
+
+PUBLISH_STATE_FILENAME = ".dsop_publish.json"
+
+
+class _Entry:
+    """A part of the catalog that is published as a whole."""
+
+    __slots__ = ("key", "triples", "digest")
+
+    def __init__(self, key: str, triples: List["Triple"]) -> None:
+        """Inits an entry with key and its triples."""
+        self.key = key
+        self.triples = triples
+        self.digest = _digest(triples)
+
+
+class PublishState:
+    """Class recording the digest of every entry published to an endpoint."""
+
+    def __init__(self, filename: str, endpoint: str) -> None:
+        """Inits the state of endpoint, loading it from filename if it exists."""
+        self.filename = filename
+        self.endpoint = endpoint
+        self.endpoints: Dict[str, Dict[str, str]] = {}
+        try:
+            with open(filename, "r", encoding="utf-8") as statefile:
+                self.endpoints = json.load(statefile)["endpoints"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.endpoints = {}
+        self.entries = self.endpoints.setdefault(endpoint, {})
+
+    def is_published(self, key: str, digest: str) -> bool:
+        """Check if the entry key was published with digest."""
+        return self.entries.get(key) == digest
+
+    def record(self, entries: Dict[str, str]) -> None:
+        """Record that a catalog of entries, keyed by key, has been published."""
+        self.entries.clear()
+        self.entries.update(entries)
+
+    def save(self) -> None:
+        """Write the state."""
+        with open(self.filename, "w", encoding="utf-8") as statefile:
+            json.dump(
+                {"endpoints": self.endpoints},
+                statefile,
+                ensure_ascii=False,
+                indent=2,
+                sort_keys=True,
+            )
+
+
+class PublishResult:
+    """Class representing the outcome of publishing a catalog."""
+
+    def __init__(
+        self,
+        published: int = 0,
+        changed: int = 0,
+        skipped: bool = False,
+        error: Optional[str] = None,
+    ) -> None:
+        """Inits a result.
+
+        Args:
+            published: the number of apis in the catalog posted, 0 if none was
+            changed: the number of apis changed since the last publish
+            skipped: True if the catalog is unchanged since the last publish
+            error: the error if the catalog could not be published
+        """
+        self.published = published
+        self.changed = changed
+        self.skipped = skipped
+        self.error = error
+
+
+class Publisher:
+    """Class posting catalogs as turtle documents to a dataservice-publisher.
+
+    A request that fails with a server error is retried with exponential
+    backoff. A post replaces the catalog with the full catalog posted, so
+    posting it again has the same effect, and retrying the post is safe.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        token: Optional[str] = None,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = 30,
+    ) -> None:
+        """Inits a publisher to endpoint, authorized by token if given."""
+        self.url = endpoint.rstrip("/") + "/catalogs"
+        self.token = token
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+
+    def post(self, document: bytes) -> Optional[str]:
+        """Post the catalog document, and return the error if it was not published."""
+        import requests
+
+        headers = {"Content-Type": "text/turtle; charset=utf-8"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        session = create_session(1, self.retries, self.backoff_factor, ("POST",))
+        try:
+            with session, session.post(
+                self.url, data=document, headers=headers, timeout=self.timeout
+            ) as response:
+                if response.status_code not in (200, 201, 204):
+                    return f"HTTP status code {response.status_code}"
+        except requests.RequestException as e:
+            return f"{type(e).__name__}: {e}"
+        return None
+
+
+def publish(
+    catalog: Catalog,
+    publisher: Publisher,
+    state: PublishState,
+    use_local_files: bool,
+    fetcher: Optional[SpecFetcher] = None,
+) -> PublishResult:
+    """Publish catalog in full, unless it is unchanged since it was published.
+
+    Nothing is posted if the spec of any api cannot be read.
+
+    Args:
+        catalog: the catalog
+        publisher: the publisher to the endpoint
+        state: the entries published to the endpoint, which is updated with
+            the entries of catalog if it is published
+        use_local_files: read the specs in this repository from local files
+        fetcher: the fetcher of remote specs
+
+    Returns:
+        the result
+    """
+    skipped: List[str] = []
+    catalog_entry, api_entries = catalog_entries(
+        catalog, use_local_files, fetcher, skipped
+    )
+    if skipped:
+        return PublishResult(
+            error=(
+                f"Cannot publish the catalog, as the specs of {len(skipped)} apis"
+                f" cannot be read: {', '.join(skipped)}"
+            )
+        )
+    entries = [catalog_entry, *api_entries]
+    digests = {entry.key: entry.digest for entry in entries}
+    if digests == state.entries:
+        return PublishResult(skipped=True)
+    changed = sum(
+        1 for entry in api_entries if not state.is_published(entry.key, entry.digest)
+    )
+    error = publisher.post(_document(entries))
+    if error:
+        return PublishResult(
+            changed=changed,
+            error=f"Cannot publish the catalog with {len(api_entries)} apis: {error}",
+        )
+    state.record(digests)
+    return PublishResult(len(api_entries), changed)
+
+
+def catalog_entries(
+    catalog: Catalog,
+    use_local_files: bool,
+    fetcher: Optional[SpecFetcher] = None,
+    skipped: Optional[List[str]] = None,
+) -> Tuple[_Entry, List[_Entry]]:
+    """Return the entry of catalog itself and the entry of each api.
+
+    The entry of an api is keyed by its dataservices. An api whose spec
+    cannot be read is left out, and added to skipped.
+
+    Args:
+        catalog: the catalog
+        use_local_files: read the specs in this repository from local files
+        fetcher: the fetcher of remote specs
+        skipped: the list to add the url of each api left out to, if any
+
+    Returns:
+        the entry of the catalog, and the entries of the apis
+    """
+    from rdflib.namespace import DCAT
+
+    batches = catalog_triples(
+        catalog, use_local_files, fetcher=fetcher, skipped=skipped
+    )
+    catalog_entry = _Entry(catalog.identifier, next(batches))
+    api_entries = [
+        _Entry(
+            " ".join(sorted(str(o) for _, p, o in triples if p == DCAT.service)),
+            triples,
+        )
+        for triples in batches
+    ]
+    return catalog_entry, api_entries
+
+
+@click.command()
+@click.version_option(version=__version__)
+@click.argument("catalog", type=click.Path(exists=True, dir_okay=False))
+@click.argument("endpoint")
+@click.option(
+    "--use-local-files",
+    is_flag=True,
+    help="Read the specifications in this repository from local files",
+)
+@click.option(
+    "--token",
+    envvar="DSOP_PUBLISHER_TOKEN",
+    help="The bearer token of the endpoint [env: DSOP_PUBLISHER_TOKEN]",
+)
+@click.option(
+    "--state",
+    help=(
+        "The file recording what has been published"
+        f" [default: {PUBLISH_STATE_FILENAME} in the directory of CATALOG]"
+    ),
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Publish the catalog, also if it is unchanged since the last publish",
+)
+@click.option(
+    "--cache-directory",
+    default=lambda: default_cache_directory(),
+    help="The directory caching remote specifications between runs",
+    show_default="~/.cache/dsop_api_spesifikasjoner",
+    type=click.Path(file_okay=False, writable=True),
+)
+def main(
+    catalog: str,
+    endpoint: str,
+    use_local_files: bool,
+    token: Optional[str],
+    state: Optional[str],
+    force: bool,
+    cache_directory: Optional[str],
+) -> None:
+    """Publish the json CATALOG and its dataservices to the ENDPOINT."""
+    with open(catalog, "rb") as catalogfile:
+        decoded = decode_catalog(catalogfile.read())
+    publish_state = PublishState(
+        state or os.path.join(os.path.dirname(catalog), PUBLISH_STATE_FILENAME),
+        endpoint,
+    )
+    if force:
+        publish_state.entries.clear()
+    fetcher = SpecFetcher(
+        os.path.join(cache_directory, "http") if cache_directory else None
+    )
+    result = publish(
+        decoded, Publisher(endpoint, token), publish_state, use_local_files, fetcher
+    )
+    if result.error:
+        click.echo(f"ERROR: {result.error}", err=True)
+        sys.exit(1)
+    if result.skipped:
+        click.echo("Skipped the catalog, unchanged since it was published")
+        return
+    publish_state.save()
+    click.echo(
+        f"Published the catalog with {result.published} apis,"
+        f" {result.changed} changed"
+    )
+
+
+def _document(entries: List[_Entry]) -> bytes:
+    """Return the turtle document of the triples of entries."""
+    from .rdfwriter import create_rdf_writer
+
+    document = io.StringIO()
+    writer = create_rdf_writer(document, "turtle")
+    for entry in entries:
+        writer.write(entry.triples)
+    return document.getvalue().encode("utf-8")
+
+
+def _digest(triples: List["Triple"]) -> str:
+    """Return a digest of triples, independent of their order."""
+    from .rdfwriter import create_rdf_writer
+
+    lines = io.StringIO()
+    create_rdf_writer(lines, "ntriples").write(triples)
+    return hashlib.sha256(
+        "".join(sorted(lines.getvalue().splitlines(keepends=True))).encode("utf-8")
+    ).hexdigest()
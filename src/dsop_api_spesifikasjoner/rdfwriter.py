@@ -0,0 +1,197 @@
+"""Module for writing rdf triples to a file as they are created.
+
+The triples of each batch are written in a canonical order, with the blank
+nodes labelled by their content, so that equal batches are written as equal
+text in every run.
+
+Example:
+    >>> with open("dsop_catalog.ttl", "w", encoding="utf-8") as f:
+    >>>     writer = create_rdf_writer(f, "turtle")
+    >>>     for triples in batches:
+    >>>         writer.write(triples)
+"""
+from abc import ABC, abstractmethod
+import re
+from typing import Callable, Dict, Iterable, List, TextIO, Tuple
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.compare import to_canonical_graph
+from rdflib.namespace import RDF
+from rdflib.term import Node
+
+Triple = Tuple[Node, Node, Node]
+
+RDF_FORMATS = {"turtle": ".ttl", "ntriples": ".nt"}
+
+PREFIXES = {
+    "dcat": "http://www.w3.org/ns/dcat#",
+    "dct": "http://purl.org/dc/terms/",
+    "foaf": "http://xmlns.com/foaf/0.1/",
+    "odrl": "http://www.w3.org/ns/odrl/2/",
+    "prov": "http://www.w3.org/ns/prov#",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "vcard": "http://www.w3.org/2006/vcard/ns#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+}
+
+_LOCAL_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_-]*$")
+
+
+class RDFWriter(ABC):
+    """Base class writing batches of triples to a text file."""
+
+    def __init__(self, file: TextIO) -> None:
+        """Inits a writer on file."""
+        self.file = file
+        self.batches = 0
+
+    @abstractmethod
+    def write(self, triples: Iterable[Triple]) -> None:
+        """Write a batch of triples."""
+
+    def _canonical(self, triples: Iterable[Triple]) -> List[Triple]:
+        """Return the batch in canonical order, with labels unique to the batch."""
+        self.batches += 1
+        return canonical_triples(triples, f"b{self.batches}")
+
+
+class NTriplesWriter(RDFWriter):
+    """Class writing triples as N-Triples, one line per triple."""
+
+    def write(self, triples: Iterable[Triple]) -> None:
+        """Write a batch of triples."""
+        self.file.writelines(
+            f"{_nt_term(s)} {_nt_term(p)} {_nt_term(o)} .\n"
+            for s, p, o in self._canonical(triples)
+        )
+
+
+class TurtleWriter(RDFWriter):
+    """Class writing triples as Turtle, grouped by subject within each batch.
+
+    The prefixes are declared when the writer is created. A subject may occur
+    in more than one batch, which gives more than one statement about it.
+    """
+
+    def __init__(self, file: TextIO) -> None:
+        """Inits a writer on file and writes the prefixes."""
+        super().__init__(file)
+        self.prefixes = sorted(PREFIXES.items(), key=lambda item: -len(item[1]))
+        file.writelines(
+            f"@prefix {prefix}: <{namespace}> .\n"
+            for prefix, namespace in sorted(PREFIXES.items())
+        )
+        file.write("\n")
+
+    def write(self, triples: Iterable[Triple]) -> None:
+        """Write a batch of triples."""
+        subjects: Dict[Node, Dict[Node, List[Node]]] = {}
+        for s, p, o in self._canonical(triples):
+            subjects.setdefault(s, {}).setdefault(p, []).append(o)
+        for subject, predicates in subjects.items():
+            self.file.write(self._statement(subject, predicates))
+
+    def _statement(self, subject: Node, predicates: Dict[Node, List[Node]]) -> str:
+        lines = []
+        for predicate in sorted(predicates, key=lambda p: (p != RDF.type, str(p))):
+            objects = ",\n        ".join(
+                sorted(self._term(o) for o in predicates[predicate])
+            )
+            name = "a" if predicate == RDF.type else self._term(predicate)
+            lines.append(f"{name} {objects}")
+        return f"{self._term(subject)} " + " ;\n    ".join(lines) + " .\n\n"
+
+    def _term(self, node: Node) -> str:
+        if isinstance(node, URIRef):
+            for prefix, namespace in self.prefixes:
+                if node.startswith(namespace) and _LOCAL_NAME.match(
+                    node[len(namespace) :]
+                ):
+                    return f"{prefix}:{node[len(namespace):]}"
+        if isinstance(node, Literal):
+            return _literal(node, self._term)
+        return _nt_term(node)
+
+
+def create_rdf_writer(file: TextIO, rdf_format: str) -> RDFWriter:
+    """Return a writer of rdf_format, one of RDF_FORMATS, on file."""
+    if rdf_format == "ntriples":
+        return NTriplesWriter(file)
+    return TurtleWriter(file)
+
+
+def canonical_triples(triples: Iterable[Triple], prefix: str = "") -> List[Triple]:
+    """Return triples in canonical order, with blank nodes labelled by content.
+
+    Args:
+        triples: the triples
+        prefix: the prefix of the labels of the blank nodes
+
+    Returns:
+        the triples, sorted by their N-Triples
+    """
+    triples = list(triples)
+    if _has_blank_nodes(triples):
+        triples = [
+            tuple(  # type: ignore
+                BNode(prefix + term) if isinstance(term, BNode) else term
+                for term in triple
+            )
+            for triple in to_canonical_graph(_graph(triples))
+        ]
+    return sorted(triples, key=lambda triple: tuple(map(_nt_term, triple)))
+
+
+def canonical_graph(graph: Graph) -> Graph:
+    """Return graph, with its blank nodes labelled by content."""
+    if not _has_blank_nodes(graph):
+        return graph
+    canonical = _graph(to_canonical_graph(graph))
+    for prefix, namespace in graph.namespaces():
+        canonical.bind(prefix, namespace, override=True)
+    return canonical
+
+
+def _has_blank_nodes(triples: Iterable[Triple]) -> bool:
+    """Check if any of triples has a blank node."""
+    return any(isinstance(term, BNode) for triple in triples for term in triple)
+
+
+def _graph(triples: Iterable[Triple]) -> Graph:
+    """Return a graph of triples."""
+    graph = Graph()
+    for triple in triples:
+        graph.add(triple)
+    return graph
+
+
+def _nt_term(node: Node) -> str:
+    """Return node in N-Triples syntax."""
+    if isinstance(node, URIRef):
+        return f"<{node}>"
+    if isinstance(node, BNode):
+        return f"_:{node}"
+    if isinstance(node, Literal):
+        return _literal(node, _nt_term)
+    raise ValueError(f"Not an rdf term: {node!r}")
+
+
+def _literal(literal: Literal, term: Callable[[Node], str]) -> str:
+    """Return literal on one line, rendering its datatype with term."""
+    quoted = '"' + _escape(str(literal)) + '"'
+    if literal.language:
+        return f"{quoted}@{literal.language}"
+    if literal.datatype:
+        return f"{quoted}^^{term(literal.datatype)}"
+    return quoted
+
+
+def _escape(value: str) -> str:
+    """Escape value for a quoted string on one line."""
+    return (
+        value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
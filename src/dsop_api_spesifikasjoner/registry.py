@@ -0,0 +1,146 @@
+"""Module for reading and validating the bank registry (banker.csv).
+
+The columns are mapped by their header, and every row is validated before
+anything is generated. All errors are collected and reported together.
+iter_registry reads the rows one at a time instead, and reports the errors
+once every row has been read.
+
+Example:
+    >>> with open("banker.csv", "r", encoding="utf-8") as f:
+    >>>     banks = read_registry(f)
+"""
+import csv
+import re
+from typing import Dict, Iterable, Iterator, List
+from urllib.parse import urlparse
+
+COLUMNS = (
+    "OrgNummer",
+    "Navn",
+    "Filnavn",
+    "EndepunktProduksjon",
+    "EndepunktTest",
+    "Id",
+    "TestId",
+)
+# The ids may be left out of the registry:
+REQUIRED_COLUMNS = COLUMNS[:5]
+
+_ORGNUMMER = re.compile(r"^\d{9}$")
+_ID = re.compile(r"^[A-Za-z0-9._~-]+$")
+
+
+class RegistryError(Exception):
+    """Exception raised for errors in the bank registry."""
+
+    def __init__(self, errors: List[str]) -> None:
+        """Inits the exception with every error found."""
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+def read_registry(lines: Iterable[str]) -> List[List[str]]:
+    """Read and validate the banks of the registry.
+
+    Args:
+        lines: the lines of the registry, starting with the header
+
+    Returns:
+        the banks, each with the values of COLUMNS in that order
+    """
+    return list(iter_registry(lines))
+
+
+def iter_registry(lines: Iterable[str]) -> Iterator[List[str]]:
+    """Read and validate the banks of the registry, one line at a time.
+
+    Only the banks without errors are yielded. The org numbers, file names
+    and ids seen so far are kept, to find duplicates.
+
+    Args:
+        lines: the lines of the registry, starting with the header
+
+    Yields:
+        the banks, each with the values of COLUMNS in that order
+
+    Raises:
+        RegistryError: if the registry has any errors, once every line has
+            been read
+    """
+    reader = csv.reader(lines, delimiter=",")
+    header = next(reader, None)
+    if header is None:
+        raise RegistryError(["The bank registry is empty"])
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise RegistryError([f"Missing columns in header: {', '.join(missing)}"])
+    positions = [
+        header.index(column) if column in header else None for column in COLUMNS
+    ]
+
+    errors: List[str] = []
+    seen: Dict[str, Dict[str, int]] = {"OrgNummer": {}, "Filnavn": {}, "Id": {}}
+    for row in reader:
+        line = reader.line_num
+        if not any(row):
+            continue
+        if len(row) != len(header):
+            errors.append(
+                f"line {line}: Expected {len(header)} fields, found {len(row)}"
+            )
+            continue
+        bank = [row[p] if p is not None else "" for p in positions]
+        bank_errors = [f"line {line}: {error}" for error in _validate(bank)]
+        # The ids of the prod and test apis share one namespace:
+        unique = [("OrgNummer", bank[0]), ("Filnavn", bank[2])]
+        unique += [("Id", api_id) for api_id in bank[5:] if api_id]
+        for column, value in unique:
+            if value in seen[column]:
+                bank_errors.append(
+                    f"line {line}: Duplicate {column} >{value}<,"
+                    f" also on line {seen[column][value]}"
+                )
+            seen[column].setdefault(value, line)
+        errors.extend(bank_errors)
+        if not bank_errors:
+            yield bank
+    if errors:
+        raise RegistryError(errors)
+
+
+def _validate(bank: List[str]) -> Iterable[str]:
+    """Return the errors in the values of bank."""
+    orgnummer, navn, filnavn, production_url, test_url, api_id, test_id = bank
+    if not _ORGNUMMER.match(orgnummer):
+        yield f"OrgNummer must be nine digits >{orgnummer}<"
+    if not navn.strip():
+        yield "Navn is empty"
+    if (
+        not filnavn
+        or filnavn.startswith(".")
+        or "/" in filnavn
+        or "\\" in filnavn
+        or not filnavn.endswith(".json")
+    ):
+        yield f"Filnavn must be the name of a .json file >{filnavn}<"
+    for column, url in (
+        ("EndepunktProduksjon", production_url),
+        ("EndepunktTest", test_url),
+    ):
+        if url:
+            yield from _validate_url(column, url)
+    for column, value in (("Id", api_id), ("TestId", test_id)):
+        if value and not _ID.match(value):
+            yield (
+                f"{column} may only have letters, digits and '.', '_', '~', '-'"
+                f" >{value}<"
+            )
+
+
+def _validate_url(column: str, url: str) -> Iterable[str]:
+    """Return the errors in an endpoint url."""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.netloc or " " in url:
+        yield f"{column} is not a valid url >{url}<"
+    if url.endswith("/"):
+        yield f"Trailing slash in url is not allowed >{url}<"
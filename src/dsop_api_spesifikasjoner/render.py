@@ -0,0 +1,106 @@
+"""Module for rendering specifications based on a pre-encoded template."""
+import json
+from typing import Any, List, Optional, Tuple
+
+_TITLE_PLACEHOLDER = "@@dsop-api-spesifikasjoner:info.title@@"
+_SERVERS_PLACEHOLDER = "@@dsop-api-spesifikasjoner:servers@@"
+
+
+def encode(spec: Any) -> bytes:
+    """Encode a spec the same way the spec files have always been written."""
+    return json.dumps(spec, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+class SpecRenderer:
+    """Class rendering bank specs by splicing into a pre-encoded template.
+
+    The template is encoded once with placeholders for info.title and servers.
+    Rendering a bank spec then only encodes the title and the servers, and
+    joins them with the invariant chunks of the template.
+    """
+
+    def __init__(self, template: dict) -> None:
+        """Inits a renderer by encoding the invariant parts of the template."""
+        self.template = template
+        self._chunks: Optional[Tuple[bytes, bytes, bytes]] = None
+        self._title_first = True
+        self._servers_indent = ""
+        skeleton = dict(template)
+        skeleton["info"] = dict(template["info"])
+        skeleton["info"]["title"] = _TITLE_PLACEHOLDER
+        skeleton["servers"] = _SERVERS_PLACEHOLDER
+        encoded = json.dumps(skeleton, ensure_ascii=False, indent=2)
+        title_token = json.dumps(_TITLE_PLACEHOLDER)
+        servers_token = json.dumps(_SERVERS_PLACEHOLDER)
+        if encoded.count(title_token) != 1 or encoded.count(servers_token) != 1:
+            # The template contains one of the placeholders. Fall back to
+            # encoding every spec in full.
+            return
+        title_at = encoded.index(title_token)
+        servers_at = encoded.index(servers_token)
+        self._title_first = title_at < servers_at
+        line_start = encoded.rindex("\n", 0, servers_at) + 1
+        self._servers_indent = " " * (
+            len(encoded[line_start:]) - len(encoded[line_start:].lstrip(" "))
+        )
+        first, second = sorted([(title_at, title_token), (servers_at, servers_token)])
+        self._chunks = (
+            encoded[: first[0]].encode("utf-8"),
+            encoded[first[0] + len(first[1]) : second[0]].encode("utf-8"),
+            encoded[second[0] + len(second[1]) :].encode("utf-8"),
+        )
+
+    def render(self, spec: dict) -> bytes:
+        """Render a spec generated from the template.
+
+        Falls back to encoding the full spec if it differs from the template
+        in anything but info.title and servers.
+
+        Args:
+            spec: the bank specific specification
+
+        Returns:
+            the encoded specification, identical to encode(spec)
+        """
+        if self._chunks is None or not is_overlay(spec, self.template):
+            return encode(spec)
+        title = json.dumps(spec["info"]["title"], ensure_ascii=False)
+        servers = json.dumps(spec["servers"], ensure_ascii=False, indent=2).replace(
+            "\n", "\n" + self._servers_indent
+        )
+        parts: List[str] = [title, servers] if self._title_first else [servers, title]
+        head, middle, tail = self._chunks
+        return b"".join(
+            [head, parts[0].encode("utf-8"), middle, parts[1].encode("utf-8"), tail]
+        )
+
+
+def is_overlay(spec: dict, template: dict) -> bool:
+    """Check that spec differs from template only in info.title and servers."""
+    if list(spec) != _keys_with(template, "servers"):
+        return False
+    info = spec["info"]
+    if not isinstance(info, dict) or list(info) != _keys_with(
+        template["info"], "title"
+    ):
+        return False
+    return _shares_values(info, template["info"], "title") and _shares_values(
+        spec, template, "info", "servers"
+    )
+
+
+def _keys_with(mapping: dict, key: str) -> List[str]:
+    """Return the keys of mapping in order, with key appended if missing."""
+    keys = list(mapping)
+    if key not in mapping:
+        keys.append(key)
+    return keys
+
+
+def _shares_values(mapping: dict, template: dict, *excluded: str) -> bool:
+    """Check that mapping has the values of template for all but excluded keys."""
+    return all(
+        mapping[key] is value or mapping[key] == value
+        for key, value in template.items()
+        if key not in excluded
+    )
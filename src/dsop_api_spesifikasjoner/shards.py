@@ -0,0 +1,118 @@
+"""Module for sharding a catalog and indexing its shards.
+
+A sharded catalog is split into catalogs with the same identifier, title
+and publisher, each with the apis of one publisher or one page of the apis.
+The index maps the org number of each publisher and the identifier of each
+api to the shards they are in, so a consumer only fetches the shards it
+needs.
+
+Example:
+    >>> shards = shard_catalog(catalog, "orgnummer")
+"""
+import json
+from typing import Dict, List, Sequence, Tuple
+
+from .catalog import API, Catalog
+
+SHARD_BY = ("orgnummer", "page")
+
+
+class Shard:
+    """Class representing a part of a catalog."""
+
+    __slots__ = ("key", "catalog", "indexes")
+
+    def __init__(self, key: str, catalog: Catalog) -> None:
+        """Inits an empty shard of catalog."""
+        self.key = key
+        self.catalog = Catalog(production=True)
+        self.catalog.identifier = catalog.identifier
+        self.catalog.title = catalog.title
+        self.catalog.description = catalog.description
+        self.catalog.publisher = catalog.publisher
+        # The indexes of the apis of the shard in catalog:
+        self.indexes: List[int] = []
+
+
+def shard_catalog(catalog: Catalog, shard_by: str, page_size: int = 100) -> List[Shard]:
+    """Split catalog into shards.
+
+    Args:
+        catalog: the catalog
+        shard_by: "orgnummer" for a shard for each publisher, keyed by its
+            org number, or "page" for a shard for each page_size apis, keyed
+            by the page number
+        page_size: the number of apis in each page
+
+    Returns:
+        the shards, in the order of their first api in catalog
+
+    Raises:
+        ValueError: if shard_by is not one of SHARD_BY
+    """
+    if shard_by not in SHARD_BY:
+        raise ValueError(f"Cannot shard by >{shard_by}<")
+    shards: Dict[str, Shard] = {}
+    for index, api in enumerate(catalog.apis):
+        key = (
+            publisher_orgnummer(api)
+            if shard_by == "orgnummer"
+            else f"page_{index // page_size + 1:04d}"
+        )
+        shard = shards.get(key)
+        if shard is None:
+            shard = shards[key] = Shard(key, catalog)
+        shard.catalog.apis.append(api)
+        shard.indexes.append(index)
+    return list(shards.values())
+
+
+def publisher_orgnummer(api: API) -> str:
+    """Return the org number at the end of the publisher of api."""
+    return api.publisher.rsplit("/", 1)[-1]
+
+
+def encode_shard_index(
+    catalog: Catalog,
+    shard_by: str,
+    shards: Sequence[Shard],
+    locations: Sequence[Tuple[str, str]],
+) -> bytes:
+    """Encode the index of the shards of catalog as json.
+
+    Args:
+        catalog: the catalog
+        shard_by: what the catalog is sharded by
+        shards: the shards
+        locations: the location of the json and rdf catalog of each shard,
+            relative to the index
+
+    Returns:
+        the index
+    """
+    orgnummers: Dict[str, List[str]] = {}
+    identifiers: Dict[str, str] = {}
+    for shard in shards:
+        for api in shard.catalog.apis:
+            keys = orgnummers.setdefault(publisher_orgnummer(api), [])
+            if shard.key not in keys:
+                keys.append(shard.key)
+            identifiers[api.identifier] = shard.key
+    index = {
+        "identifier": catalog.identifier,
+        "shardBy": shard_by,
+        "shards": [
+            {
+                "key": shard.key,
+                "catalog": catalog_location,
+                "rdf": rdf_location,
+                "apis": len(shard.catalog.apis),
+            }
+            for shard, (catalog_location, rdf_location) in zip(  # noqa: B905
+                shards, locations
+            )
+        ],
+        "orgnummer": orgnummers,
+        "identifiers": identifiers,
+    }
+    return json.dumps(index, ensure_ascii=False, indent=2).encode("utf-8")
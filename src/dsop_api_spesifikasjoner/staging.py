@@ -0,0 +1,101 @@
+"""Module for staging the outputs of a run before moving them into place.
+
+Example:
+    >>> with StagedOutput("specs") as staging_directory:
+    >>>     write_outputs(staging_directory)
+"""
+import os
+import shutil
+import tempfile
+from types import TracebackType
+from typing import List, Optional, Tuple, Type
+
+STAGING_PREFIX = ".dsop_staging-"
+BACKUP_PREFIX = ".dsop_backup-"
+
+
+class StagedOutput:
+    """Class staging the files written for an output directory.
+
+    The files are written to a staging directory inside the output directory,
+    so that it is on the same file system. If the run succeeds, each staged
+    file atomically replaces its counterpart in the output directory. If the
+    run fails, the staging directory is removed and the output directory is
+    left as it was.
+
+    The files are replaced one at a time, rather than swapping the whole
+    output directory, which may be the current directory and holds files
+    that are not outputs. A link to each replaced file is kept until the
+    commit is done, and if moving a file fails, the files moved so far are
+    moved back. Only a crash of the process during the commit can leave the
+    output directory partly updated.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Inits a stage for directory."""
+        self.directory = directory
+        self.staging_directory: Optional[str] = None
+
+    def __enter__(self) -> str:
+        """Create the staging directory and return its path."""
+        self.staging_directory = tempfile.mkdtemp(
+            prefix=STAGING_PREFIX, dir=self.directory
+        )
+        return os.path.join(self.staging_directory, "")
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Move the staged files into place, unless the run failed."""
+        if self.staging_directory is None:
+            return
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            shutil.rmtree(self.staging_directory, ignore_errors=True)
+            self.staging_directory = None
+
+    def commit(self) -> None:
+        """Move every staged file into the output directory, or none of them."""
+        if self.staging_directory is None:
+            return
+        backup_directory = tempfile.mkdtemp(prefix=BACKUP_PREFIX, dir=self.directory)
+        # Each file moved, with the link to the file it replaced, if any:
+        moved: List[Tuple[str, Optional[str]]] = []
+        created: List[str] = []
+        try:
+            for root, _, filenames in os.walk(self.staging_directory):
+                target = os.path.join(
+                    self.directory, os.path.relpath(root, self.staging_directory)
+                )
+                if not os.path.isdir(target):
+                    os.makedirs(target)
+                    created.append(target)
+                for filename in filenames:
+                    target_filename = os.path.join(target, filename)
+                    backup = None
+                    if os.path.exists(target_filename):
+                        backup = os.path.join(backup_directory, str(len(moved)))
+                        os.link(target_filename, backup)
+                    os.replace(os.path.join(root, filename), target_filename)
+                    moved.append((target_filename, backup))
+        except BaseException:
+            _roll_back(moved, created)
+            raise
+        finally:
+            shutil.rmtree(backup_directory, ignore_errors=True)
+
+
+def _roll_back(moved: List[Tuple[str, Optional[str]]], created: List[str]) -> None:
+    """Put back the files replaced by moved, and remove the created directories."""
+    for target_filename, backup in reversed(moved):
+        if backup is None:
+            os.remove(target_filename)
+        else:
+            os.replace(backup, target_filename)
+    for directory in reversed(created):
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,91 @@
+"""Module for Template class."""
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+from .profiling import profiler
+
+
+class Template:
+    """Class representing an openAPI template, parsed when first needed.
+
+    If a cache directory is given, the parsed template is kept there as json,
+    keyed by the digest of its text, so that later runs with the same template
+    skip parsing the yaml. A template that does not parse to the same value
+    through json, like one with numbers as keys, is not cached.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        cache_directory: Optional[str] = None,
+        name: str = "template",
+    ) -> None:
+        """Inits a template from its yaml (or json) text, read from name."""
+        self.text = text
+        self.name = name
+        self.digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.cache_directory = cache_directory
+        self._parsed: Optional[dict] = None
+
+    @property
+    def parsed(self) -> dict:
+        """The parsed template."""
+        if self._parsed is None:
+            with profiler.phase("parse_template"):
+                self._parsed = self._read_cache()
+                if self._parsed is None:
+                    self._parsed = load_yaml(self.text)
+                    self._write_cache(self._parsed)
+        return self._parsed
+
+    def _cache_filename(self) -> Optional[str]:
+        if self.cache_directory is None:
+            return None
+        return os.path.join(self.cache_directory, f"{self.digest}.parsed.json")
+
+    def _read_cache(self) -> Optional[dict]:
+        filename = self._cache_filename()
+        if filename is None:
+            return None
+        try:
+            with open(filename, "r", encoding="utf-8") as cachefile:
+                parsed = json.load(cachefile)
+        except (OSError, ValueError):
+            return None
+        return parsed if isinstance(parsed, dict) else None
+
+    def _write_cache(self, parsed: Any) -> None:
+        filename = self._cache_filename()
+        if filename is None or not isinstance(parsed, dict):
+            return
+        try:
+            content = json.dumps(parsed, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        if json.loads(content) != parsed:
+            return
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # Write to a temporary file first, as another run may read the entry:
+        temporary_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(temporary_filename, "w", encoding="utf-8") as cachefile:
+            cachefile.write(content)
+        os.replace(temporary_filename, filename)
+
+
+def default_cache_directory() -> str:
+    """Return the cache directory of the user, for the templates and specs."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "dsop_api_spesifikasjoner")
+
+
+def load_yaml(text: str) -> Any:
+    """Parse yaml (or json) text, with the C loader of libyaml if available."""
+    import yaml
+
+    return yaml.load(  # noqa: S506
+        text, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    )
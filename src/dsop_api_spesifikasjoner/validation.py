@@ -0,0 +1,243 @@
+"""Module for validating openAPI 3.0 specifications.
+
+A spec is validated against SCHEMA_FILENAME, the official json schema of
+openAPI 3.0 documents, by a jsonschema validator which is compiled when
+first used and reused for every spec of the run. The rules of the openAPI
+specification that the schema does not express are checked along with it:
+unique operation ids and local $refs that resolve.
+
+The outcome for a template is cached with the parsed template, keyed on the
+version of jsonschema and the content of the schema. A spec generated from
+a template only differs from it in its title and servers, which are all that
+is validated for each bank.
+
+Example:
+    >>> errors = validate_template(template)
+    >>> errors += validate_substituted(_generateSpec(template.parsed, bank, True))
+"""
+import hashlib
+from importlib.metadata import version
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+from urllib.parse import unquote, urlparse
+
+from .manifest import input_digest
+from .template import Template
+
+if TYPE_CHECKING:  # pragma: no cover
+    from jsonschema.exceptions import ValidationError as SchemaError
+    from jsonschema.protocols import Validator
+
+SCHEMA_FILENAME = os.path.join(os.path.dirname(__file__), "schemas", "openapi-3.0.json")
+METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+_validator: Optional["Validator"] = None
+_validator_digest: Optional[str] = None
+
+
+class ValidationError(Exception):
+    """Exception raised for specifications that are not valid."""
+
+    def __init__(self, errors: List[str]) -> None:
+        """Inits the exception with every error found."""
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+def validate(spec: Any) -> List[str]:
+    """Validate spec as an openAPI 3.0 document.
+
+    Args:
+        spec: the parsed spec
+
+    Returns:
+        the errors found, each prefixed by the json pointer of its location
+    """
+    errors = _schema_errors(spec)
+    if isinstance(spec, dict):
+        errors.extend(_validate_operations(spec))
+        errors.extend(_validate_references(spec))
+    return errors
+
+
+def validate_substituted(spec: dict) -> List[str]:
+    """Validate the fields of a spec that differ from its template.
+
+    Args:
+        spec: the spec generated from a valid template
+
+    Returns:
+        the errors in its info and servers
+    """
+    errors = _schema_errors(
+        {
+            "openapi": spec.get("openapi"),
+            "info": spec.get("info"),
+            "servers": spec.get("servers"),
+            "paths": {},
+        }
+    )
+    servers = spec.get("servers")
+    if not servers:
+        errors.append("/servers: Expected at least one server")
+    # The schema takes any string as the url of a server:
+    for index, server in enumerate(servers if isinstance(servers, list) else ()):
+        if isinstance(server, dict) and not _is_url(server.get("url")):
+            errors.append(f"/servers/{index}/url: Expected an http(s) or relative url")
+    return errors
+
+
+def validate_template(template: Template) -> List[str]:
+    """Validate template, reading the outcome from its cache if it is there.
+
+    Args:
+        template: the template
+
+    Returns:
+        the errors found
+    """
+    filename = (
+        os.path.join(template.cache_directory, f"{template.digest}.validation.json")
+        if template.cache_directory
+        else None
+    )
+    digest = validator_digest()
+    if filename:
+        try:
+            with open(filename, "r", encoding="utf-8") as cachefile:
+                cached = json.load(cachefile)
+            if cached["validator"] == digest:
+                return list(cached["errors"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    errors = validate(template.parsed)
+    if filename:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # Write to a temporary file first, as another run may read the entry:
+        temporary_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(temporary_filename, "w", encoding="utf-8") as cachefile:
+            json.dump({"validator": digest, "errors": errors}, cachefile)
+        os.replace(temporary_filename, filename)
+    return errors
+
+
+def validator_digest() -> str:
+    """Return a digest of the version of jsonschema and the openAPI schema."""
+    global _validator_digest
+    if _validator_digest is None:
+        with open(SCHEMA_FILENAME, "rb") as schemafile:
+            _validator_digest = input_digest(
+                version("jsonschema"), hashlib.sha256(schemafile.read()).hexdigest()
+            )
+    return _validator_digest
+
+
+def _schema_errors(spec: Any) -> List[str]:
+    """Validate spec against the openAPI schema, compiling it when first used."""
+    global _validator
+    if _validator is None:
+        from jsonschema import Draft4Validator
+
+        with open(SCHEMA_FILENAME, "r", encoding="utf-8") as schemafile:
+            schema = json.load(schemafile)
+        _validator = Draft4Validator(schema)
+    return [
+        _describe(error)
+        for error in sorted(_validator.iter_errors(spec), key=lambda e: e.path)
+    ]
+
+
+def _describe(error: "SchemaError") -> str:
+    """Describe error by the json pointer of its location and its message."""
+    from jsonschema.exceptions import best_match
+
+    # An object that matches none of the alternatives of a oneOf or an anyOf
+    # is described by the error of the alternative it comes closest to, which
+    # is not a reference unless the object has a $ref:
+    while error.context:
+        alternatives = [
+            alternative
+            for alternative in error.context
+            if alternative.validator != "required"
+            or alternative.validator_value != ["$ref"]
+        ]
+        error = best_match(alternatives or error.context)
+    pointer = "".join(f"/{_escape(token)}" for token in error.absolute_path)
+    return f"{pointer or '/'}: {error.message}"
+
+
+def _validate_operations(spec: dict) -> Iterator[str]:
+    """Check that the operation ids are unique."""
+    operation_ids: Dict[str, str] = {}
+    paths = spec.get("paths")
+    for path, item in paths.items() if isinstance(paths, dict) else ():
+        if not isinstance(item, dict):
+            continue
+        for method in METHODS:
+            operation = item.get(method)
+            if not isinstance(operation, dict):
+                continue
+            pointer = f"/paths/{_escape(path)}/{method}"
+            operation_id = operation.get("operationId")
+            if isinstance(operation_id, str):
+                if operation_id in operation_ids:
+                    yield (
+                        f"{pointer}/operationId: Duplicate >{operation_id}<, also"
+                        f" at {operation_ids[operation_id]}"
+                    )
+                operation_ids.setdefault(operation_id, pointer)
+
+
+def _validate_references(spec: dict) -> Iterator[str]:
+    """Check that every local reference resolves within spec."""
+    for pointer, reference in _references(spec, ""):
+        if reference.startswith("#") and not _resolves(spec, reference[1:]):
+            yield f"{pointer}: Cannot resolve >{reference}<"
+
+
+def _references(value: Any, pointer: str) -> Iterator[Tuple[str, str]]:
+    """Iterate over the location and value of every reference in value."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            item_pointer = f"{pointer}/{_escape(key)}"
+            if key == "$ref" and isinstance(item, str):
+                yield item_pointer, item
+            else:
+                yield from _references(item, item_pointer)
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _references(item, f"{pointer}/{index}")
+
+
+def _resolves(spec: Any, pointer: str) -> bool:
+    """Check if the json pointer resolves within spec."""
+    resolved = spec
+    for token in unquote(pointer).split("/")[1:]:
+        token = token.replace("~1", "/").replace("~0", "~")
+        if isinstance(resolved, dict) and token in resolved:
+            resolved = resolved[token]
+        elif (
+            isinstance(resolved, list)
+            and token.isdigit()
+            and int(token) < len(resolved)
+        ):
+            resolved = resolved[int(token)]
+        else:
+            return False
+    return True
+
+
+def _is_url(value: Any) -> bool:
+    """Check if value is a server url: absolute http(s), or relative."""
+    if not isinstance(value, str) or not value or any(c.isspace() for c in value):
+        return False
+    parsed = urlparse(value)
+    if not parsed.scheme:
+        return not parsed.netloc
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+
+
+def _escape(token: Any) -> str:
+    """Escape token for a json pointer."""
+    return str(token).replace("~", "~0").replace("/", "~1")
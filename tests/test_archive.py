@@ -0,0 +1,156 @@
+"""Unit test cases for the archive module."""
+import json
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from dsop_api_spesifikasjoner.archive import (
+    ArchiveError,
+    ArchiveReader,
+    ArchiveWriter,
+    INDEX_NAME,
+    write_archive,
+)
+from dsop_api_spesifikasjoner.catalog import API, Catalog, encode_catalog, SPECS_URL
+
+# A name longer than a tar header has room for, and one that is not ascii:
+LONG_NAME = "test/" + "Lang_" * 30 + "111_Accounts-API.json"
+NAME = "Ærøskøbing_Sparebank_111_Accounts-API.json"
+
+
+def _write_outputs(directory: str) -> None:
+    """Write a spec of one bank in each environment and their catalogs."""
+    os.makedirs(os.path.join(directory, "test"))
+    os.makedirs(os.path.join(directory, "rdf"))
+    for production, name, catalog_name in (
+        (True, NAME, "dsop_catalog.json"),
+        (False, LONG_NAME, os.path.join("test", "dsop_catalog_test.json")),
+    ):
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            json.dump({"servers": [{"description": name}]}, f)
+        catalog = Catalog(production)
+        api = API(SPECS_URL + name, "")
+        api.publisher = "https://example.com/organizations/111"
+        catalog.apis.append(api)
+        with open(os.path.join(directory, catalog_name), "wb") as catalogfile:
+            catalogfile.write(encode_catalog(catalog))
+    with open(os.path.join(directory, "rdf", "dsop_catalog.ttl"), "wb") as f:
+        f.write(b"x" * 1000)
+    with open(os.path.join(directory, ".dsop_manifest.json"), "w") as f:
+        f.write("{}")
+
+
+@pytest.mark.parametrize("suffix", [".tar", ".zip"])
+def test_write_and_read_archive(tmp_path: str, suffix: str) -> None:
+    """Should read any one spec and member of the archive."""
+    directory = os.path.join(tmp_path, "outputs")
+    _write_outputs(directory)
+    filename = os.path.join(tmp_path, "specs" + suffix)
+
+    assert write_archive(filename, directory)
+    with ArchiveReader(filename) as archive:
+        assert archive.banks == {"111": {"production": [NAME], "test": [LONG_NAME]}}
+        assert archive.spec("111") == {"servers": [{"description": NAME}]}
+        assert archive.spec("111", production=False) == {
+            "servers": [{"description": LONG_NAME}]
+        }
+        assert archive.read("rdf/dsop_catalog.ttl") == b"x" * 1000
+        with pytest.raises(KeyError):
+            archive.spec("222")
+        with pytest.raises(KeyError):
+            archive.read(".dsop_manifest.json")
+
+
+def test_write_tar_archive_with_index_last(tmp_path: str) -> None:
+    """Should write a plain tar archive, ending with the index."""
+    directory = os.path.join(tmp_path, "outputs")
+    _write_outputs(directory)
+    filename = os.path.join(tmp_path, "specs.tar")
+    write_archive(filename, directory)
+
+    with tarfile.open(filename) as tar:
+        assert tar.getnames() == [
+            "dsop_catalog.json",
+            "rdf/dsop_catalog.ttl",
+            LONG_NAME,
+            "test/dsop_catalog_test.json",
+            NAME,
+            INDEX_NAME,
+        ]
+        assert {member.mtime for member in tar.getmembers()} == {0}
+
+
+def test_write_archive_is_reproducible(tmp_path: str) -> None:
+    """Should leave an archive with the same content in place."""
+    directory = os.path.join(tmp_path, "outputs")
+    _write_outputs(directory)
+    filename = os.path.join(tmp_path, "specs.zip")
+    assert write_archive(filename, directory)
+    os.utime(filename, ns=(0, 0))
+
+    assert not write_archive(filename, directory)
+    assert os.stat(filename).st_mtime_ns == 0
+    with open(os.path.join(directory, NAME), "w") as f:
+        f.write("{}")
+    assert write_archive(filename, directory)
+    with zipfile.ZipFile(filename) as archive:
+        assert archive.read(NAME) == b"{}"
+    assert sorted(os.listdir(tmp_path)) == ["outputs", "specs.zip"]
+
+
+@pytest.mark.parametrize("suffix", [".tar", ".zip"])
+def test_archive_writer(tmp_path: str, suffix: str) -> None:
+    """Should write members as they come, and copy them from the existing archive."""
+    filename = os.path.join(tmp_path, "specs" + suffix)
+    with ArchiveWriter(filename) as writer:
+        with writer.open("rdf/dsop_catalog.ttl") as streamed:
+            writer.write("a.json", b"{}")
+            streamed.write(b"x" * 2000)
+        assert writer.read("rdf/dsop_catalog.ttl") == b"x" * 2000
+        writer.write(".dsop_manifest.json", b"{}")
+        assert "a.json" in writer
+        assert writer.members["a.json"][0] == 2
+    assert writer.written
+
+    with ArchiveWriter(filename) as writer:
+        assert writer.previous is not None
+        assert ".dsop_manifest.json" in writer.previous
+        writer.copy("rdf/dsop_catalog.ttl")
+        with pytest.raises(KeyError):
+            writer.copy("b.json")
+    with ArchiveReader(filename) as archive:
+        assert archive.read("rdf/dsop_catalog.ttl") == b"x" * 2000
+        assert "a.json" not in archive
+    assert sorted(os.listdir(tmp_path)) == ["specs" + suffix]
+
+
+def test_archive_writer_discards_a_failed_archive(tmp_path: str) -> None:
+    """Should leave the existing archive in place if the run fails."""
+    filename = os.path.join(tmp_path, "specs.tar")
+    with ArchiveWriter(filename) as writer:
+        writer.write("a.json", b"{}")
+    with pytest.raises(RuntimeError):
+        with ArchiveWriter(filename) as writer:
+            writer.write("a.json", b"[]")
+            raise RuntimeError()
+
+    with ArchiveReader(filename) as archive:
+        assert archive.read("a.json") == b"{}"
+    assert os.listdir(tmp_path) == ["specs.tar"]
+
+
+def test_write_archive_of_unknown_format(tmp_path: str) -> None:
+    """Should only write .tar and .zip archives."""
+    with pytest.raises(ValueError):
+        write_archive(os.path.join(tmp_path, "specs.rar"), tmp_path)
+
+
+def test_read_archive_without_index(tmp_path: str) -> None:
+    """Should not read an archive that was not written by write_archive."""
+    filename = os.path.join(tmp_path, "other.zip")
+    with zipfile.ZipFile(filename, "w") as archive:
+        archive.writestr("a.json", "{}")
+    with pytest.raises(ArchiveError):
+        ArchiveReader(filename)
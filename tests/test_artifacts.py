@@ -0,0 +1,94 @@
+"""Unit test cases for the artifacts module."""
+import gzip
+import json
+import os
+
+import pytest
+
+from dsop_api_spesifikasjoner.artifacts import (
+    artifact_names,
+    artifacts,
+    ARTIFACTS_FILENAME,
+    ArtifactWriter,
+    compress,
+    minify,
+)
+
+
+def test_minify() -> None:
+    """Should remove the whitespace between the tokens."""
+    content = json.dumps({"title": "Ærø bank", "servers": [{"url": "a"}]}, indent=2)
+    assert minify(content.encode("utf-8")) == (
+        '{"title":"Ærø bank","servers":[{"url":"a"}]}'.encode("utf-8")
+    )
+
+
+def test_compress_gz_is_reproducible() -> None:
+    """Should compress the same content to the same bytes."""
+    content = b"{}" * 1000
+    compressed = compress(content, "gz")
+    assert gzip.decompress(compressed) == content
+    assert compress(content, "gz") == compressed
+
+
+def test_compress_br() -> None:
+    """Should compress with brotli if it is installed."""
+    brotli = pytest.importorskip("brotli")
+    content = b"{}" * 1000
+    assert brotli.decompress(compress(content, "br")) == content
+
+
+def test_compress_unknown() -> None:
+    """Should only compress with the known compressions."""
+    with pytest.raises(ValueError):
+        compress(b"{}", "zip")
+
+
+def test_artifacts() -> None:
+    """Should make the minified copy of json, and compress the output and copy."""
+    content = b'{\n  "a": 1\n}'
+    assert artifact_names("test/a.json", True, ["gz"]) == [
+        "test/a.min.json",
+        "test/a.json.gz",
+        "test/a.min.json.gz",
+    ]
+    made = artifacts("test/a.json", content, True, ["gz"])
+    assert [name for name, _ in made] == artifact_names("test/a.json", True, ["gz"])
+    assert made[0][1] == b'{"a":1}'
+    assert gzip.decompress(made[1][1]) == content
+    assert gzip.decompress(made[2][1]) == b'{"a":1}'
+    assert artifact_names("rdf/a.ttl", True, ["gz"]) == ["rdf/a.ttl.gz"]
+
+
+def test_artifact_writer_skips_unchanged_outputs(tmp_path: str) -> None:
+    """Should only make the artifacts of the outputs that have changed."""
+    directory = os.path.join(tmp_path, "")
+    staging_directory = os.path.join(tmp_path, "staging", "")
+    os.makedirs(staging_directory)
+    for name in ("a.json", "b.json"):
+        with open(os.path.join(directory, name), "w") as f:
+            json.dump({"name": name}, f, indent=2)
+
+    writer = ArtifactWriter(directory, True, ["gz"], jobs=2)
+    assert writer.write(["a.json", "b.json"], directory, staging_directory) == 2
+    assert sorted(os.listdir(staging_directory)) == [
+        "a.json.gz",
+        "a.min.json",
+        "a.min.json.gz",
+        "b.json.gz",
+        "b.min.json",
+        "b.min.json.gz",
+    ]
+    for name in os.listdir(staging_directory):
+        os.replace(os.path.join(staging_directory, name), os.path.join(directory, name))
+    writer.manifest.save()
+    assert os.path.isfile(os.path.join(directory, ARTIFACTS_FILENAME))
+
+    # A changed output is read from the staging directory:
+    with open(os.path.join(staging_directory, "b.json"), "w") as f:
+        json.dump({"name": "B"}, f)
+    writer = ArtifactWriter(directory, True, ["gz"])
+    assert writer.write(["a.json", "b.json"], directory, staging_directory) == 1
+    with open(os.path.join(staging_directory, "b.min.json"), "rb") as f:
+        assert f.read() == b'{"name":"B"}'
+    assert not os.path.exists(os.path.join(staging_directory, "a.min.json"))
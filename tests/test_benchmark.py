@@ -0,0 +1,95 @@
+"""Unit test cases for the benchmark module."""
+import csv
+import json
+import os
+from typing import Any
+
+from click.testing import CliRunner
+from pytest_mock import MockerFixture
+
+from dsop_api_spesifikasjoner.benchmark import (
+    compare,
+    main,
+    run_case,
+    write_bank_registry,
+)
+
+TEMPLATE = os.path.join(
+    os.path.dirname(__file__), "..", "template", "Accounts API openapi v1.0.0.yaml"
+)
+
+
+def test_write_bank_registry(tmp_path: Any) -> None:
+    """Should write a registry with unique banks."""
+    filename = str(tmp_path / "banker.csv")
+    write_bank_registry(filename, 20)
+
+    with open(filename, "r", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0][0] == "OrgNummer"
+    assert len(rows) == 21
+    assert len({row[0] for row in rows[1:]}) == 20
+    assert sum(1 for row in rows[1:] if not row[4]) == 2
+
+
+def test_run_case() -> None:
+    """Should measure the wall time, the phases of the run and the peak memory."""
+    case = run_case(TEMPLATE, 5)
+
+    assert case["rows"] == 5
+    assert case["wall"] > 0
+    assert {"parse_template", "generate_specs", "write_files", "build_graph"} <= set(
+        case["phases"]
+    )
+    assert sum(case["phases"].values()) < case["wall"]
+    assert case["peak_rss"] > 0
+
+
+def test_run_case_with_a_new_cache(mocker: MockerFixture) -> None:
+    """Should not use the default cache, shared with other runs."""
+    default_cache_directory = mocker.patch(
+        "dsop_api_spesifikasjoner.generateSpecification.default_cache_directory"
+    )
+    run_case(TEMPLATE, 2)
+
+    default_cache_directory.assert_not_called()
+
+
+def test_compare() -> None:
+    """Should report the measurements that exceed the baseline."""
+    baseline = [
+        {
+            "template": "t.yaml",
+            "rows": 10,
+            "wall": 1.0,
+            "phases": {"write_specs": 0.5},
+            "peak_rss": 100,
+        }
+    ]
+    results = [dict(baseline[0], wall=1.1, phases={"write_specs": 0.7})]
+
+    assert compare(results, baseline, 1.2) == [
+        "t.yaml rows=10 phases.write_specs: 0.7 > 1.2 x 0.5"
+    ]
+    assert compare(results, [], 1.2) == []
+
+
+def test_main_with_baseline(tmp_path: Any) -> None:
+    """Should save the results and fail when they regress from the baseline."""
+    runner = CliRunner()
+    results = str(tmp_path / "results.json")
+    args = ["--rows", "3", "--save", results, TEMPLATE]
+    result = runner.invoke(main, args)
+    assert result.exit_code == 0, result.output
+
+    with open(results, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    assert len(saved) == 1
+    saved[0]["wall"] = saved[0]["wall"] / 1000
+    baseline = str(tmp_path / "baseline.json")
+    with open(baseline, "w", encoding="utf-8") as f:
+        json.dump(saved, f)
+
+    result = runner.invoke(main, [*args, "--baseline", baseline])
+    assert result.exit_code == 1
+    assert "REGRESSION" in result.output
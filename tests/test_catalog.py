@@ -1,9 +1,18 @@
 """Unit test cases for the generateSpecification module."""
 import hashlib
+import io
+import json
 
+import pytest
 from pytest_mock import MockerFixture
 
-from dsop_api_spesifikasjoner.catalog import API, Catalog
+from dsop_api_spesifikasjoner.catalog import (
+    API,
+    Catalog,
+    CatalogWriter,
+    decode_catalog,
+    encode_catalog,
+)
 
 
 def test_Catalog_init(
@@ -40,3 +49,87 @@ def test_add_API_to_catalog() -> None:
     catalog.apis.append(api)
     assert catalog.apis
     assert len(catalog.apis) == 1
+
+
+def test_API_has_no_dict() -> None:
+    """Should keep the fields of an API in slots."""
+    api = API("https://example.com/specification/oas_1", "123")
+    with pytest.raises(AttributeError):
+        api.title = "Accounts API"  # type: ignore
+
+
+@pytest.mark.parametrize("apis", [0, 1, 3])
+def test_encode_catalog(apis: int) -> None:
+    """Should encode a catalog like json.dumps of its fields."""
+    catalog = Catalog(production=False)
+    for i in range(apis):
+        api = API(f'https://example.com/specification/"oas_{i}"', "")
+        api.publisher = "https://example.com/organizations/Ærøskøbing\\"
+        api.conformsTo.extend(["https://example.com/standard"] * i)
+        catalog.apis.append(api)
+    expected = {
+        "identifier": catalog.identifier,
+        "title": catalog.title,
+        "description": catalog.description,
+        "publisher": catalog.publisher,
+        "apis": [
+            {
+                "identifier": api.identifier,
+                "url": api.url,
+                "conformsTo": api.conformsTo,
+                "publisher": api.publisher,
+            }
+            for api in catalog.apis
+        ],
+    }
+
+    assert encode_catalog(catalog) == json.dumps(
+        expected, ensure_ascii=False, indent=2
+    ).encode("utf-8")
+
+
+@pytest.mark.parametrize("apis", [0, 1, 3])
+def test_catalog_writer(apis: int) -> None:
+    """Should write the same content as encode_catalog, one api at a time."""
+    catalog = Catalog(production=True)
+    for i in range(apis):
+        api = API(f"https://example.com/specification/oas_{i}", "")
+        api.publisher = "https://example.com/organizations/Ærøskøbing"
+        api.conformsTo.extend(["https://example.com/standard"] * i)
+        api.endpointAvailable = False if i == 1 else None
+        catalog.apis.append(api)
+    catalogfile = io.BytesIO()
+
+    writer = CatalogWriter(catalogfile, Catalog(production=True))
+    for api in catalog.apis:
+        writer.write(api)
+    writer.close()
+    assert catalogfile.getvalue() == encode_catalog(catalog)
+
+
+def test_decode_catalog() -> None:
+    """Should decode a catalog to the same encoding."""
+    catalog = Catalog(production=False)
+    api = API("https://example.com/specification/oas_1", "1")
+    api.publisher = "https://example.com/organizations/1"
+    api.conformsTo.append("https://example.com/standard")
+    catalog.apis.append(api)
+    content = encode_catalog(catalog)
+
+    decoded = decode_catalog(content)
+    assert decoded.title == {"nb": "DSOP API katalog [TEST]"}
+    assert encode_catalog(decoded) == content
+
+
+def test_encode_catalog_with_endpoint_available() -> None:
+    """Should only encode endpointAvailable of the apis where it is set."""
+    catalog = Catalog(production=True)
+    for i in range(2):
+        catalog.apis.append(API(f"https://example.com/specification/oas_{i}", ""))
+    catalog.apis[1].endpointAvailable = False
+    content = encode_catalog(catalog)
+
+    apis = json.loads(content)["apis"]
+    assert "endpointAvailable" not in apis[0]
+    assert apis[1]["endpointAvailable"] is False
+    assert encode_catalog(decode_catalog(content)) == content
@@ -0,0 +1,84 @@
+"""Unit test cases for the components module."""
+import json
+import os
+from typing import Any
+
+from click.testing import CliRunner
+import pytest
+import yaml
+
+from dsop_api_spesifikasjoner.components import (
+    bundle,
+    has_shared_references,
+    main,
+    reference_spec,
+    shared_document,
+    SHARED_FILENAME,
+)
+from dsop_api_spesifikasjoner.render import encode
+
+TEMPLATE = os.path.join(
+    os.path.dirname(__file__), "..", "template", "Accounts API openapi v1.0.0.yaml"
+)
+
+
+@pytest.fixture
+def template() -> Any:
+    """Fixture for the template, normalized through json."""
+    with open(TEMPLATE, "r", encoding="utf-8") as f:
+        return json.loads(encode(yaml.safe_load(f)))
+
+
+def test_reference_spec(template: dict) -> None:
+    """Should reference every path item and component in the shared document."""
+    spec = reference_spec(template, "../" + SHARED_FILENAME)
+
+    assert spec["info"] is template["info"]
+    assert spec["paths"]["/accounts/{accountReference}"] == {
+        "$ref": f"../{SHARED_FILENAME}#/paths/~1accounts~1%7BaccountReference%7D"
+    }
+    assert spec["components"]["schemas"]["Account"] == {
+        "$ref": f"../{SHARED_FILENAME}#/components/schemas/Account"
+    }
+    assert has_shared_references(spec)
+    assert not has_shared_references(template)
+
+
+def test_bundle(template: dict) -> None:
+    """Should resolve the references to the same spec as the template."""
+    spec = reference_spec(template, SHARED_FILENAME)
+    loaded = []
+
+    def load(location: str) -> dict:
+        loaded.append(location)
+        return shared_document(template)
+
+    assert encode(bundle(spec, load)) == encode(template)
+    assert set(loaded) == {SHARED_FILENAME}
+    assert bundle(template, load) is template
+
+
+def test_bundle_directory(runner: CliRunner, template: dict) -> None:
+    """Should write the bundled specs to the output directory."""
+    with runner.isolated_filesystem():
+        os.makedirs(os.path.join("specs", "test"))
+        with open(os.path.join("specs", SHARED_FILENAME), "wb") as f:
+            f.write(encode(shared_document(template)))
+        with open(os.path.join("specs", "test", "bank.json"), "wb") as f:
+            f.write(encode(reference_spec(template, "../" + SHARED_FILENAME)))
+        with open(os.path.join("specs", "catalog.json"), "w") as f:
+            json.dump({"apis": []}, f)
+
+        result = runner.invoke(main, ["specs", "-o", "bundled"])
+
+        assert result.exit_code == 0, result.output
+        assert result.output == "Bundled 1 specifications\n"
+        assert os.listdir("bundled") == ["test"]
+        with open(os.path.join("bundled", "test", "bank.json"), "rb") as f:
+            assert f.read() == encode(template)
+
+
+@pytest.fixture
+def runner() -> CliRunner:
+    """Fixture for invoking command-line interfaces."""
+    return CliRunner()
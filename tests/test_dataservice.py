@@ -0,0 +1,76 @@
+"""Unit test cases for the dataservice module."""
+import csv
+from typing import Any, Dict, List
+
+import pytest
+from rdflib.compare import isomorphic
+import yaml
+
+from dsop_api_spesifikasjoner.catalog import Catalog
+from dsop_api_spesifikasjoner.dataservice import find_template, TemplateDataServices
+from dsop_api_spesifikasjoner.generateSpecification import (
+    _add_spec_to_catalog,
+    _generateSpec,
+    create_catalog_graph,
+)
+
+TEMPLATES = [
+    "template/Accounts API openapi v1.0.0.yaml",
+    "template/Accounts API openapi v1.0.0-RC2.yaml",
+]
+
+
+@pytest.mark.parametrize("template_filename", TEMPLATES)
+@pytest.mark.parametrize("production", [True, False])
+def test_graph_is_isomorphic_to_oas_dataservice_graph(
+    template_filename: str, production: bool
+) -> None:
+    """Should create the same graph as mapping every spec with OASDataService."""
+    template = _get_openapi_template(template_filename)
+    catalog = Catalog(production=production)
+    specs: Dict[str, dict] = {}
+    for bank in _get_banks()[:10]:
+        if not bank[3 if production else 4]:
+            continue
+        api = _add_spec_to_catalog(
+            bank[0], bank[5 if production else 6], bank[2], catalog
+        )
+        specs[api.url] = _generateSpec(template, bank, production)
+    # A spec that is not generated from the template:
+    api = _add_spec_to_catalog("123456789", "", "Other_Accounts-API.json", catalog)
+    specs[api.url] = _generateSpec(template, _get_banks()[0], production)
+    specs[api.url]["info"] = {"title": "Other API", "version": "2.0"}
+
+    today = create_catalog_graph(catalog, True, specs)
+    fast = create_catalog_graph(catalog, True, specs, templates=[template])
+
+    assert len(fast) == len(today)
+    assert isomorphic(fast, today)
+
+
+def test_find_template() -> None:
+    """Should find the template a spec is generated from."""
+    templates = [
+        TemplateDataServices(_get_openapi_template(filename)) for filename in TEMPLATES
+    ]
+    bank = _get_banks()[0]
+
+    for template in templates:
+        spec = _generateSpec(template.template, bank, production=True)
+        assert find_template(spec, templates) is template
+        spec["paths"] = {}
+        assert find_template(spec, templates) is None
+
+
+# --
+def _get_openapi_template(filename: str) -> Dict[str, Any]:
+    """Create an openAPI-specification dokument."""
+    with open(filename, "r") as file:
+        _yaml = yaml.safe_load(file)
+
+    return _yaml
+
+
+def _get_banks() -> List[List[str]]:
+    with open("banker.csv", "r") as file:
+        return list(csv.reader(file))[1:]
@@ -0,0 +1,117 @@
+"""Unit test cases for the fetch module."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from dsop_api_spesifikasjoner.fetch import SpecFetcher
+
+SPEC = "openapi: 3.0.0\ninfo:\n  title: Accounts API\n"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Serves a spec with an ETag, a missing spec and a flaky spec."""
+
+    requests: List[Dict[str, Any]] = []
+    failures_left: Dict[str, int] = {}
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Answer a GET request."""
+        self.requests.append({"path": self.path, "headers": dict(self.headers)})
+        if self.failures_left.get(self.path, 0) > 0:
+            self.failures_left[self.path] -= 1
+            self._respond(503, b"")
+        elif self.path in ("/spec.yaml", "/flaky.yaml"):
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._respond(304, b"")
+            else:
+                self._respond(200, SPEC.encode("utf-8"), {"ETag": '"v1"'})
+        elif self.path == "/list.yaml":
+            self._respond(200, b"- not a spec\n")
+        else:
+            self._respond(404, b"")
+
+    def _respond(self, status: int, body: bytes, headers: Any = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Keep the test output quiet."""
+
+
+@pytest.fixture
+def server() -> Iterator[str]:
+    """Fixture running a stub HTTP server, yielding its base url."""
+    _StubHandler.requests = []
+    _StubHandler.failures_left = {}
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_all(server: str) -> None:
+    """Should fetch and parse every spec once, and report failures per url."""
+    fetcher = SpecFetcher(backoff_factor=0)
+    urls = [f"{server}/spec.yaml", f"{server}/missing.yaml", f"{server}/spec.yaml"]
+
+    results = fetcher.fetch_all(urls)
+
+    assert len(results) == 2
+    assert results[f"{server}/spec.yaml"].spec == {
+        "openapi": "3.0.0",
+        "info": {"title": "Accounts API"},
+    }
+    assert results[f"{server}/spec.yaml"].error is None
+    assert results[f"{server}/missing.yaml"].spec is None
+    assert results[f"{server}/missing.yaml"].error == "HTTP status code 404"
+
+
+def test_fetch_retries(server: str) -> None:
+    """Should retry a failing request with backoff."""
+    _StubHandler.failures_left["/flaky.yaml"] = 2
+    fetcher = SpecFetcher(retries=3, backoff_factor=0)
+
+    result = fetcher.fetch(f"{server}/flaky.yaml")
+
+    assert result.spec is not None
+    assert len(_StubHandler.requests) == 3
+
+
+def test_fetch_gives_up_after_retries(server: str) -> None:
+    """Should report an error when the retries are exhausted."""
+    _StubHandler.failures_left["/flaky.yaml"] = 5
+    fetcher = SpecFetcher(retries=1, backoff_factor=0)
+
+    result = fetcher.fetch(f"{server}/flaky.yaml")
+
+    assert result.spec is None
+    assert result.error and result.error.startswith("RetryError")
+
+
+def test_fetch_not_a_spec(server: str) -> None:
+    """Should report a document that is not a mapping."""
+    result = SpecFetcher().fetch(f"{server}/list.yaml")
+
+    assert result.spec is None
+    assert result.error == "Not an openAPI specification"
+
+
+def test_fetch_uses_cache(server: str, tmp_path: Any) -> None:
+    """Should revalidate a cached spec with its ETag instead of downloading it."""
+    url = f"{server}/spec.yaml"
+    first = SpecFetcher(str(tmp_path)).fetch(url)
+    second = SpecFetcher(str(tmp_path)).fetch(url)
+
+    assert not first.from_cache
+    assert second.from_cache
+    assert second.spec == first.spec
+    assert "If-None-Match" not in _StubHandler.requests[0]["headers"]
+    assert _StubHandler.requests[1]["headers"]["If-None-Match"] == '"v1"'
@@ -1,18 +1,38 @@
 """Unit test cases for the generateSpecification module."""
+import gzip
 import json
 import os
 from pathlib import Path
+import pstats
+import subprocess  # noqa: S404
+import sys
 from typing import Any, Dict, List
 
 from click.testing import CliRunner
 from deepdiff import DeepDiff
 import pytest
 from pytest_mock import MockerFixture
+from rdflib import Graph
+from rdflib.compare import isomorphic
+from rdflib.namespace import DCAT
 import yaml
 
 
-from dsop_api_spesifikasjoner.generateSpecification import _generateSpec, main
+from dsop_api_spesifikasjoner import generateSpecification
+from dsop_api_spesifikasjoner.archive import ArchiveReader
+from dsop_api_spesifikasjoner.catalog import API, Catalog, decode_catalog
+from dsop_api_spesifikasjoner.components import main as bundle_main, SHARED_FILENAME
+from dsop_api_spesifikasjoner.fetch import FetchResult, SpecFetcher
+from dsop_api_spesifikasjoner.generateSpecification import (
+    _generateSpec,
+    create_catalog_graph,
+    main,
+)
+from dsop_api_spesifikasjoner.lookup import LookupStore
+from dsop_api_spesifikasjoner.rdfwriter import RDF_FORMATS
 
+TEMPLATE = "template/Accounts API openapi v1.0.0.yaml"
+TEMPLATE_RC2 = "template/Accounts API openapi v1.0.0-RC2.yaml"
 URL_BASE = (
     "https://raw.githubusercontent.com/"
     "Informasjonsforvaltning/dsop-api-spesifikasjoner/master/specs/"
@@ -47,6 +67,22 @@ def test_generateSpec() -> None:
     )
 
 
+def test_generateSpec_shares_template_subtrees() -> None:
+    """Should share unchanged subtrees with the template and not modify it."""
+    template = _get_openapi_template()
+    template_before = json.dumps(template)
+    bank = _get_bank()
+
+    _spec = _generateSpec(template, bank, production=True)
+
+    assert _spec["paths"] is template["paths"]
+    assert _spec["components"] is template["components"]
+    assert _spec["info"] is not template["info"]
+    assert _spec["servers"] is not template["servers"]
+    assert json.dumps(template) == template_before
+    assert list(_spec.keys()) == list(template.keys())
+
+
 def test_main(mocker: MockerFixture, runner: CliRunner) -> None:
     """Should return exit_code 0."""
     with runner.isolated_filesystem():
@@ -291,15 +327,845 @@ def test_main_with_no_arguments_fails(runner: CliRunner) -> None:
     assert result.exit_code == 2
 
 
+def test_main_with_jobs(runner: CliRunner) -> None:
+    """Should write the same files with a process pool as without."""
+    outputs: List[Dict[str, bytes]] = []
+    for jobs in ("1", "2"):
+        with runner.isolated_filesystem():
+            _write_local_run_files()
+            result = runner.invoke(
+                main,
+                ["-d", "specs", "--jobs", jobs, "template.yaml", "banker.csv", "True"],
+            )
+            assert result.exit_code == 0, result.output
+            outputs.append(_read_json_files("specs"))
+
+    assert len(outputs[0]) == 8
+    assert outputs[0] == outputs[1]
+
+
 # --
 def _get_openapi_template() -> Dict[str, Any]:
     """Create an openAPI-specification dokument."""
-    with open("./template/Accounts API openapi v1.0.0.yaml", "r") as file:
+    with open(TEMPLATE, "r") as file:
         _yaml = yaml.safe_load(file)
 
     return _yaml
 
 
+def test_main_incremental(runner: CliRunner) -> None:
+    """Should only write the outputs whose inputs have changed."""
+    args = ["-d", "specs", "--incremental", "template.yaml", "banker.csv", "True"]
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        assert Path("specs/.dsop_manifest.json").is_file()
+        outputs = sorted(
+            str(path) for path in Path("specs").rglob("*") if path.is_file()
+        )
+        assert len(outputs) == 11
+        for output in outputs:
+            os.utime(output, ns=(0, 0))
+
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        assert _written_since_epoch(outputs) == []
+
+        with open("banker.csv", "r") as f:
+            registry = f.read()
+        with open("banker.csv", "w") as f:
+            f.write(registry.replace("SPAREBANK 1 920426530", "SPAREBANK 1 ØSTLANDET"))
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        assert _written_since_epoch(outputs) == [
+            "specs/.dsop_manifest.json",
+            "specs/Sparebank1_920426530_Accounts-API.json",
+            "specs/rdf/dsop_catalog.ttl",
+            "specs/rdf/dsop_catalog_test.ttl",
+            "specs/test/Sparebank1_920426530_Accounts-API.json",
+        ]
+
+
+@pytest.mark.parametrize("stream", [[], ["--stream"]])
+def test_main_incremental_fetches_a_failed_spec_again(
+    runner: CliRunner, mocker: MockerFixture, stream: List[str]
+) -> None:
+    """Should not record an rdf catalog with a failed fetch as current."""
+    template = _get_openapi_template()
+    failed_url = URL_BASE + "Sparebank1_920426530_Accounts-API.json"
+    fetched: List[str] = []
+
+    def fetch_all(urls: List[str]) -> Dict[str, FetchResult]:
+        results = {}
+        for url in urls:
+            fetched.append(url)
+            results[url] = (
+                FetchResult(url, error="HTTP status code 503")
+                if url == failed_url and len(fetched) <= 6
+                else FetchResult(
+                    url, spec=_generateSpec(template, _get_bank(), production=True)
+                )
+            )
+        return results
+
+    mocker.patch.object(SpecFetcher, "fetch_all", side_effect=fetch_all)
+    args = [
+        *stream,
+        "-d",
+        "specs",
+        "--incremental",
+        "template.yaml",
+        "banker.csv",
+        "False",
+    ]
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        assert f"WARNING: Skipping >{failed_url}<" in result.output
+        assert len(fetched) == 6
+        graph = Graph().parse("specs/rdf/dsop_catalog.ttl", format="turtle")
+        assert len(list(graph.objects(None, DCAT.endpointDescription))) == 2
+
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        assert failed_url in fetched[6:]
+        graph = Graph().parse("specs/rdf/dsop_catalog.ttl", format="turtle")
+        assert len(list(graph.objects(None, DCAT.endpointDescription))) == 3
+
+        if not stream:
+            # The streamed catalogs are always written in full:
+            fetched.clear()
+            result = runner.invoke(main, args)
+            assert result.exit_code == 0, result.output
+            assert fetched == []
+
+
+def test_main_with_shard_by_orgnummer(runner: CliRunner) -> None:
+    """Should write a shard for each publisher, and only rewrite changed shards."""
+    args = [
+        *("--shard-by", "orgnummer", "--incremental", "-d", "specs"),
+        *("template.yaml", "banker.csv", "True"),
+    ]
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        with open("specs/dsop_catalog_index.json", "r") as f:
+            index = json.load(f)
+        assert [shard["key"] for shard in index["shards"]] == [
+            "837884942",
+            "920426530",
+            "937888015",
+        ]
+        assert index["shards"][1] == {
+            "key": "920426530",
+            "catalog": "catalog/dsop_catalog_920426530.json",
+            "rdf": "rdf/catalog/dsop_catalog_920426530.ttl",
+            "apis": 1,
+        }
+        assert index["orgnummer"]["920426530"] == ["920426530"]
+        shard = _read_catalog("specs/catalog/dsop_catalog_920426530.json")
+        assert [api.url for api in shard.apis] == [
+            URL_BASE + "Sparebank1_920426530_Accounts-API.json"
+        ]
+        assert index["identifiers"] == {
+            api.identifier: api.publisher.rsplit("/", 1)[-1]
+            for api in _read_catalog("specs/dsop_catalog.json").apis
+        }
+        with open("specs/test/dsop_catalog_test_index.json", "r") as f:
+            test_index = json.load(f)
+        assert test_index["shards"][0]["rdf"] == (
+            "../rdf/catalog/dsop_catalog_test_837884942.ttl"
+        )
+        outputs = sorted(
+            str(path) for path in Path("specs").rglob("*") if path.is_file()
+        )
+        for output in outputs:
+            os.utime(output, ns=(0, 0))
+
+        with open("banker.csv", "r") as f:
+            registry = f.read()
+        with open("banker.csv", "w") as f:
+            f.write(registry.replace("SPAREBANK 1 920426530", "SPAREBANK 1 ØSTLANDET"))
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        assert _written_since_epoch(outputs) == [
+            "specs/.dsop_manifest.json",
+            "specs/Sparebank1_920426530_Accounts-API.json",
+            "specs/rdf/catalog/dsop_catalog_920426530.ttl",
+            "specs/rdf/catalog/dsop_catalog_test_920426530.ttl",
+            "specs/rdf/dsop_catalog.ttl",
+            "specs/rdf/dsop_catalog_test.ttl",
+            "specs/test/Sparebank1_920426530_Accounts-API.json",
+        ]
+
+
+def test_main_with_shard_by_page(runner: CliRunner) -> None:
+    """Should write a shard for each page of the apis."""
+    args = ["--shard-by", "page", "--page-size", "2", "-d", "specs"]
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(main, [*args, "template.yaml", "banker.csv", "True"])
+        assert result.exit_code == 0, result.output
+        with open("specs/test/dsop_catalog_test_index.json", "r") as f:
+            index = json.load(f)
+        assert [(shard["key"], shard["apis"]) for shard in index["shards"]] == [
+            ("page_0001", 2),
+            ("page_0002", 1),
+        ]
+        assert Path("specs/test/catalog/dsop_catalog_test_page_0002.json").is_file()
+        assert Path("specs/rdf/catalog/dsop_catalog_test_page_0002.ttl").is_file()
+
+
+def test_main_with_minify_and_compress(runner: CliRunner) -> None:
+    """Should write minified and compressed copies of the changed outputs."""
+    args = [
+        *("--minify", "--compress", "gz", "-d", "specs"),
+        *("template.yaml", "banker.csv", "True"),
+    ]
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        spec = "specs/test/Sparebank1_920426530_Accounts-API"
+        with open(spec + ".json", "rb") as f:
+            content = f.read()
+        with open(spec + ".min.json", "rb") as f:
+            assert json.loads(f.read()) == json.loads(content)
+        with gzip.open(spec + ".json.gz", "rb") as f:
+            assert f.read() == content
+        with gzip.open("specs/rdf/dsop_catalog.ttl.gz", "rb") as f:
+            assert f.read() == Path("specs/rdf/dsop_catalog.ttl").read_bytes()
+        artifacts = sorted(
+            str(path) for path in Path("specs").rglob("*") if path.suffix == ".gz"
+        )
+        assert len(artifacts) == 2 * 6 + 2 * 2 + 2
+        for artifact in artifacts:
+            os.utime(artifact, ns=(0, 0))
+
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        assert _written_since_epoch(artifacts) == []
+
+        with open("banker.csv", "r") as f:
+            registry = f.read()
+        with open("banker.csv", "w") as f:
+            f.write(registry.replace("SPAREBANK 1 920426530", "SPAREBANK 1 ØSTLANDET"))
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        assert _written_since_epoch(artifacts) == [
+            "specs/Sparebank1_920426530_Accounts-API.json.gz",
+            "specs/Sparebank1_920426530_Accounts-API.min.json.gz",
+            "specs/rdf/dsop_catalog.ttl.gz",
+            "specs/rdf/dsop_catalog_test.ttl.gz",
+            "specs/test/Sparebank1_920426530_Accounts-API.json.gz",
+            "specs/test/Sparebank1_920426530_Accounts-API.min.json.gz",
+        ]
+
+
+def test_main_with_compress_br_needs_brotli(
+    runner: CliRunner, mocker: MockerFixture
+) -> None:
+    """Should not compress with brotli unless it is installed."""
+    mocker.patch(
+        "dsop_api_spesifikasjoner.generateSpecification.brotli_available",
+        return_value=False,
+    )
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(
+            main,
+            ["--compress", "br", "-d", "specs", "template.yaml", "banker.csv", "True"],
+        )
+        assert result.exit_code == 2
+        assert "needs the Brotli package" in result.output
+        assert list(Path("specs").rglob("*.json")) == []
+
+
+def test_main_with_archive(runner: CliRunner) -> None:
+    """Should write the outputs into the archive only."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(
+            main,
+            [
+                *("--archive", "specs.zip", "-d", "specs"),
+                *("template.yaml", "banker.csv", "True"),
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        assert [str(path) for path in Path("specs").rglob("*")] == [
+            "specs/test",
+            "specs/rdf",
+        ]
+        with ArchiveReader("specs.zip") as archive:
+            assert archive.spec("920426530", production=False)["servers"] == [
+                {
+                    "url": "https://api-test.sparebank1.no/dsop/Service/v2/920426530",
+                    "description": "test",
+                }
+            ]
+            catalog = decode_catalog(archive.read("dsop_catalog.json"))
+            assert len(catalog.apis) == 3
+
+
+def test_main_with_archive_of_unknown_format(runner: CliRunner) -> None:
+    """Should only write .tar and .zip archives."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(
+            main, ["--archive", "specs.rar", "template.yaml", "banker.csv", "True"]
+        )
+        assert result.exit_code == 2
+        assert "Not a .tar or .zip archive >specs.rar<" in result.output
+
+
+@pytest.mark.parametrize("archive", ["specs.zip", "specs.tar"])
+def test_main_with_archive_and_incremental(runner: CliRunner, archive: str) -> None:
+    """Should copy the outputs that are current from the existing archive."""
+    args = [
+        *("--archive", archive, "--incremental", "--compress", "gz"),
+        *("template.yaml", "banker.csv", "True"),
+    ]
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        with open(archive, "rb") as f:
+            content = f.read()
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        with open(archive, "rb") as f:
+            assert f.read() == content
+        with ArchiveReader(archive) as reader:
+            assert reader.spec("920426530")["info"]
+            assert gzip.decompress(reader.read("dsop_catalog.json.gz")) == (
+                reader.read("dsop_catalog.json")
+            )
+
+
+def test_main_with_lookup_store(runner: CliRunner) -> None:
+    """Should add the specs of the run to the lookup store."""
+    args = ["--lookup-store", "lookup.sqlite", "-d", "specs"]
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(main, [*args, "template.yaml", "banker.csv", "True"])
+        assert result.exit_code == 0, result.output
+        with LookupStore("lookup.sqlite") as store:
+            specs = store.lookup("920426530", "orgnummer")
+            assert [spec["environment"] for spec in specs] == ["production", "test"]
+            assert specs[1]["path"].startswith("test/")
+            assert specs[1]["endpoint"] == (
+                "https://api-test.sparebank1.no/dsop/Service/v2/920426530"
+            )
+            assert len(store.lookup(specs[0]["identifier"])) == 1
+            assert store.update([], "specs") == (0, 6)
+
+
+@pytest.mark.parametrize("rdf_stream", [[], ["--rdf-stream", "ntriples"]])
+def test_main_does_not_rewrite_unchanged_catalogs(
+    runner: CliRunner, rdf_stream: List[str]
+) -> None:
+    """Should write byte-identical catalogs, and leave unchanged ones in place."""
+    args = [*rdf_stream, "-d", "specs", "template.yaml", "banker.csv", "True"]
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        catalogs = sorted(
+            str(path) for path in Path("specs").rglob("dsop_catalog*") if path.is_file()
+        )
+        assert len(catalogs) == 4
+        written = {catalog: Path(catalog).read_bytes() for catalog in catalogs}
+        for catalog in catalogs:
+            os.utime(catalog, ns=(0, 0))
+
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        assert _written_since_epoch(catalogs) == []
+        assert {catalog: Path(catalog).read_bytes() for catalog in catalogs} == written
+
+
+def test_create_catalog_graph_with_specs_in_memory(runner: CliRunner) -> None:
+    """Should create the same graph from specs in memory as from local files."""
+    template = _get_openapi_template()
+    bank = _get_bank()
+    catalog = Catalog(production=True)
+    api = API(URL_BASE + bank[2], "123")
+    api.publisher = "https://example.com/publishers/837884942"
+    catalog.apis.append(api)
+    spec = _generateSpec(template, bank, production=True)
+
+    with runner.isolated_filesystem():
+        Path("specs").mkdir()
+        with open(os.path.join("specs", bank[2]), "w") as f:
+            json.dump(spec, f)
+        from_local_files = create_catalog_graph(catalog, True)
+        os.remove(os.path.join("specs", bank[2]))
+        from_memory = create_catalog_graph(catalog, True, {api.url: spec})
+
+    assert isomorphic(from_local_files, from_memory)
+    assert len(from_memory) > 0
+
+
+def test_create_catalog_graph_skips_failed_fetch(
+    mocker: MockerFixture, capsys: Any
+) -> None:
+    """Should leave out and report an api whose spec could not be fetched."""
+    template = _get_openapi_template()
+    catalog = Catalog(production=True)
+    for api_id in ("1", "2"):
+        api = API(f"https://example.com/specs/{api_id}.json", api_id)
+        api.publisher = "https://example.com/publishers/837884942"
+        catalog.apis.append(api)
+    fetcher = SpecFetcher()
+    mocker.patch.object(
+        fetcher,
+        "fetch_all",
+        return_value={
+            "https://example.com/specs/1.json": FetchResult(
+                "https://example.com/specs/1.json",
+                spec=_generateSpec(template, _get_bank(), production=True),
+            ),
+            "https://example.com/specs/2.json": FetchResult(
+                "https://example.com/specs/2.json", error="HTTP status code 404"
+            ),
+        },
+    )
+
+    g = create_catalog_graph(catalog, False, fetcher=fetcher)
+
+    endpoint_descriptions = {str(o) for o in g.objects(None, DCAT.endpointDescription)}
+    assert endpoint_descriptions == {"https://example.com/specs/1.json"}
+    assert (
+        "WARNING: Skipping >https://example.com/specs/2.json<: HTTP status code 404"
+        in capsys.readouterr().err
+    )
+
+
+def test_main_with_rdf_stream(runner: CliRunner) -> None:
+    """Should stream rdf catalogs isomorphic to the serialized graphs."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        args = ["-d", "specs", "template.yaml", "banker.csv", "True"]
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        for name in ("dsop_catalog", "dsop_catalog_test"):
+            serialized = Graph().parse(f"specs/rdf/{name}.ttl", format="turtle")
+            for rdf_format, extension, parser in (
+                ("turtle", "ttl", "turtle"),
+                ("ntriples", "nt", "nt"),
+            ):
+                result = runner.invoke(main, ["--rdf-stream", rdf_format, *args])
+                assert result.exit_code == 0, result.output
+                streamed = Graph().parse(f"specs/rdf/{name}.{extension}", format=parser)
+                assert len(streamed) > 0
+                assert isomorphic(streamed, serialized)
+
+
+def test_main_with_stream(runner: CliRunner) -> None:
+    """Should stream the same outputs as a run with the whole catalog."""
+    args = ["template.yaml", "banker.csv", "True"]
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        for directory in ("streamed/test", "streamed/rdf"):
+            Path(directory).mkdir(parents=True)
+        result = runner.invoke(main, ["--rdf-stream", "turtle", "-d", "specs", *args])
+        assert result.exit_code == 0, result.output
+        result = runner.invoke(main, ["--stream", "-d", "streamed", *args])
+        assert result.exit_code == 0, result.output
+
+        outputs = sorted(
+            str(path.relative_to("specs"))
+            for path in Path("specs").rglob("*")
+            if path.is_file()
+        )
+        assert len(outputs) == 10
+        for output in outputs:
+            assert Path("streamed", output).read_bytes() == (
+                Path("specs", output).read_bytes()
+            )
+
+        # An incremental run leaves the unchanged outputs in place:
+        incremental = ["--stream", "--incremental", "-d", "streamed", *args]
+        result = runner.invoke(main, incremental)
+        assert result.exit_code == 0, result.output
+        streamed = [os.path.join("streamed", output) for output in outputs]
+        for output in streamed:
+            os.utime(output, ns=(0, 0))
+        result = runner.invoke(main, incremental)
+        assert result.exit_code == 0, result.output
+        assert _written_since_epoch(streamed) == []
+
+
+def test_main_with_stream_and_registry_errors(runner: CliRunner) -> None:
+    """Should write no outputs if a row read late in the stream has errors."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        with open("banker.csv", "a") as f:
+            f.write("12345,Bank,Bank.json,https://example.com,,,\n")
+        result = runner.invoke(
+            main, ["--stream", "-d", "specs", "template.yaml", "banker.csv", "True"]
+        )
+        assert result.exit_code == 1
+        assert "ERROR: line 5: OrgNummer must be nine digits >12345<" in result.output
+        assert [path for path in Path("specs").rglob("*") if path.is_file()] == []
+
+
+def test_main_with_stream_and_shard_by(runner: CliRunner) -> None:
+    """Should not stream a catalog that needs every bank before writing."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(
+            main,
+            ["--stream", "--shard-by", "page", "template.yaml", "banker.csv", "True"],
+        )
+        assert result.exit_code == 2
+        assert "--stream cannot be combined with --shard-by" in result.output
+
+
+def test_main_with_profile(runner: CliRunner) -> None:
+    """Should write a profile report and cProfile stats of the run."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        args = ["--profile", "profile.json", "--cprofile", "run.pstats"]
+        args += ["-d", "specs", "template.yaml", "banker.csv", "True"]
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+
+        with open("profile.json", "r", encoding="utf-8") as f:
+            report = json.load(f)
+        phases = report["phases"]
+        assert phases["parse_template"]["calls"] == 1
+        assert phases["generate_specs"]["calls"] >= 6
+        assert phases["write_files"]["bytes"] == sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk("specs")
+            for name in names
+        )
+        walls = [bank["wall"] for bank in report["slowest_banks"]]
+        assert len(walls) == 3
+        assert walls == sorted(walls, reverse=True)
+        assert pstats.Stats("run.pstats").stats  # type: ignore[attr-defined]
+
+
+def test_main_with_shared_components(runner: CliRunner) -> None:
+    """Should write small specs that bundle to the self-contained specs."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        args = ["-d", "specs", "template.yaml", "banker.csv", "True"]
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        self_contained = _read_json_files("specs")
+        graph = Graph().parse("specs/rdf/dsop_catalog.ttl", format="turtle")
+
+        result = runner.invoke(main, ["--shared-components", "-j", "2", *args])
+        assert result.exit_code == 0, result.output
+        spec_filename = "specs/test/Sparebank1_837884942_Accounts-API.json"
+        assert os.path.getsize(spec_filename) < len(self_contained[spec_filename]) / 5
+        assert "specs/" + SHARED_FILENAME in _read_json_files("specs")
+
+        # The catalog of the specs in the local files is the same:
+        catalog = _read_catalog("specs/dsop_catalog.json")
+        from_local_files = create_catalog_graph(catalog, True)
+        assert isomorphic(from_local_files, graph)
+
+        assert runner.invoke(bundle_main, ["specs"]).exit_code == 0
+        os.remove("specs/" + SHARED_FILENAME)
+        assert _read_json_files("specs") == self_contained
+
+
+def test_main_with_additional_template(runner: CliRunner) -> None:
+    """Should write the specs of every template and list them in one catalog."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        rc2 = os.path.join(os.path.dirname(__file__), "..", TEMPLATE_RC2)
+        standard = "https://example.com/standards/rc2"
+        args = ["-d", "output", "template.yaml", "banker.csv", "True"]
+        args += ["-a", rc2, "rc2/{stem}_RC2.json", standard]
+        os.mkdir("output")
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+
+        for directory in ("output", "output/test"):
+            with open(f"{directory}/Sparebank1_837884942_Accounts-API.json") as f:
+                assert "Accounts API SPAREBANK" in f.read()
+            with open(
+                f"{directory}/rc2/Sparebank1_837884942_Accounts-API_RC2.json"
+            ) as f:
+                assert (
+                    json.load(f)["info"]["title"]
+                    == "Accounts API SPAREBANK 1 837884942"
+                )
+        catalog = _read_catalog("output/dsop_catalog.json")
+        assert len(catalog.apis) == 6
+        assert len({api.identifier for api in catalog.apis}) == 6
+        rc2_apis = [api for api in catalog.apis if "/rc2/" in api.url]
+        assert [api.conformsTo for api in rc2_apis] == [[standard]] * 3
+        graph = Graph().parse("output/rdf/dsop_catalog_test.ttl", format="turtle")
+        assert len(list(graph.objects(predicate=DCAT.service))) == 6
+
+
+def test_main_with_invalid_pattern(runner: CliRunner) -> None:
+    """Should reject a pattern with unknown fields or the same names."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        args = ["-d", "specs", "template.yaml", "banker.csv", "True"]
+        result = runner.invoke(main, ["--pattern", "{name}.json", *args])
+        assert result.exit_code == 2
+        assert "Not a valid pattern >{name}.json<" in result.output
+        result = runner.invoke(
+            main, [*args, "-a", "template.yaml", "{filename}", "https://example.com"]
+        )
+        assert result.exit_code == 2
+        assert "its own files" in result.output
+
+
+def test_main_reports_every_registry_error(runner: CliRunner) -> None:
+    """Should report all errors in the registry and write nothing."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        with open("banker.csv", "a") as f:
+            f.write("12345,Bank,bank.json,https://example.com/,,,\n")
+            f.write("837884942,Bank,bank.txt,https://example.com,,,\n")
+        args = ["-d", "specs", "template.yaml", "banker.csv", "True"]
+        result = runner.invoke(main, args)
+
+        assert result.exit_code == 1
+        assert "line 5: OrgNummer must be nine digits >12345<" in result.output
+        assert "line 5: Trailing slash in url" in result.output
+        assert "line 6: Duplicate OrgNummer >837884942<" in result.output
+        assert "line 6: Filnavn must be the name of a .json file" in result.output
+        assert _read_json_files("specs") == {}
+
+
+def test_failed_main_leaves_outputs_untouched(
+    runner: CliRunner, mocker: MockerFixture
+) -> None:
+    """Should not replace any output if the run fails on the way."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        args = ["-d", "specs", "template.yaml", "banker.csv", "True"]
+        assert runner.invoke(main, args).exit_code == 0
+        outputs = _read_json_files("specs")
+        mocker.patch(
+            "dsop_api_spesifikasjoner.generateSpecification.create_catalog_graph",
+            side_effect=RuntimeError("failed"),
+        )
+        with open("template.yaml", "a") as t:
+            t.write("x-changed: true\n")
+        result = runner.invoke(main, args)
+
+        assert isinstance(result.exception, RuntimeError)
+        assert _read_json_files("specs") == outputs
+        assert not [name for name in os.listdir("specs") if name.startswith(".")]
+
+
+def test_main_with_validate(runner: CliRunner) -> None:
+    """Should write nothing if the template or another spec is not valid."""
+    args = ["--validate", "-d", "specs", "template.yaml", "banker.csv", "True"]
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+
+        with open("specs/Hand_Edited_Accounts-API.json", "w") as f:
+            json.dump({"openapi": "3.0.2", "info": {"title": "A"}, "paths": {}}, f)
+        with open("template.yaml", "a") as t:
+            t.write("x-changed: true\nunknown: true\n")
+        outputs = _read_json_files("specs")
+        result = runner.invoke(main, args)
+        assert result.exit_code == 1
+        assert result.output == (
+            "ERROR: template.yaml#/: 'unknown' does not match any of the regexes:"
+            " '^x-'\n"
+            "ERROR: Hand_Edited_Accounts-API.json#/info:"
+            " 'version' is a required property\n"
+        )
+        assert _read_json_files("specs") == outputs
+
+
+def test_main_with_probe_report(runner: CliRunner) -> None:
+    """Should mark the apis of the failing endpoints as not available."""
+    failing = "https://api-test.sparebank1.no/dsop/Service/v2/920426530"
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        with open("probe_report.json", "w") as f:
+            json.dump(
+                {
+                    "endpoints": [
+                        {"url": failing, "ok": False},
+                        {
+                            "url": "https://api.sparebank1.no/dsop/Service/v2/920426530",
+                            "ok": True,
+                        },
+                    ]
+                },
+                f,
+            )
+        result = runner.invoke(
+            main,
+            [
+                "--probe-report",
+                "probe_report.json",
+                "-d",
+                "specs",
+                "template.yaml",
+                "banker.csv",
+                "True",
+            ],
+        )
+        assert result.exit_code == 0, result.output
+
+        for filename, unavailable in (
+            ("specs/dsop_catalog.json", []),
+            ("specs/test/dsop_catalog_test.json", ["920426530"]),
+        ):
+            with open(filename, "r", encoding="utf-8") as f:
+                apis = json.load(f)["apis"]
+            assert [
+                api["url"].split("_")[1]
+                for api in apis
+                if api.get("endpointAvailable") is False
+            ] == unavailable
+
+
+def test_main_with_watch(runner: CliRunner, mocker: MockerFixture) -> None:
+    """Should update the outputs for each change of the registry until stopped."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+        with open("banker.csv", "r") as f:
+            header, first, second, third = f.readlines()
+        changes = [
+            header + first + "12345,Bank,bank.json,https://example.com,,,\n",
+            header + first + second.replace("SPAREBANK 1", "SPAREBANKEN"),
+        ]
+
+        def change_registry(seconds: float) -> None:
+            if not changes:
+                raise KeyboardInterrupt
+            with open("banker.csv", "w") as f:
+                f.write(changes.pop(0))
+
+        mocker.patch("time.sleep", side_effect=change_registry)
+        args = ["-d", "specs", "--watch", "template.yaml", "banker.csv", "True"]
+        result = runner.invoke(main, args)
+
+        assert result.exit_code == 0
+        assert result.output.count("Updated the outputs in") == 2
+        assert "line 3: OrgNummer must be nine digits >12345<" in result.output
+        assert result.output.endswith("Stopped watching\n")
+        assert sorted(os.listdir("specs")) == [
+            ".dsop_manifest.json",
+            "Sparebank1_837884942_Accounts-API.json",
+            "Sparebank1_920426530_Accounts-API.json",
+            "dsop_catalog.json",
+            "rdf",
+            "test",
+        ]
+        with open("specs/Sparebank1_920426530_Accounts-API.json") as f:
+            assert json.load(f)["info"]["title"].endswith("SPAREBANKEN 920426530")
+        catalog = _read_catalog("specs/dsop_catalog.json")
+        assert len(catalog.apis) == 2
+
+
+@pytest.mark.parametrize("incremental", [[], ["--incremental"]])
+def test_main_with_watch_runs_first_as_asked(
+    runner: CliRunner, mocker: MockerFixture, incremental: List[str]
+) -> None:
+    """Should only make the updates after the first run incremental."""
+    with runner.isolated_filesystem():
+        _write_local_run_files()
+
+        def change_registry(seconds: float) -> None:
+            if generate.call_count == 2:
+                raise KeyboardInterrupt
+            with open("banker.csv", "a") as f:
+                f.write("999888777,Bank,bank.json,https://example.com,,,\n")
+
+        generate = mocker.spy(generateSpecification, "_generate")
+        mocker.patch("time.sleep", side_effect=change_registry)
+        args = [*incremental, "--watch", "template.yaml", "banker.csv", "True"]
+        result = runner.invoke(main, ["-d", "specs", *args])
+
+        assert result.exit_code == 0, result.output
+        first, update = generate.call_args_list
+        assert first.args[5] is bool(incremental)
+        assert not first.kwargs["remove_stale"]
+        assert update.args[5] is True
+        assert update.kwargs["remove_stale"]
+
+
+def test_import_is_lazy() -> None:
+    """Should not import the rdf, http and sqlite3 libraries with the cli."""
+    code = (
+        "import sys\n"
+        "import dsop_api_spesifikasjoner.generateSpecification\n"
+        "heavy = {'rdflib', 'datacatalogtordf', 'oastodcat', 'requests', 'yaml',"
+        " 'sqlite3'}\n"
+        "print(sorted(heavy & set(sys.modules)))\n"
+    )
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout == "[]\n"
+
+
+def test_rdf_stream_choices() -> None:
+    """Should offer every format of the rdf writer."""
+    (option,) = (param for param in main.params if param.name == "rdf_stream")
+    assert list(option.type.choices) == list(RDF_FORMATS)  # type: ignore
+
+
+def _written_since_epoch(outputs: List[str]) -> List[str]:
+    """Return the outputs that have been written since their mtime was reset."""
+    return [output for output in outputs if os.stat(output).st_mtime_ns > 0]
+
+
+def _write_local_run_files() -> None:
+    """Write a template and a bank registry for a run with local files."""
+    with open("banker.csv", "w") as f:
+        f.write("OrgNummer,Navn,Filnavn,EndepunktProduksjon,EndepunktTest,Id,TestId\n")
+        for orgnummer in ("837884942", "920426530", "937888015"):
+            f.write(
+                f"{orgnummer},SPAREBANK 1 {orgnummer},"
+                f"Sparebank1_{orgnummer}_Accounts-API.json,"
+                f"https://api.sparebank1.no/dsop/Service/v2/{orgnummer},"
+                f"https://api-test.sparebank1.no/dsop/Service/v2/{orgnummer},"
+                ","
+                "\n"
+            )
+    with open("./template.yaml", "w") as t, open(
+        os.path.join(os.path.dirname(__file__), "..", TEMPLATE), "r"
+    ) as source:
+        t.write(source.read())
+    for directory in ("specs/test", "specs/rdf"):
+        Path(directory).mkdir(parents=True, exist_ok=True)
+
+
+def _read_catalog(filename: str) -> Catalog:
+    """Read a json catalog with its apis."""
+    with open(filename, "r", encoding="utf-8") as f:
+        content = json.load(f)
+    catalog = Catalog(production=True)
+    for item in content["apis"]:
+        api = API(item["url"], "")
+        api.identifier = item["identifier"]
+        api.publisher = item["publisher"]
+        api.conformsTo.extend(item["conformsTo"])
+        catalog.apis.append(api)
+    return catalog
+
+
+def _read_json_files(directory: str) -> Dict[str, bytes]:
+    """Read the content of all json files below directory."""
+    return {
+        str(path): path.read_bytes() for path in sorted(Path(directory).rglob("*.json"))
+    }
+
+
 def _get_bank() -> List[str]:
     bank_str = (
         "837884942,"
@@ -0,0 +1,104 @@
+"""Unit test cases for the lookup module."""
+import json
+import os
+
+from click.testing import CliRunner
+import pytest
+
+from dsop_api_spesifikasjoner.lookup import LookupEntry, LookupStore, main
+
+IDENTIFIER = "https://dataservice-publisher.digdir.no/dataservices/abc123"
+BANK = [
+    "937888015",
+    "Ærø Sparebank",
+    "Aero_Sparebank",
+    "https://api.example.com/937888015",
+    "https://api-test.example.com/937888015",
+]
+
+
+@pytest.fixture
+def runner() -> CliRunner:
+    """Fixture for invoking command-line interfaces."""
+    return CliRunner()
+
+
+def _write_specs(directory: str) -> list:
+    """Write the production and test spec of the bank, and return their entries."""
+    os.makedirs(os.path.join(directory, "test"), exist_ok=True)
+    entries = []
+    for production, path in ((True, "Aero.json"), (False, "test/Aero.json")):
+        with open(os.path.join(directory, path), "w") as f:
+            json.dump({"path": path}, f)
+        entries.append(
+            LookupEntry(
+                path,
+                BANK,
+                production,
+                IDENTIFIER if production else IDENTIFIER + "-test",
+                "https://example.com/specs/" + path,
+            )
+        )
+    return entries
+
+
+def test_lookup_by_each_key(tmp_path: str) -> None:
+    """Should find the specs by any key, and the name in any case."""
+    entries = _write_specs(str(tmp_path))
+    with LookupStore(os.path.join(tmp_path, "lookup.sqlite")) as store:
+        assert store.update(entries, str(tmp_path)) == (2, 0)
+
+        specs = store.lookup("937888015")
+        assert [spec["path"] for spec in specs] == ["Aero.json", "test/Aero.json"]
+        assert specs[0]["environment"] == "production"
+        assert specs[1]["endpoint"] == "https://api-test.example.com/937888015"
+        assert len(specs[0]["sha256"]) == 64
+        assert "size" not in specs[0]
+        assert len(store.lookup("ærø sparebank", "navn")) == 2
+        assert len(store.lookup("Aero_Sparebank", "filnavn")) == 2
+        assert [spec["path"] for spec in store.lookup("abc123")] == ["Aero.json"]
+        assert [spec["path"] for spec in store.lookup(IDENTIFIER + "-test")] == [
+            "test/Aero.json"
+        ]
+        assert len(store.lookup("https://api.example.com/937888015")) == 1
+        assert store.lookup("937888015", "endpoint") == []
+        with pytest.raises(ValueError):
+            store.lookup("937888015", "sha256")
+
+
+def test_update_writes_only_changed_rows(tmp_path: str) -> None:
+    """Should write the changed rows and delete the rows of removed specs."""
+    entries = _write_specs(str(tmp_path))
+    filename = os.path.join(tmp_path, "lookup.sqlite")
+    with LookupStore(filename) as store:
+        store.update(entries, str(tmp_path))
+        digest = store.lookup("Aero.json", "path")[0]["sha256"]
+        assert store.update(entries, str(tmp_path)) == (0, 0)
+
+        with open(os.path.join(tmp_path, "Aero.json"), "w") as f:
+            f.write("{}")
+        assert store.update(entries[:1], str(tmp_path)) == (1, 1)
+        assert store.lookup("Aero.json", "path")[0]["sha256"] != digest
+        assert store.lookup("test/Aero.json", "path") == []
+
+
+def test_main(runner: CliRunner, tmp_path: str) -> None:
+    """Should print the specs found as json."""
+    filename = os.path.join(tmp_path, "lookup.sqlite")
+    with LookupStore(filename) as store:
+        store.update(_write_specs(str(tmp_path)), str(tmp_path))
+
+    result = runner.invoke(main, ["--by", "orgnummer", filename, "937888015"])
+    assert result.exit_code == 0, result.output
+    specs = json.loads(result.output)
+    assert [spec["navn"] for spec in specs] == ["Ærø Sparebank", "Ærø Sparebank"]
+
+
+def test_main_not_found(runner: CliRunner, tmp_path: str) -> None:
+    """Should exit with an error if no specs are found."""
+    filename = os.path.join(tmp_path, "lookup.sqlite")
+    LookupStore(filename).close()
+
+    result = runner.invoke(main, [filename, "111"])
+    assert result.exit_code == 1
+    assert "No specs found for >111<" in result.output
@@ -0,0 +1,212 @@
+"""Unit test cases for the probe module."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from typing import Dict, Iterator, List
+
+from click.testing import CliRunner
+import pytest
+
+from dsop_api_spesifikasjoner.probe import (
+    Endpoint,
+    main,
+    Prober,
+    read_failing_urls,
+    registry_endpoints,
+    report,
+)
+
+
+class _StubBank(ThreadingHTTPServer):
+    """A bank stub answering each path with a fixed status code."""
+
+    def __init__(self) -> None:
+        """Inits a stub on a free port."""
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.paths: List[str] = []
+        # The time each request was received:
+        self.received: List[float] = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def url(self, path: str) -> str:
+        """The url of path on the stub."""
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server: _StubBank
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Answer with the status code of the path, /slow after a while."""
+        with self.server.lock:
+            self.server.paths.append(self.path)
+            self.server.received.append(time.perf_counter())
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        time.sleep(0.5 if self.path == "/slow" else 0.02)
+        with self.server.lock:
+            self.server.active -= 1
+        self.send_response(503 if self.path == "/down" else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args: object) -> None:
+        """Do not log the requests."""
+
+
+@pytest.fixture
+def stubs() -> Iterator[List[_StubBank]]:
+    """Run two bank stubs."""
+    servers = [_StubBank(), _StubBank()]
+    for server in servers:
+        threading.Thread(
+            target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        ).start()
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_probe_all(stubs: List[_StubBank]) -> None:
+    """Should record the status of every request to each endpoint."""
+    endpoints = [
+        Endpoint("1", "Up", "production", stubs[0].url("/up")),
+        Endpoint("1", "Up", "test", stubs[1].url("/up")),
+        Endpoint("2", "Down", "production", stubs[0].url("/down")),
+        Endpoint("3", "Slow", "production", stubs[1].url("/slow")),
+    ]
+    Prober(per_host=2, rate=1000, timeout=0.2, requests_per_endpoint=3).probe_all(
+        endpoints
+    )
+
+    assert [endpoint.ok for endpoint in endpoints] == [True, True, False, False]
+    assert endpoints[0].statuses == [200, 200, 200]
+    assert len(endpoints[0].latencies) == 3
+    assert endpoints[2].statuses == [503, 503, 503]
+    assert endpoints[2].errors == ["HTTP status code 503"] * 3
+    assert endpoints[3].statuses == [None, None, None]
+    assert all("Timeout" in error for error in endpoints[3].errors)
+
+
+def test_probe_all_limits_the_rate(stubs: List[_StubBank]) -> None:
+    """Should start at most rate requests a second to each host."""
+    endpoints = [Endpoint("1", "Up", "production", stubs[0].url("/up"))]
+    start = time.perf_counter()
+    Prober(per_host=4, rate=20, requests_per_endpoint=5).probe_all(endpoints)
+
+    assert endpoints[0].ok
+    # The fifth request starts 4/20 seconds after the first:
+    assert time.perf_counter() - start >= 0.2
+
+
+def test_probe_all_limits_the_requests_to_each_host(stubs: List[_StubBank]) -> None:
+    """Should send at most per_host requests at a time to each host."""
+    endpoints = [
+        Endpoint(str(i), "Up", "production", stubs[0].url(f"/up/{i}")) for i in range(4)
+    ]
+    Prober(per_host=2, rate=1000, requests_per_endpoint=2).probe_all(endpoints)
+
+    assert all(endpoint.ok for endpoint in endpoints)
+    assert len(stubs[0].paths) == 8
+    assert stubs[0].max_active == 2
+
+
+def test_probe_all_does_not_hold_up_other_hosts(stubs: List[_StubBank]) -> None:
+    """Should not let the requests waiting for one host delay another host."""
+    endpoints = [
+        Endpoint(str(i), "Up", "production", stubs[0].url(f"/up/{i}")) for i in range(8)
+    ]
+    endpoints.append(Endpoint("9", "Lone", "production", stubs[1].url("/up")))
+    start = time.perf_counter()
+    Prober(concurrency=4, per_host=1, rate=4, requests_per_endpoint=1).probe_all(
+        endpoints
+    )
+
+    assert all(endpoint.ok for endpoint in endpoints)
+    # The first host takes 7/4 seconds, at 4 requests a second:
+    assert stubs[0].received[-1] - start >= 1.5
+    assert stubs[1].received[0] - start < 0.5
+
+
+def test_registry_endpoints() -> None:
+    """Should return the production and test endpoints that are set."""
+    banks = [
+        ["1", "A", "a.json", "https://a.example.com", "https://a-test.example.com"],
+        ["2", "B", "b.json", "https://b.example.com", ""],
+    ]
+    assert [
+        (endpoint.orgnummer, endpoint.environment, endpoint.url)
+        for endpoint in registry_endpoints(banks)
+    ] == [
+        ("1", "production", "https://a.example.com"),
+        ("1", "test", "https://a-test.example.com"),
+        ("2", "production", "https://b.example.com"),
+    ]
+
+
+def test_report() -> None:
+    """Should summarize the outcome with latency percentiles."""
+    endpoints = [
+        Endpoint("1", "A", "production", "https://a.example.com"),
+        Endpoint("2", "B", "production", "https://b.example.com"),
+    ]
+    endpoints[0].statuses = [200] * 10
+    endpoints[0].latencies = [i / 10 for i in range(10, 0, -1)]
+    endpoints[1].statuses = [None]
+    endpoints[1].errors = ["ConnectionError: refused"]
+
+    probed = report(endpoints)
+    assert probed["summary"] == {
+        "endpoints": 2,
+        "ok": 1,
+        "failing": 1,
+        "latency": {"p50": 0.5, "p90": 0.9, "p99": 1.0, "max": 1.0},
+    }
+    assert probed["endpoints"][1] == {
+        "orgnummer": "2",
+        "navn": "B",
+        "environment": "production",
+        "url": "https://b.example.com",
+        "ok": False,
+        "statuses": [None],
+        "errors": ["ConnectionError: refused"],
+        "latency": {"p50": None, "p90": None, "p99": None, "max": None},
+    }
+
+
+def test_main(stubs: List[_StubBank]) -> None:
+    """Should write the report, and list the failing endpoints."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("banker.csv", "w") as f:
+            f.write("OrgNummer,Navn,Filnavn,EndepunktProduksjon,EndepunktTest\n")
+            f.write(f"123456789,Up,up.json,{stubs[0].url('/up')},\n")
+            f.write(
+                f"987654321,Down,down.json,{stubs[1].url('/up')},"
+                f"{stubs[1].url('/down')}\n"
+            )
+        result = runner.invoke(main, ["banker.csv", "-o", "report.json", "-n", "1"])
+        assert result.exit_code == 0, result.output
+        assert "Probed 3 endpoints: 2 ok, 1 failing\n" in result.output
+        assert (
+            f"FAILING: Down (test) >{stubs[1].url('/down')}<: HTTP status code 503\n"
+        ) in result.output
+        with open("report.json", "r") as f:
+            probed: Dict = json.load(f)
+        assert probed["summary"]["failing"] == 1
+        assert read_failing_urls("report.json") == {stubs[1].url("/down")}
+
+
+def test_main_with_invalid_registry() -> None:
+    """Should report the errors of the registry and probe nothing."""
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("banker.csv", "w") as f:
+            f.write("OrgNummer,Navn\n")
+        result = runner.invoke(main, ["banker.csv"])
+        assert result.exit_code == 1
+        assert "ERROR: Missing columns in header" in result.output
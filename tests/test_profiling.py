@@ -0,0 +1,53 @@
+"""Unit test cases for the profiling module."""
+import json
+import os
+import pstats
+
+from dsop_api_spesifikasjoner.profiling import profiled, Profiler
+
+
+def test_disabled_profiler_records_nothing() -> None:
+    """Should record nothing until started."""
+    profiler = Profiler()
+    with profiler.phase("encode_specs"), profiler.bank("a.json"):
+        profiler.count_bytes("write_files", 10)
+
+    assert profiler.phases == {}
+    assert profiler.banks == {}
+
+
+def test_report() -> None:
+    """Should report calls and bytes of each phase and the slowest banks first."""
+    profiler = Profiler()
+    profiler.start()
+    for _ in range(3):
+        with profiler.phase("encode_specs"):
+            sum(range(1000))
+    profiler.count_bytes("write_files", 10)
+    profiler.count_bytes("write_files", 5)
+    with profiler.bank("fast.json"):
+        pass
+    with profiler.bank("slow.json"):
+        sum(range(100000))
+
+    report = profiler.report(slowest_banks=1)
+    assert report["phases"]["encode_specs"]["calls"] == 3
+    assert report["phases"]["encode_specs"]["wall"] > 0
+    assert report["phases"]["write_files"]["bytes"] == 15
+    assert report["phases"]["serialize_rdf"]["calls"] == 0
+    assert [bank["bank"] for bank in report["slowest_banks"]] == ["slow.json"]
+    assert report["wall"] >= report["phases"]["encode_specs"]["wall"]
+
+
+def test_profiled(tmp_path: str) -> None:
+    """Should write the report and the cProfile stats."""
+    report_filename = os.path.join(tmp_path, "profile.json")
+    pstats_filename = os.path.join(tmp_path, "run.pstats")
+    with profiled(report_filename, pstats_filename):
+        numbers = sorted(range(1000), key=lambda i: -i)
+
+    assert numbers[0] == 999
+
+    with open(report_filename, "r", encoding="utf-8") as f:
+        assert set(json.load(f)) == {"wall", "cpu", "phases", "slowest_banks"}
+    assert pstats.Stats(pstats_filename).stats  # type: ignore[attr-defined]
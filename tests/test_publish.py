@@ -0,0 +1,247 @@
+"""Unit test cases for the publish module."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+from click.testing import CliRunner
+import pytest
+
+from dsop_api_spesifikasjoner.catalog import API, Catalog, encode_catalog
+from dsop_api_spesifikasjoner.fetch import SpecFetcher
+from dsop_api_spesifikasjoner.generateSpecification import _add_spec_to_catalog
+from dsop_api_spesifikasjoner.publish import (
+    main,
+    publish,
+    Publisher,
+    PublishResult,
+    PublishState,
+)
+
+SPECS = [
+    ("937903502", "Aasen_Sparebank_937903502_Accounts-API.json"),
+    ("937894260", "Agder_Sparebank_937894260_Accounts-API.json"),
+    ("937890540", "Andebu_Sparebank_937890540_Accounts-API.json"),
+]
+
+
+class _StubPublisher(ThreadingHTTPServer):
+    """A dataservice-publisher stub recording the documents posted to it."""
+
+    def __init__(self) -> None:
+        """Inits a stub on a free port."""
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.documents: List[str] = []
+        self.authorizations: List[str] = []
+        # The status codes of the next requests, then 201:
+        self.statuses: List[int] = []
+        self.lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        """The url of the stub."""
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server: _StubPublisher
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Answer that there is no spec."""
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Record the posted document."""
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            status = self.server.statuses.pop(0) if self.server.statuses else 201
+            if status == 201 and self.path == "/catalogs":
+                self.server.documents.append(body.decode("utf-8"))
+                self.server.authorizations.append(self.headers["Authorization"])
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args: object) -> None:
+        """Do not log the requests."""
+
+
+@pytest.fixture
+def stub() -> Iterator[_StubPublisher]:
+    """Run a stub publisher."""
+    server = _StubPublisher()
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _catalog(specs: List = SPECS) -> Catalog:  # noqa: B006
+    catalog = Catalog(production=True)
+    for orgnummer, filename in specs:
+        _add_spec_to_catalog(orgnummer, "", filename, catalog)
+    return catalog
+
+
+def _outcome(result: PublishResult) -> Tuple[int, int, bool, Optional[str]]:
+    return result.published, result.changed, result.skipped, result.error
+
+
+def test_publish_posts_the_full_catalog(stub: _StubPublisher, tmp_path: str) -> None:
+    """Should post every api whenever anything has changed, and skip otherwise."""
+    state = PublishState(os.path.join(tmp_path, "state.json"), stub.endpoint)
+    publisher = Publisher(stub.endpoint)
+
+    assert _outcome(publish(_catalog(), publisher, state, True)) == (3, 3, False, None)
+    assert len(stub.documents) == 1
+    assert _catalog().identifier in stub.documents[0]
+    assert _outcome(publish(_catalog(), publisher, state, True)) == (0, 0, True, None)
+    assert len(stub.documents) == 1
+
+    catalog = _catalog()
+    catalog.apis[1].conformsTo.append("https://example.com/standard")
+    assert _outcome(publish(catalog, publisher, state, True)) == (3, 1, False, None)
+    assert len(stub.documents) == 2
+    # The publisher replaces the catalog, so the unchanged apis are posted too:
+    for api in catalog.apis:
+        assert api.identifier in stub.documents[-1]
+    assert "https://example.com/standard" in stub.documents[-1]
+
+
+def test_publish_removed_api(stub: _StubPublisher, tmp_path: str) -> None:
+    """Should post the catalog without an api that has been removed."""
+    state = PublishState(os.path.join(tmp_path, "state.json"), stub.endpoint)
+    publisher = Publisher(stub.endpoint)
+    publish(_catalog(), publisher, state, True)
+
+    assert _outcome(publish(_catalog(SPECS[:2]), publisher, state, True)) == (
+        2,
+        0,
+        False,
+        None,
+    )
+    assert _catalog().apis[2].identifier not in stub.documents[-1]
+    assert len(state.entries) == 3
+
+
+def test_publish_records_nothing_if_it_fails(
+    stub: _StubPublisher, tmp_path: str
+) -> None:
+    """Should only record the catalog once it is published."""
+    state = PublishState(os.path.join(tmp_path, "state.json"), stub.endpoint)
+    publisher = Publisher(stub.endpoint, retries=0)
+    stub.statuses = [400]
+
+    assert _outcome(publish(_catalog(), publisher, state, True)) == (
+        0,
+        3,
+        False,
+        "Cannot publish the catalog with 3 apis: HTTP status code 400",
+    )
+    assert state.entries == {}
+    assert _outcome(publish(_catalog(), publisher, state, True)) == (3, 3, False, None)
+
+
+def test_publish_nothing_if_a_spec_cannot_be_read(
+    stub: _StubPublisher, tmp_path: str
+) -> None:
+    """Should not post a catalog without the api whose spec cannot be read."""
+    state = PublishState(os.path.join(tmp_path, "state.json"), stub.endpoint)
+    publisher = Publisher(stub.endpoint)
+    publish(_catalog(), publisher, state, True)
+    published = dict(state.entries)
+    catalog = _catalog()
+    catalog.apis.append(API(stub.endpoint + "/missing.json", ""))
+
+    assert _outcome(
+        publish(catalog, publisher, state, True, SpecFetcher(retries=0))
+    ) == (
+        0,
+        0,
+        False,
+        "Cannot publish the catalog, as the specs of 1 apis cannot be read: "
+        + stub.endpoint
+        + "/missing.json",
+    )
+    assert len(stub.documents) == 1
+    assert state.entries == published
+
+
+def test_publish_retries(stub: _StubPublisher, tmp_path: str) -> None:
+    """Should retry a post of the full catalog that fails with a server error."""
+    state = PublishState(os.path.join(tmp_path, "state.json"), stub.endpoint)
+    publisher = Publisher(stub.endpoint, backoff_factor=0)
+    stub.statuses = [503, 503]
+
+    assert _outcome(publish(_catalog(), publisher, state, True)) == (3, 3, False, None)
+    assert len(stub.documents) == 1
+
+
+def test_main(stub: _StubPublisher, tmp_path: str) -> None:
+    """Should publish the catalog file and record it next to the file."""
+    catalog_filename = os.path.join(tmp_path, "dsop_catalog.json")
+    with open(catalog_filename, "wb") as f:
+        f.write(encode_catalog(_catalog()))
+    args = [catalog_filename, stub.endpoint, "--use-local-files", "--token", "t"]
+
+    result = CliRunner().invoke(main, args)
+    assert result.exit_code == 0
+    assert result.output == "Published the catalog with 3 apis, 3 changed\n"
+    assert stub.authorizations == ["Bearer t"]
+    with open(os.path.join(tmp_path, ".dsop_publish.json")) as f:
+        assert len(json.load(f)["endpoints"][stub.endpoint]) == 4
+
+    result = CliRunner().invoke(main, args)
+    assert result.output == "Skipped the catalog, unchanged since it was published\n"
+    result = CliRunner().invoke(main, [*args, "--force"])
+    assert result.output == "Published the catalog with 3 apis, 3 changed\n"
+
+
+def test_main_fails(stub: _StubPublisher, tmp_path: str) -> None:
+    """Should report a catalog that cannot be published and exit with 1."""
+    catalog_filename = os.path.join(tmp_path, "dsop_catalog.json")
+    with open(catalog_filename, "wb") as f:
+        f.write(encode_catalog(_catalog()))
+    stub.statuses = [401]
+
+    result = CliRunner().invoke(
+        main, [catalog_filename, stub.endpoint + "/", "--use-local-files"]
+    )
+    assert result.exit_code == 1
+    assert (
+        "ERROR: Cannot publish the catalog with 3 apis: HTTP status code 401"
+        in result.output
+    )
+
+
+def test_main_fails_if_a_spec_cannot_be_read(
+    stub: _StubPublisher, tmp_path: str
+) -> None:
+    """Should post nothing, write no state and exit with 1."""
+    catalog = _catalog()
+    catalog.apis.append(API(stub.endpoint + "/missing.json", ""))
+    catalog_filename = os.path.join(tmp_path, "dsop_catalog.json")
+    with open(catalog_filename, "wb") as f:
+        f.write(encode_catalog(catalog))
+
+    result = CliRunner().invoke(
+        main,
+        [
+            catalog_filename,
+            stub.endpoint,
+            "--use-local-files",
+            "--cache-directory",
+            os.path.join(tmp_path, "cache"),
+        ],
+    )
+    assert result.exit_code == 1
+    assert f"WARNING: Skipping >{stub.endpoint}/missing.json<" in result.output
+    assert "ERROR: Cannot publish the catalog" in result.output
+    assert stub.documents == []
+    assert not os.path.exists(os.path.join(tmp_path, ".dsop_publish.json"))
@@ -0,0 +1,132 @@
+"""Unit test cases for the rdfwriter module."""
+import io
+from typing import List
+
+import pytest
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.compare import isomorphic
+from rdflib.namespace import DCAT, DCTERMS, RDF, XSD
+
+from dsop_api_spesifikasjoner.rdfwriter import (
+    canonical_graph,
+    create_rdf_writer,
+    RDF_FORMATS,
+    RDFWriter,
+    Triple,
+)
+
+CATALOG = URIRef("https://example.com/catalogs/1")
+SERVICE = URIRef("https://example.com/dataservices/1")
+
+
+@pytest.mark.parametrize("rdf_format", list(RDF_FORMATS))
+def test_write_batches(rdf_format: str) -> None:
+    """Should write batches that parse to the graph of all their triples."""
+    contact = BNode()
+    batches: List[List[Triple]] = [
+        [
+            (CATALOG, RDF.type, DCAT.Catalog),
+            (CATALOG, DCTERMS.title, Literal("DSOP API katalog", lang="nb")),
+        ],
+        [
+            (CATALOG, DCAT.service, SERVICE),
+            (SERVICE, RDF.type, DCAT.DataService),
+            (SERVICE, DCTERMS.description, Literal('A "quoted"\nline\\', lang="en")),
+            (SERVICE, DCTERMS.modified, Literal("2023-01-01", datatype=XSD.date)),
+            (SERVICE, DCAT.contactPoint, contact),
+            (contact, URIRef("http://www.w3.org/2006/vcard/ns#fn"), Literal("Æ")),
+            (SERVICE, DCAT.endpointURL, URIRef("https://example.com/a%20b")),
+            (SERVICE, DCAT.endpointURL, URIRef("https://example.com/v1")),
+        ],
+    ]
+    file = io.StringIO()
+    writer = create_rdf_writer(file, rdf_format)
+    for triples in batches:
+        writer.write(triples)
+
+    expected = Graph()
+    for triples in batches:
+        for triple in triples:
+            expected.add(triple)
+    written = Graph().parse(
+        data=file.getvalue(), format="nt" if rdf_format == "ntriples" else "turtle"
+    )
+    assert isomorphic(written, expected)
+
+
+def test_turtle_groups_by_subject() -> None:
+    """Should write one statement per subject in a batch."""
+    file = io.StringIO()
+    writer = create_rdf_writer(file, "turtle")
+    writer.write(
+        [
+            (SERVICE, DCAT.endpointURL, URIRef("https://example.com/v2")),
+            (SERVICE, RDF.type, DCAT.DataService),
+            (SERVICE, DCAT.endpointURL, URIRef("https://example.com/v1")),
+        ]
+    )
+
+    assert file.getvalue().endswith(
+        "<https://example.com/dataservices/1> a dcat:DataService ;\n"
+        "    dcat:endpointURL <https://example.com/v1>,\n"
+        "        <https://example.com/v2> .\n\n"
+    )
+
+
+def _contact_batch(service: URIRef, names: List[str]) -> List[Triple]:
+    """Return a batch of service with a new blank node for each contact."""
+    triples: List[Triple] = [(service, RDF.type, DCAT.DataService)]
+    for name in names:
+        contact = BNode()
+        triples.append((service, DCAT.contactPoint, contact))
+        triples.append(
+            (contact, URIRef("http://www.w3.org/2006/vcard/ns#fn"), Literal(name))
+        )
+    return triples[::-1] if len(names) % 2 else triples
+
+
+@pytest.mark.parametrize("rdf_format", list(RDF_FORMATS))
+def test_write_is_canonical(rdf_format: str) -> None:
+    """Should write equal batches as equal text, whatever their blank nodes."""
+    other = URIRef("https://example.com/dataservices/2")
+    written = []
+    for names in (["A", "B", "C"], ["C", "A", "B"]):
+        file = io.StringIO()
+        writer = create_rdf_writer(file, rdf_format)
+        writer.write(_contact_batch(SERVICE, names))
+        writer.write(_contact_batch(other, ["A"]))
+        written.append(file.getvalue())
+
+    assert written[0] == written[1]
+    graph = Graph().parse(
+        data=written[0], format="nt" if rdf_format == "ntriples" else "turtle"
+    )
+    # The blank nodes of different batches are kept apart:
+    assert len(set(graph.objects(None, DCAT.contactPoint))) == 4
+
+
+def test_writer_without_write_cannot_be_created() -> None:
+    """Should fail when a writer that does not write is created."""
+
+    class Writer(RDFWriter):
+        pass
+
+    with pytest.raises(TypeError):
+        Writer(io.StringIO())  # type: ignore[abstract]
+
+
+def test_canonical_graph() -> None:
+    """Should serialize equal graphs with blank nodes as equal text."""
+    serialized = []
+    for names in (["A", "B"], ["B", "A"]):
+        graph = Graph()
+        for triple in _contact_batch(SERVICE, names):
+            graph.add(triple)
+        canonical = canonical_graph(graph)
+        assert isomorphic(canonical, graph)
+        serialized.append(canonical.serialize(format="turtle"))
+
+    assert serialized[0] == serialized[1]
+    graph = Graph()
+    graph.add((SERVICE, RDF.type, DCAT.DataService))
+    assert canonical_graph(graph) is graph
@@ -0,0 +1,117 @@
+"""Unit test cases for the registry module."""
+import os
+from typing import Iterator
+
+import pytest
+
+from dsop_api_spesifikasjoner.registry import (
+    iter_registry,
+    read_registry,
+    RegistryError,
+)
+
+HEADER = "OrgNummer,Navn,Filnavn,EndepunktProduksjon,EndepunktTest,Id,TestId\n"
+
+
+def _row(orgnummer: str = "837884942", *fields: str) -> str:
+    """Return a valid row of the registry, with fields in place of the last."""
+    values = [
+        orgnummer,
+        f"SPAREBANK 1 {orgnummer}",
+        f"Sparebank1_{orgnummer}_Accounts-API.json",
+        f"https://api.sparebank1.no/dsop/Service/v2/{orgnummer}",
+        f"https://api-test.sparebank1.no/dsop/Service/v2/{orgnummer}",
+        "",
+        "",
+    ]
+    values[len(values) - len(fields) :] = fields
+    return ",".join(values) + "\n"
+
+
+def test_read_registry() -> None:
+    """Should return the banks in the order of the columns."""
+    banks = read_registry([HEADER, _row(), "\n", _row("920426530", "a1", "a2")])
+
+    assert [bank[0] for bank in banks] == ["837884942", "920426530"]
+    assert banks[1][5:] == ["a1", "a2"]
+
+
+def test_read_registry_maps_columns_by_header() -> None:
+    """Should read the columns in any order, and without the ids."""
+    lines = [
+        "Navn,OrgNummer,Filnavn,EndepunktTest,EndepunktProduksjon\n",
+        "Bank,837884942,bank.json,https://test.example.com,https://example.com\n",
+    ]
+
+    assert read_registry(lines) == [
+        [
+            "837884942",
+            "Bank",
+            "bank.json",
+            "https://example.com",
+            "https://test.example.com",
+            "",
+            "",
+        ]
+    ]
+
+
+def test_read_the_bank_registry() -> None:
+    """Should accept the registry of this repository."""
+    filename = os.path.join(os.path.dirname(__file__), "..", "banker.csv")
+    with open(filename, "r", encoding="utf-8") as f:
+        assert read_registry(f)
+
+
+def test_read_registry_reports_every_error() -> None:
+    """Should collect the errors of all rows, with their line numbers."""
+    lines = [
+        HEADER,
+        _row("12345"),
+        _row("837884942", "https://example.com/", "", "id 1", ""),
+        _row("837884942", "", ""),
+        _row("920426530", "1", "1"),
+        "920426531,Bank\n",
+    ]
+
+    with pytest.raises(RegistryError) as e:
+        read_registry(lines)
+    assert e.value.errors == [
+        "line 2: OrgNummer must be nine digits >12345<",
+        "line 3: Trailing slash in url is not allowed >https://example.com/<",
+        "line 3: Id may only have letters, digits and '.', '_', '~', '-' >id 1<",
+        "line 4: Duplicate OrgNummer >837884942<, also on line 3",
+        "line 4: Duplicate Filnavn >Sparebank1_837884942_Accounts-API.json<,"
+        " also on line 3",
+        "line 5: Duplicate Id >1<, also on line 5",
+        "line 6: Expected 7 fields, found 2",
+    ]
+
+
+def test_iter_registry_reads_one_line_at_a_time() -> None:
+    """Should yield each valid bank as it is read, and raise at the end."""
+    read = []
+
+    def lines() -> Iterator[str]:
+        for line in [HEADER, _row(), _row("12345"), _row("920426530")]:
+            read.append(line)
+            yield line
+
+    banks = iter_registry(lines())
+    assert next(banks)[0] == "837884942"
+    assert len(read) == 2
+    assert next(banks)[0] == "920426530"
+    with pytest.raises(RegistryError) as e:
+        next(banks)
+    assert e.value.errors == ["line 3: OrgNummer must be nine digits >12345<"]
+
+
+def test_read_registry_missing_columns() -> None:
+    """Should reject a registry without the required columns."""
+    with pytest.raises(RegistryError) as e:
+        read_registry(["OrgNummer,Navn\n"])
+    assert e.value.errors == [
+        "Missing columns in header: Filnavn, EndepunktProduksjon, EndepunktTest"
+    ]
+    with pytest.raises(RegistryError):
+        read_registry([])
@@ -0,0 +1,77 @@
+"""Unit test cases for the render module."""
+from typing import Any, Dict, List
+
+import yaml
+
+from dsop_api_spesifikasjoner.generateSpecification import _generateSpec
+from dsop_api_spesifikasjoner.render import encode, SpecRenderer
+
+
+def test_render_is_identical_to_encode() -> None:
+    """Should render the same bytes as encoding the full spec."""
+    template = _get_openapi_template()
+    renderer = SpecRenderer(template)
+
+    for production in (True, False):
+        _spec = _generateSpec(template, _get_bank(), production=production)
+        assert renderer.render(_spec) == encode(_spec)
+
+
+def test_render_template_without_servers() -> None:
+    """Should render the servers at the end when the template has none."""
+    template = {"openapi": "3.0.0", "info": {"title": "Accounts API"}, "paths": {}}
+    renderer = SpecRenderer(template)
+
+    _spec = _generateSpec(template, _get_bank(), production=True)
+    assert list(_spec.keys())[-1] == "servers"
+    assert renderer.render(_spec) == encode(_spec)
+
+
+def test_render_falls_back_for_changed_spec() -> None:
+    """Should encode the full spec if it has changed outside title and servers."""
+    template = _get_openapi_template()
+    renderer = SpecRenderer(template)
+
+    _spec = _generateSpec(template, _get_bank(), production=True)
+    _spec["paths"] = {}
+    assert renderer.render(_spec) == encode(_spec)
+
+    _spec = _generateSpec(template, _get_bank(), production=True)
+    _spec["info"] = {"title": "Another title", "version": "2.0.0"}
+    assert renderer.render(_spec) == encode(_spec)
+
+
+def test_render_template_containing_placeholder() -> None:
+    """Should encode the full spec if the template contains a placeholder."""
+    template = {
+        "openapi": "3.0.0",
+        "info": {
+            "title": "Accounts API",
+            "description": "@@dsop-api-spesifikasjoner:servers@@",
+        },
+    }
+    renderer = SpecRenderer(template)
+
+    _spec = _generateSpec(template, _get_bank(), production=False)
+    assert renderer.render(_spec) == encode(_spec)
+
+
+# --
+def _get_openapi_template() -> Dict[str, Any]:
+    """Create an openAPI-specification dokument."""
+    with open("./template/Accounts API openapi v1.0.0.yaml", "r") as file:
+        _yaml = yaml.safe_load(file)
+
+    return _yaml
+
+
+def _get_bank() -> List[str]:
+    bank_str = (
+        "837884942,"
+        "SPAREBANK 1 ØSTFOLD AKERSHUS,"
+        "Sparebank1_837884942_Accounts-API.json,"
+        "https://api.sparebank1.no/Service/v2/837884942,"
+        "https://api-test.sparebank1.no/Service/v2/837884942,"
+        ","
+    )
+    return bank_str.split(",")
@@ -0,0 +1,80 @@
+"""Unit test cases for the shards module."""
+import json
+
+import pytest
+
+from dsop_api_spesifikasjoner.catalog import API, Catalog
+from dsop_api_spesifikasjoner.shards import encode_shard_index, shard_catalog
+
+
+def _catalog() -> Catalog:
+    """Return a catalog with two apis of one publisher and one of another."""
+    catalog = Catalog(production=True)
+    for orgnummer, api_id in (("111", "a"), ("222", "b"), ("111", "c")):
+        api = API(f"https://example.com/specification/{api_id}", api_id)
+        api.publisher = f"https://example.com/organizations/{orgnummer}"
+        catalog.apis.append(api)
+    return catalog
+
+
+def test_shard_catalog_by_orgnummer() -> None:
+    """Should have a shard with the apis of each publisher."""
+    catalog = _catalog()
+    shards = shard_catalog(catalog, "orgnummer")
+
+    assert [(shard.key, shard.indexes) for shard in shards] == [
+        ("111", [0, 2]),
+        ("222", [1]),
+    ]
+    assert shards[0].catalog.apis == [catalog.apis[0], catalog.apis[2]]
+    assert shards[0].catalog.identifier == catalog.identifier
+    assert shards[0].catalog.title == catalog.title
+
+
+def test_shard_catalog_by_page() -> None:
+    """Should have a shard with each page of the apis."""
+    shards = shard_catalog(_catalog(), "page", page_size=2)
+
+    assert [(shard.key, shard.indexes) for shard in shards] == [
+        ("page_0001", [0, 1]),
+        ("page_0002", [2]),
+    ]
+
+
+def test_shard_catalog_by_unknown() -> None:
+    """Should not shard by anything else."""
+    with pytest.raises(ValueError):
+        shard_catalog(_catalog(), "navn")
+
+
+def test_encode_shard_index() -> None:
+    """Should map the org numbers and api identifiers to their shards."""
+    catalog = _catalog()
+    shards = shard_catalog(catalog, "page", page_size=2)
+    locations = [(f"catalog/{s.key}.json", f"rdf/{s.key}.ttl") for s in shards]
+
+    index = json.loads(encode_shard_index(catalog, "page", shards, locations))
+    assert index == {
+        "identifier": catalog.identifier,
+        "shardBy": "page",
+        "shards": [
+            {
+                "key": "page_0001",
+                "catalog": "catalog/page_0001.json",
+                "rdf": "rdf/page_0001.ttl",
+                "apis": 2,
+            },
+            {
+                "key": "page_0002",
+                "catalog": "catalog/page_0002.json",
+                "rdf": "rdf/page_0002.ttl",
+                "apis": 1,
+            },
+        ],
+        "orgnummer": {"111": ["page_0001", "page_0002"], "222": ["page_0001"]},
+        "identifiers": {
+            catalog.apis[0].identifier: "page_0001",
+            catalog.apis[1].identifier: "page_0001",
+            catalog.apis[2].identifier: "page_0002",
+        },
+    }
@@ -0,0 +1,71 @@
+"""Unit test cases for the staging module."""
+import os
+
+import pytest
+from pytest_mock import MockerFixture
+
+from dsop_api_spesifikasjoner.staging import StagedOutput
+
+
+def test_staged_output_is_moved_into_place(tmp_path: str) -> None:
+    """Should replace the outputs only when the stage is left."""
+    with open(os.path.join(tmp_path, "spec.json"), "w") as f:
+        f.write("old")
+    with StagedOutput(str(tmp_path)) as staging_directory:
+        os.makedirs(os.path.join(staging_directory, "test"))
+        for filename in ("spec.json", os.path.join("test", "spec.json")):
+            with open(os.path.join(staging_directory, filename), "w") as f:
+                f.write("new")
+        with open(os.path.join(tmp_path, "spec.json")) as f:
+            assert f.read() == "old"
+
+    assert sorted(os.listdir(tmp_path)) == ["spec.json", "test"]
+    for filename in ("spec.json", os.path.join("test", "spec.json")):
+        with open(os.path.join(tmp_path, filename)) as f:
+            assert f.read() == "new"
+
+
+def test_failed_stage_leaves_outputs_untouched(tmp_path: str) -> None:
+    """Should discard the staged files if the body fails."""
+    with open(os.path.join(tmp_path, "spec.json"), "w") as f:
+        f.write("old")
+    with pytest.raises(SystemExit):
+        with StagedOutput(str(tmp_path)) as staging_directory:
+            with open(os.path.join(staging_directory, "spec.json"), "w") as f:
+                f.write("new")
+            raise SystemExit("failed")
+
+    assert os.listdir(tmp_path) == ["spec.json"]
+    with open(os.path.join(tmp_path, "spec.json")) as f:
+        assert f.read() == "old"
+
+
+def test_failed_commit_leaves_outputs_untouched(
+    tmp_path: str, mocker: MockerFixture
+) -> None:
+    """Should move the files back if moving a staged file fails."""
+    for filename in ("a.json", "c.json"):
+        with open(os.path.join(tmp_path, filename), "w") as f:
+            f.write("old")
+    replace = os.replace
+    calls = []
+
+    def failing_replace(source: str, target: str) -> None:
+        calls.append(target)
+        if len(calls) == 4:
+            raise OSError("No space left on device")
+        replace(source, target)
+
+    mocker.patch("dsop_api_spesifikasjoner.staging.os.replace", failing_replace)
+    with pytest.raises(OSError):
+        with StagedOutput(str(tmp_path)) as staging_directory:
+            os.makedirs(os.path.join(staging_directory, "test"))
+            for filename in ("a.json", "b.json", "c.json", "test/d.json"):
+                with open(os.path.join(staging_directory, filename), "w") as f:
+                    f.write("new")
+
+    assert calls[3].endswith("d.json")
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
+    for filename in ("a.json", "c.json"):
+        with open(os.path.join(tmp_path, filename)) as f:
+            assert f.read() == "old"
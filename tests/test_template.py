@@ -0,0 +1,52 @@
+"""Unit test cases for the template module."""
+import json
+import os
+
+import yaml
+
+from dsop_api_spesifikasjoner.template import load_yaml, Template
+
+TEMPLATE = os.path.join(
+    os.path.dirname(__file__), "..", "template", "Accounts API openapi v1.0.0.yaml"
+)
+
+
+def test_load_yaml() -> None:
+    """Should parse the template like the pure-Python safe loader."""
+    with open(TEMPLATE, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    assert load_yaml(text) == yaml.safe_load(text)
+
+
+def test_parsed_template_is_cached(tmp_path: str) -> None:
+    """Should keep the parsed template in the cache and read it from there."""
+    text = "openapi: 3.0.1\ninfo:\n  title: Accounts API\n"
+    parsed = Template(text, str(tmp_path)).parsed
+
+    (cached,) = os.listdir(tmp_path)
+    assert cached == f"{Template(text).digest}.parsed.json"
+    with open(os.path.join(tmp_path, cached), "r", encoding="utf-8") as f:
+        assert json.load(f) == parsed
+    assert Template(text, str(tmp_path)).parsed == parsed
+    with open(os.path.join(tmp_path, cached), "w") as f:
+        f.write("not json")
+    assert Template(text, str(tmp_path)).parsed == parsed
+
+
+def test_template_not_kept_as_json_is_not_cached(tmp_path: str) -> None:
+    """Should not cache a template that parses to keys json cannot keep."""
+    text = "paths:\n  /accounts:\n    get:\n      responses:\n        200: {}\n"
+    parsed = Template(text, str(tmp_path)).parsed
+
+    assert 200 in parsed["paths"]["/accounts"]["get"]["responses"]
+    assert os.listdir(tmp_path) == []
+
+
+def test_changed_template_is_parsed(tmp_path: str) -> None:
+    """Should not use the cached parse of another text."""
+    Template("info:\n  title: A\n", str(tmp_path)).parsed
+    changed = Template("info:\n  title: B\n", str(tmp_path)).parsed
+
+    assert changed == {"info": {"title": "B"}}
+    assert len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,149 @@
+"""Unit test cases for the validation module."""
+import glob
+import json
+import os
+from typing import Any, Dict
+
+import pytest
+from pytest_mock import MockerFixture
+
+
+from dsop_api_spesifikasjoner import validation
+from dsop_api_spesifikasjoner.template import load_yaml, Template
+from dsop_api_spesifikasjoner.validation import (
+    validate,
+    validate_substituted,
+    validate_template,
+)
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def _spec() -> Dict[str, Any]:
+    return {
+        "openapi": "3.0.2",
+        "info": {"title": "Accounts API", "version": "1.0.0"},
+        "servers": [{"url": "https://example.com/v1"}],
+        "paths": {
+            "/accounts/{id}": {
+                "get": {
+                    "operationId": "getAccount",
+                    "parameters": [
+                        {
+                            "name": "id",
+                            "in": "path",
+                            "required": True,
+                            "schema": {"type": "string"},
+                        },
+                        {"$ref": "#/components/parameters/CorrelationID"},
+                    ],
+                    "responses": {"200": {"description": "OK"}},
+                }
+            }
+        },
+        "components": {
+            "parameters": {
+                "CorrelationID": {
+                    "name": "c",
+                    "in": "header",
+                    "schema": {"type": "string"},
+                }
+            }
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    "filename",
+    sorted(glob.glob(os.path.join(ROOT, "template", "*.yaml")))
+    + sorted(glob.glob(os.path.join(ROOT, "specs", "*.json")))[:5],
+)
+def test_validate_repository_specs(filename: str) -> None:
+    """Should accept the templates and specs of this repository."""
+    with open(filename, "r", encoding="utf-8") as f:
+        assert validate(load_yaml(f.read())) == []
+
+
+def test_validate() -> None:
+    """Should accept a valid spec."""
+    assert validate(_spec()) == []
+
+
+def test_validate_reports_every_error() -> None:
+    """Should report each error with the json pointer of its location."""
+    spec = _spec()
+    spec["openapi"] = "3.1.0"
+    del spec["info"]["version"]
+    spec["servers"].append({"url": "https://example.com/ v2", "x-internal": True})
+    operation = spec["paths"]["/accounts/{id}"]["get"]
+    operation["parameters"][0]["required"] = False
+    operation["parameters"][1]["$ref"] = "#/components/parameters/Missing"
+    operation["responses"] = {"OK": {}}
+    operation["summary"] = 1
+    spec["paths"]["/accounts/{id}"]["post"] = {"operationId": "getAccount"}
+    spec["paths"]["accounts"] = {}
+    spec["tag"] = []
+
+    assert validate(spec) == [
+        "/: 'tag' does not match any of the regexes: '^x-'",
+        "/info: 'version' is a required property",
+        "/openapi: '3.1.0' does not match '^3\\\\.0\\\\.\\\\d(-.+)?$'",
+        "/paths: 'accounts' does not match any of the regexes: '^\\\\/', '^x-'",
+        "/paths/~1accounts~1{id}/get/parameters/0/required:"
+        " False is not one of [True]",
+        "/paths/~1accounts~1{id}/get/responses:"
+        " 'OK' does not match any of the regexes: '^[1-5](?:\\\\d{2}|XX)$', '^x-'",
+        "/paths/~1accounts~1{id}/get/summary: 1 is not of type 'string'",
+        "/paths/~1accounts~1{id}/post: 'responses' is a required property",
+        "/paths/~1accounts~1{id}/post/operationId: Duplicate >getAccount<,"
+        " also at /paths/~1accounts~1{id}/get",
+        "/paths/~1accounts~1{id}/get/parameters/1/$ref:"
+        " Cannot resolve >#/components/parameters/Missing<",
+    ]
+
+
+def test_validate_substituted() -> None:
+    """Should only check the info and servers."""
+    spec = _spec()
+    spec["paths"] = None
+    assert validate_substituted(spec) == []
+    spec["info"]["title"] = 1
+    spec["servers"] = [{"url": "ftp://example.com"}]
+    assert validate_substituted(spec) == [
+        "/info/title: 1 is not of type 'string'",
+        "/servers/0/url: Expected an http(s) or relative url",
+    ]
+    spec["servers"] = []
+    assert validate_substituted(spec) == [
+        "/info/title: 1 is not of type 'string'",
+        "/servers: Expected at least one server",
+    ]
+
+
+def test_validate_template_is_cached(tmp_path: str, mocker: MockerFixture) -> None:
+    """Should validate a template once, and read the outcome from the cache."""
+    text = json.dumps({"openapi": "3.0.2", "info": {"title": "A"}, "paths": {}})
+    errors = validate_template(Template(text, str(tmp_path)))
+    assert errors == ["/info: 'version' is a required property"]
+
+    spy = mocker.spy(validation, "validate")
+    template = Template(text, str(tmp_path))
+    assert validate_template(template) == errors
+    spy.assert_not_called()
+    # The template is not even parsed:
+    assert template._parsed is None
+
+
+def test_validate_template_again_with_another_validator(
+    tmp_path: str, mocker: MockerFixture
+) -> None:
+    """Should not read an outcome cached by another validator or schema."""
+    text = json.dumps({"openapi": "3.0.2", "info": {"title": "A"}, "paths": {}})
+    validate_template(Template(text, str(tmp_path)))
+
+    mocker.patch.object(validation, "_validator_digest", "another")
+    spy = mocker.spy(validation, "validate")
+    assert validate_template(Template(text, str(tmp_path))) == [
+        "/info: 'version' is a required property"
+    ]
+    spy.assert_called_once()